@@ -4,12 +4,196 @@
 # within the wave* family of tools.
 #
 # note: these functions have not been optimized for performance,
-# but are instead implemented for maximal clarity and readability
+# but are instead implemented for maximal clarity and readability;
+# when working with large volumes of packets, pass a BitVector (see
+# below) instead of a list and the helpers will switch to packed,
+# whole-buffer operations
 
 import sys
 from collections import deque
+import numpy as np
 LOGIC_X = "X"
 
+
+# The BitVector class is a packed alternative to the lists of bits
+# used in the rest of this module. The bits are stored MSB-first in a
+# numpy uint8 array, eight bits per byte, along with the number of
+# valid bits. A BitVector can be indexed, sliced, iterated, compared
+# and concatenated like a list of bits, so it can be handed to code
+# written for bit lists. The helper functions in this module detect
+# a BitVector and operate on the whole buffer at once rather than
+# looping over each bit.
+class BitVector(object):
+    def __init__(self, bits=None):
+        if bits is None:
+            self.packed = np.zeros(0, dtype=np.uint8)
+            self.numBits = 0
+        elif isinstance(bits, BitVector):
+            self.packed = bits.packed.copy()
+            self.numBits = bits.numBits
+        else:
+            try:
+                bitArray = np.asarray(bits, dtype=np.uint8)
+            except (TypeError, ValueError):
+                raise ValueError("BitVector can only hold bits valued 0 or 1")
+            if bitArray.ndim != 1 or np.any(bitArray > 1):
+                raise ValueError("BitVector can only hold bits valued 0 or 1")
+            self.packed = np.packbits(bitArray)
+            self.numBits = len(bitArray)
+
+    # builds a BitVector from packed bytes (MSB-first); numBits can be
+    # used to drop unused bits at the end of the last byte
+    @classmethod
+    def fromBytes(cls, byteData, numBits=None):
+        newVector = cls()
+        newVector.packed = np.frombuffer(bytes(byteData), dtype=np.uint8).copy()
+        if numBits is None:
+            numBits = 8*len(newVector.packed)
+        elif numBits > 8*len(newVector.packed):
+            raise ValueError("numBits exceeds the length of the byte data")
+        newVector.packed = newVector.packed[:(numBits + 7)//8]
+        newVector.numBits = numBits
+        newVector._clearPadBits()
+        return newVector
+
+    # builds a BitVector of the given length holding an unsigned integer,
+    # with the most significant bit at index 0
+    @classmethod
+    def fromInt(cls, intVal, numBits):
+        val = int(intVal)
+        if val < 0 or val.bit_length() > numBits:
+            raise ValueError("{} does not fit in {} bits".format(val, numBits))
+        padBits = (-numBits) % 8
+        newVector = cls()
+        newVector.packed = np.frombuffer(
+            (val << padBits).to_bytes((numBits + 7)//8, "big"),
+            dtype=np.uint8).copy()
+        newVector.numBits = numBits
+        return newVector
+
+    # the bits past numBits in the final byte are always kept at zero,
+    # so that the packed buffer can be compared and converted directly
+    def _clearPadBits(self):
+        padBits = (-self.numBits) % 8
+        if padBits > 0 and len(self.packed) > 0:
+            self.packed[-1] &= (0xFF << padBits) & 0xFF
+
+    def copy(self):
+        return BitVector(self)
+
+    # returns the bits unpacked into a numpy uint8 array, one bit per item
+    def toArray(self):
+        return np.unpackbits(self.packed, count=self.numBits)
+
+    def toList(self):
+        return self.toArray().tolist()
+
+    def toBytes(self):
+        return self.packed.tobytes()
+
+    # returns the unsigned integer value of the bits, MSB first by
+    # default; this matches the behavior of bitsToDec()
+    def toInt(self, invert=False, reverse=False):
+        if reverse:
+            return self.reverse().toInt(invert=invert)
+        if self.numBits == 0:
+            return 0
+        value = int.from_bytes(self.packed.tobytes(), "big")
+        value >>= (-self.numBits) % 8
+        if invert:
+            value ^= (1 << self.numBits) - 1
+        return value
+
+    # returns a new vector with every bit inverted
+    def invert(self):
+        newVector = BitVector()
+        newVector.packed = np.invert(self.packed)
+        newVector.numBits = self.numBits
+        newVector._clearPadBits()
+        return newVector
+
+    # returns a new vector rotated by the given number of positions;
+    # like deque.rotate(), a positive value rotates to the right
+    def rotate(self, rotate):
+        if self.numBits == 0:
+            return self.copy()
+        shift = rotate % self.numBits
+        value = self.toInt()
+        mask = (1 << self.numBits) - 1
+        value = ((value >> shift) | (value << (self.numBits - shift))) & mask
+        return BitVector.fromInt(value, self.numBits)
+
+    # returns a new vector with the bit order reversed
+    def reverse(self):
+        return BitVector(self.toArray()[::-1])
+
+    def __len__(self):
+        return self.numBits
+
+    def __iter__(self):
+        return iter(self.toList())
+
+    def __array__(self, dtype=None, copy=None):
+        bitArray = self.toArray()
+        if dtype is not None:
+            bitArray = bitArray.astype(dtype)
+        return bitArray
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            if index < 0:
+                index += self.numBits
+            if index < 0 or index >= self.numBits:
+                raise IndexError("BitVector index out of range")
+            return int((self.packed[index >> 3] >> (7 - (index & 7))) & 1)
+        return BitVector(self.toArray()[index])
+
+    def __setitem__(self, index, value):
+        if isinstance(index, (int, np.integer)):
+            if index < 0:
+                index += self.numBits
+            if index < 0 or index >= self.numBits:
+                raise IndexError("BitVector index out of range")
+            if value not in (0, 1):
+                raise ValueError("BitVector can only hold bits valued 0 or 1")
+            bitMask = 0x80 >> (index & 7)
+            if value:
+                self.packed[index >> 3] |= bitMask
+            else:
+                self.packed[index >> 3] &= 0xFF ^ bitMask
+        else:
+            bitArray = self.toArray()
+            newBits = np.asarray(value, dtype=np.uint8)
+            if np.any(newBits > 1):
+                raise ValueError("BitVector can only hold bits valued 0 or 1")
+            bitArray[index] = newBits
+            self.packed = np.packbits(bitArray)
+
+    def __eq__(self, other):
+        if isinstance(other, BitVector):
+            return self.numBits == other.numBits and \
+                   np.array_equal(self.packed, other.packed)
+        try:
+            return self.toList() == list(other)
+        except TypeError:
+            return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    def __add__(self, other):
+        return BitVector(np.concatenate((self.toArray(),
+                                         np.asarray(other, dtype=np.uint8))))
+
+    def __radd__(self, other):
+        return BitVector(np.concatenate((np.asarray(other, dtype=np.uint8),
+                                         self.toArray())))
+
+    def __repr__(self):
+        return "BitVector('{}')".format(bitsToStr(self))
+
 # inverts a single bit, in which the bit is stored as an int
 # equal to 0 or 1
 def invertBit(inputBit):
@@ -24,6 +208,8 @@ def invertBit(inputBit):
 
 # logically inverts each bit in the list
 def invertBitList(bitList):
+    if isinstance(bitList, BitVector):
+        return bitList.invert()
     bitListInv = []
     for bit in bitList:
         # bitListInv.append(invertBit(bit))
@@ -37,20 +223,25 @@ def invertBitList(bitList):
 # rotates the bitlist, with optional inversion
 # positive rotate value denotes right-ward direction
 def rotateBitList(bitList, rotate, invert = True):
+    if isinstance(bitList, BitVector):
+        if invert:
+            return bitList.rotate(rotate).invert()
+        return bitList.rotate(rotate)
     # rotate
     ind = deque(bitList)
     ind.rotate(rotate)
     # convert to list and invert contents into output string
     bitList = list(ind)
+    if not invert:
+        return bitList
     outList = []
-    if invert:
-        #outList = invertBitList(bitList)
-        for bit in bitList:
-            if bit == 0:
-                outList.append(1)
-            else:
-                outList.append(0)
-            
+    #outList = invertBitList(bitList)
+    for bit in bitList:
+        if bit == 0:
+            outList.append(1)
+        else:
+            outList.append(0)
+
     return outList
 
 
@@ -68,6 +259,12 @@ def byteReverse(bitList):
 # the index list. It will return the LOGIC_X character if the bit is outside 
 # the bounds of the rawData list
 def extractDisjointedBits(targetList, indexList):
+    if isinstance(targetList, BitVector):
+        indexArray = np.asarray(indexList, dtype=np.int64)
+        if np.all(indexArray < len(targetList)):
+            return targetList[indexArray]
+        return [targetList[index] if index < len(targetList) else LOGIC_X
+                for index in indexList]
     extractedBits = []
     for index in indexList:
         if index < len(targetList):
@@ -81,12 +278,13 @@ def extractDisjointedBits(targetList, indexList):
 # specified; the targetList is passed by reference, and its
 # contents are modified
 # 
-# Note: newData and indexList must be the same length
+# Note: newData and indexList must be the same length, or a ValueError
+# is raised
 def writeDisjointBits(targetList, newData, indexList):
     if len(newData) != len(indexList):
-        print("ERROR: attempting to write bits to list with", end=' ')
-        print("improper indexList length. Exiting...")
-        exit(1)
+        raise ValueError("attempting to write {} bits to a list with an "
+                         "indexList of length {}".format(len(newData),
+                                                         len(indexList)))
 
     l = len(targetList)
     if max(indexList) >= l:
@@ -94,6 +292,10 @@ def writeDisjointBits(targetList, newData, indexList):
         print("not be attempted.")
         return 0
 
+    if isinstance(targetList, BitVector):
+        targetList[np.asarray(indexList, dtype=np.int64)] = list(newData)
+        return
+
     for index, bit in zip(indexList, newData):
         targetList[index] = bit
 
@@ -104,6 +306,8 @@ def writeDisjointBits(targetList, newData, indexList):
 # an LSB conversion by setting reverse to True. You can also
 # invert the bits before the conversion
 def bitsToDec(bitList, invert = False, reverse = False):
+    if isinstance(bitList, BitVector):
+        return bitList.toInt(invert=invert, reverse=reverse)
     # invert bits if necessary
     bitList2 = []
     if invert:
@@ -151,14 +355,261 @@ def decToPaddedBits(intVal, numBits):
     return bits
 
 
-# returns a list of bits corresponding to an input list of bytes
+# returns a list of bits corresponding to an input list of bytes; if
+# the input is a bytes object, a bytearray or a BitVector, the result
+# is returned as a BitVector
 def byteListToBits(byteList):
+    if isinstance(byteList, BitVector):
+        return byteList.copy()
+    if isinstance(byteList, (bytes, bytearray)):
+        return BitVector.fromBytes(byteList)
     bitList = []
     for byte in byteList:
         bitList += decToPaddedBits(byte, 8)
     return bitList
 
 
+######################################################################
+# The following functions are batch versions of bitsToDec() and
+# decToPaddedBits(). They work on a bit matrix containing one packet
+# per row and one bit per column, and process every packet with a
+# single set of numpy operations. Instead of returning -1 or LOGIC_X
+# values for bad data, each returns a boolean mask with one entry per
+# packet that is False wherever the conversion was not possible.
+
+# converts the input into a 2-D uint8 matrix, returning it along with
+# a matrix flagging the items that were valid bits (0 or 1); items
+# that are not bits, such as LOGIC_X, are set to zero in the output
+def _bitMatrixAndMask(bitMatrix):
+    if isinstance(bitMatrix, np.ndarray) and bitMatrix.dtype != object:
+        bits = bitMatrix
+        if bits.ndim == 1:
+            bits = bits.reshape(1, -1)
+        validBits = (bits == 0) | (bits == 1)
+        return np.where(validBits, bits, 0).astype(np.uint8), validBits
+
+    rows = [row.toArray() if isinstance(row, BitVector) else list(row)
+            for row in bitMatrix]
+    objMatrix = np.empty((len(rows), len(rows[0]) if rows else 0),
+                         dtype=object)
+    for i, row in enumerate(rows):
+        if len(row) != objMatrix.shape[1]:
+            raise ValueError("all rows of a bit matrix must be the same length")
+        objMatrix[i, :] = row
+    validBits = np.asarray((objMatrix == 0) | (objMatrix == 1), dtype=bool)
+    bits = np.where(validBits, objMatrix, 0).astype(np.uint8)
+    return bits, validBits
+
+
+# returns the decimal value of each row of a bit matrix as a numpy
+# array, along with a mask of the rows that converted cleanly; the
+# invert and reverse options work the same as for bitsToDec(). Values
+# are returned as uint64 for rows up to 64 bits wide, and as Python
+# ints (in an object array) for wider rows
+def bitsToDecBatch(bitMatrix, invert = False, reverse = False):
+    bits, validBits = _bitMatrixAndMask(bitMatrix)
+    valid = np.all(validBits, axis=1)
+    if invert:
+        bits = bits ^ 1
+    if reverse:
+        bits = bits[:, ::-1]
+
+    numRows, numBits = bits.shape
+    padBits = (-numBits) % 8
+    packed = np.packbits(bits, axis=1)
+    if numBits <= 64:
+        words = np.zeros((numRows, 8), dtype=np.uint8)
+        words[:, 8 - packed.shape[1]:] = packed
+        values = words.view(">u8").reshape(numRows).astype(np.uint64)
+        values >>= np.uint64(padBits)
+        values[~valid] = 0
+    else:
+        values = np.empty(numRows, dtype=object)
+        for i in range(numRows):
+            if valid[i]:
+                values[i] = int.from_bytes(packed[i].tobytes(), "big") >> padBits
+            else:
+                values[i] = 0
+    return values, valid
+
+
+# returns a bit matrix with one row of numBits bits for each of the
+# input integers, along with a mask of the values that fit; values that
+# are negative or too large to render produce a row of zeros and a
+# False in the mask. The invert and reverse options produce rows that
+# bitsToDecBatch() converts back to the original values when called
+# with the same options
+def decToPaddedBitsBatch(intVals, numBits, invert = False, reverse = False):
+    if isinstance(intVals, np.ndarray):
+        vals = intVals
+    else:
+        try:
+            vals = np.asarray(intVals, dtype=np.int64)
+        except OverflowError:
+            vals = np.asarray(intVals, dtype=object)
+    if vals.ndim == 0:
+        vals = vals.reshape(1)
+    if vals.dtype.kind == "f":
+        vals = vals.astype(np.int64)
+
+    if numBits <= 64 and vals.dtype.kind in "iub":
+        valid = vals >= 0
+        words = np.where(valid, vals, 0).astype(np.uint64)
+        if numBits < 64:
+            valid &= (words >> np.uint64(numBits)) == 0
+        words[~valid] = 0
+        wordBytes = words.astype(">u8").view(np.uint8).reshape(-1, 8)
+        bits = np.unpackbits(wordBytes, axis=1)[:, 64 - numBits:]
+    else:
+        numBytes = (numBits + 7) // 8
+        valid = np.zeros(len(vals), dtype=bool)
+        rowBytes = []
+        for i, val in enumerate(vals):
+            val = int(val)
+            if val >= 0 and val.bit_length() <= numBits:
+                valid[i] = True
+            else:
+                val = 0
+            rowBytes.append(val.to_bytes(numBytes, "big"))
+        packed = np.frombuffer(b"".join(rowBytes), dtype=np.uint8)
+        bits = np.unpackbits(packed.reshape(len(vals), numBytes), axis=1)
+        bits = bits[:, 8*numBytes - numBits:]
+
+    if reverse:
+        bits = bits[:, ::-1]
+    if invert:
+        bits = bits ^ 1
+        bits[~valid] = 0
+    return np.ascontiguousarray(bits, dtype=np.uint8), valid
+
+
+# converts a list of packets, which may differ in length, into a 2-D
+# uint8 matrix padded with zeros, returning the matrix along with the
+# length of each packet; a single packet (a flat bit list, BitVector or
+# 1-D array) is returned as a matrix of one row
+def _packetMatrixAndLengths(packets):
+    if isinstance(packets, BitVector):
+        packets = packets.toArray()
+    elif not isinstance(packets, np.ndarray) and len(packets) > 0 and \
+            np.ndim(packets[0]) == 0 and not isinstance(packets[0], BitVector):
+        packets = np.asarray(packets, dtype=np.uint8)
+    if isinstance(packets, np.ndarray):
+        if packets.ndim == 1:
+            packets = packets.reshape(1, -1)
+        return packets, np.full(packets.shape[0], packets.shape[1])
+    rows = [np.asarray(packet, dtype=np.uint8) for packet in packets]
+    lengths = np.array([len(row) for row in rows], dtype=np.int64)
+    matrix = np.zeros((len(rows), max(lengths) if len(rows) else 0),
+                      dtype=np.uint8)
+    for i, row in enumerate(rows):
+        matrix[i, :len(row)] = row
+    return matrix, lengths
+
+
+# The FieldPlan class is built once from a set of index lists, like
+# those passed to extractDisjointedBits() and writeDisjointBits(), and
+# can then be applied to a whole matrix of packets. All of the fields
+# are gathered (or scattered) with a single numpy indexing operation.
+# Bits that fall outside of a packet are returned as zero and flagged
+# in a validity mask rather than being replaced with LOGIC_X.
+#
+# The fields can be passed as a list of index lists, in which case
+# they are named by their position in the list, or as a dictionary
+# mapping field names to index lists.
+class FieldPlan(object):
+    def __init__(self, fieldIndexLists):
+        if isinstance(fieldIndexLists, dict):
+            self.fieldNames = list(fieldIndexLists.keys())
+            indexLists = [fieldIndexLists[name] for name in self.fieldNames]
+        else:
+            indexLists = list(fieldIndexLists)
+            self.fieldNames = list(range(len(indexLists)))
+
+        self.fieldSlices = {}
+        start = 0
+        for name, indexList in zip(self.fieldNames, indexLists):
+            self.fieldSlices[name] = slice(start, start + len(indexList))
+            start += len(indexList)
+        self.indexArray = np.array([index for indexList in indexLists
+                                    for index in indexList], dtype=np.int64)
+        if np.any(self.indexArray < 0):
+            raise ValueError("FieldPlan indices must not be negative")
+
+    # returns the bit positions of a single field as an array
+    def fieldIndices(self, name):
+        return self.indexArray[self.fieldSlices[name]]
+
+    # gathers every field from every packet; returns a dictionary of
+    # (packets x field bits) matrices and a matching dictionary of
+    # validity masks, False wherever the bit was outside of the packet
+    def extract(self, packets):
+        matrix, lengths = _packetMatrixAndLengths(packets)
+        inRange = self.indexArray[np.newaxis, :] < lengths[:, np.newaxis]
+        if matrix.shape[1] > 0:
+            gathered = matrix[:, np.minimum(self.indexArray,
+                                            matrix.shape[1] - 1)]
+        else:
+            gathered = np.zeros((matrix.shape[0], len(self.indexArray)),
+                                dtype=np.uint8)
+        gathered = np.where(inRange, gathered, 0).astype(np.uint8)
+
+        fieldBits = {}
+        fieldValid = {}
+        for name in self.fieldNames:
+            fieldBits[name] = gathered[:, self.fieldSlices[name]]
+            fieldValid[name] = inRange[:, self.fieldSlices[name]]
+        return fieldBits, fieldValid
+
+    # gathers every field and converts each one to a decimal value per
+    # packet using bitsToDecBatch(); the validity mask for each field
+    # is False for any packet in which the field was not fully present
+    def extractValues(self, packets, invert = False, reverse = False):
+        fieldBits, fieldValid = self.extract(packets)
+        fieldValues = {}
+        packetValid = {}
+        for name in self.fieldNames:
+            fieldValues[name], _ = bitsToDecBatch(fieldBits[name],
+                                                  invert=invert,
+                                                  reverse=reverse)
+            packetValid[name] = np.all(fieldValid[name], axis=1)
+            fieldValues[name][~packetValid[name]] = 0
+        return fieldValues, packetValid
+
+    # scatters new bits into the packet matrix, which is modified in
+    # place; fieldData maps field names to either a (packets x field
+    # bits) matrix or a single row of bits applied to every packet.
+    # As with writeDisjointBits(), a ValueError is raised if the data
+    # does not fit a field, and no write is attempted if any index
+    # falls outside of the matrix
+    def write(self, packetMatrix, fieldData):
+        for name, newBits in fieldData.items():
+            indices = self.fieldIndices(name)
+            newBits = np.asarray(newBits, dtype=np.uint8)
+            if newBits.shape[-1] != len(indices):
+                raise ValueError("attempting to write {} bits to field {} of "
+                                 "{} bits".format(newBits.shape[-1], name,
+                                                  len(indices)))
+            if len(indices) > 0 and max(indices) >= packetMatrix.shape[1]:
+                print("ERROR: index in field {} out of range, write".format(name), end=' ')
+                print("will not be attempted.")
+                return 0
+        for name, newBits in fieldData.items():
+            packetMatrix[:, self.fieldIndices(name)] = newBits
+
+    # converts a decimal value (or one per packet) for each field into
+    # bits with decToPaddedBitsBatch() and writes them as in write()
+    def writeValues(self, packetMatrix, fieldValues,
+                    invert = False, reverse = False):
+        fieldData = {}
+        for name, values in fieldValues.items():
+            fieldData[name], valid = decToPaddedBitsBatch(
+                values, len(self.fieldIndices(name)),
+                invert=invert, reverse=reverse)
+            if not np.all(valid):
+                print("WARNING: value too large for field {}".format(name))
+        return self.write(packetMatrix, fieldData)
+
+
 ######################################################################
 # The following functions handle string conversion of bit lists for
 # cleaner input and output.
@@ -171,43 +622,58 @@ def bitsToStr(bitList):
     return outStr
 
 
+# lookup tables for the hex conversions; lower case hex digits are
+# accepted on input and upper case is always produced on output
+_HEX_DIGITS = "0123456789ABCDEF"
+_NIBBLE_TO_BITS = {}
+for _i, _digit in enumerate(_HEX_DIGITS):
+    _NIBBLE_TO_BITS[_digit] = [(_i >> 3) & 1, (_i >> 2) & 1, (_i >> 1) & 1, _i & 1]
+    _NIBBLE_TO_BITS[_digit.lower()] = _NIBBLE_TO_BITS[_digit]
+_BITS_TO_NIBBLE = dict((tuple(bits), digit) for digit, bits in
+                       _NIBBLE_TO_BITS.items() if digit in _HEX_DIGITS)
+_NIBBLE_INVERT = dict((digit, _HEX_DIGITS[15 - _HEX_DIGITS.index(digit.upper())])
+                      for digit in _NIBBLE_TO_BITS)
+# bit reversal of each byte value, for bytes.translate()
+_BYTE_BIT_REVERSE = bytes(bytearray(int("{:08b}".format(i)[::-1], 2)
+                                    for i in range(256)))
+
+
 # when passed a bit list that is four bits in length, this function
 # returns the nibble as a string
 def bitsToNibble(bits, reverse = False):
+    bits = tuple(bits)
     if reverse:
-        bits = list(reversed(bits))
-    nibble = LOGIC_X
-    if bits == [0, 0, 0, 0]: nibble = '0'
-    if bits == [0, 0, 0, 1]: nibble = '1'
-    if bits == [0, 0, 1, 0]: nibble = '2'
-    if bits == [0, 0, 1, 1]: nibble = '3'
-    if bits == [0, 1, 0, 0]: nibble = '4'
-    if bits == [0, 1, 0, 1]: nibble = '5'
-    if bits == [0, 1, 1, 0]: nibble = '6'
-    if bits == [0, 1, 1, 1]: nibble = '7'
-    if bits == [1, 0, 0, 0]: nibble = '8'
-    if bits == [1, 0, 0, 1]: nibble = '9'
-    if bits == [1, 0, 1, 0]: nibble = 'A'
-    if bits == [1, 0, 1, 1]: nibble = 'B'
-    if bits == [1, 1, 0, 0]: nibble = 'C'
-    if bits == [1, 1, 0, 1]: nibble = 'D'
-    if bits == [1, 1, 1, 0]: nibble = 'E'
-    if bits == [1, 1, 1, 1]: nibble = 'F'
-    return nibble
-
-
-# converts list of input bits to a list of bytes
+        bits = bits[::-1]
+    return _BITS_TO_NIBBLE.get(bits, LOGIC_X)
+
+
+# converts list of input bits to a list of bytes; a byte holding any
+# LOGIC_X bits is returned as -1 (as bitsToDec() does)
 def bit_list_to_byte_list(bits):
-    if len(bits) % 8 != 0:
+    incomplete = len(bits) % 8 != 0
+    if incomplete:
         print("WARNING: incomplete byte detected in input to bit_list_to_byte_list")
+    elif _allBinary(bits):
+        return list(bytearray(bitsToBytes(bits)))
     byte_list = []
-    for i in xrange(0, len(bits), 8):
+    for i in range(0, len(bits), 8):
         bits_in_byte = bits[i:i+8]
         byte = bitsToDec(bits_in_byte)
         byte_list.append(byte)
     return byte_list
 
 
+# returns True if every item of bits is a 0 or 1 (always so for a
+# BitVector), so that it can be packed in one numpy call
+def _allBinary(bits):
+    if isinstance(bits, BitVector):
+        return True
+    bitArray = np.asarray(bits)
+    if bitArray.dtype.kind not in "biu":
+        return False
+    return bool(np.all((bitArray == 0) | (bitArray == 1)))
+
+
 # when passed a bit list that is eight bits in length, this function
 # returns a string representation
 def bitsToHexByteString(bits):
@@ -219,24 +685,7 @@ def bitsToHexByteString(bits):
 
 # takes an input character and returns a bit list
 def nibbleToBits(inputNib):
-    bits = [LOGIC_X, LOGIC_X, LOGIC_X, LOGIC_X]
-    if inputNib == '0': bits = [0, 0, 0, 0]
-    if inputNib == '1': bits = [0, 0, 0, 1]
-    if inputNib == '2': bits = [0, 0, 1, 0]
-    if inputNib == '3': bits = [0, 0, 1, 1]
-    if inputNib == '4': bits = [0, 1, 0, 0]
-    if inputNib == '5': bits = [0, 1, 0, 1]
-    if inputNib == '6': bits = [0, 1, 1, 0]
-    if inputNib == '7': bits = [0, 1, 1, 1]
-    if inputNib == '8': bits = [1, 0, 0, 0]
-    if inputNib == '9': bits = [1, 0, 0, 1]
-    if inputNib == 'A': bits = [1, 0, 1, 0]
-    if inputNib == 'B': bits = [1, 0, 1, 1]
-    if inputNib == 'C': bits = [1, 1, 0, 0]
-    if inputNib == 'D': bits = [1, 1, 0, 1]
-    if inputNib == 'E': bits = [1, 1, 1, 0]
-    if inputNib == 'F': bits = [1, 1, 1, 1]
-    return bits
+    return list(_NIBBLE_TO_BITS.get(inputNib, [LOGIC_X]*4))
 
 
 # takes an input string of length 2 and returns a bit list
@@ -251,38 +700,108 @@ def hexByteToBits(inputHexByteString):
 
 # takes an input character and returns the inverted nibble
 def nibbleInvert(inputNib):
-    nib = LOGIC_X
-    if inputNib == '0': nib = 'F'
-    if inputNib == '1': nib = 'E'
-    if inputNib == '2': nib = 'D'
-    if inputNib == '3': nib = 'C'
-    if inputNib == '4': nib = 'B'
-    if inputNib == '5': nib = 'A'
-    if inputNib == '6': nib = '9'
-    if inputNib == '7': nib = '8'
-    if inputNib == '8': nib = '7'
-    if inputNib == '9': nib = '6'
-    if inputNib == 'A': nib = '5'
-    if inputNib == 'B': nib = '4'
-    if inputNib == 'C': nib = '3'
-    if inputNib == 'D': nib = '2'
-    if inputNib == 'E': nib = '1'
-    if inputNib == 'F': nib = '0'
-    return nib
+    return _NIBBLE_INVERT.get(inputNib, LOGIC_X)
 
 
 # takes an input hex byte string of length two and returns a bit list
 def hexStringToDec(inputHexByteString, reverse = False):
-    return bitsToDec(hexByteToBits(inputHexByteString), reverse)
+    return bitsToDec(hexByteToBits(inputHexByteString), reverse=reverse)
 
 
 # takes an input hex string, two bytes in length, and returns a bit list
 def hexShortToDec(byteLowString, byteHighString, reverse = False):
-    decimalLow = hexToDec(byteLowString, reverse)
-    decimalHigh = hexToDec(byteHighString, reverse)
+    decimalLow = hexStringToDec(byteLowString, reverse)
+    decimalHigh = hexStringToDec(byteHighString, reverse)
     decimalWord = 256*256*decimalHigh + decimalLow
     return decimalWord
 
+
+######################################################################
+# The following functions convert whole buffers between bits, bytes and
+# hex strings. Bits are returned as BitVectors and can be passed in as
+# BitVectors, bit lists or numpy arrays. Bytes are MSB first unless
+# lsbFirst is True, in which case the first bit of each byte is its
+# least significant bit. A bit count that is not a multiple of eight
+# is padded out with zeros at the end of the last byte.
+
+# converts a bytes-like object to a BitVector
+def bytesToBits(byteData, lsbFirst = False):
+    byteData = bytes(bytearray(byteData))
+    if lsbFirst:
+        byteData = byteData.translate(_BYTE_BIT_REVERSE)
+    return BitVector.fromBytes(byteData)
+
+
+# converts bits to a bytes object
+def bitsToBytes(bits, lsbFirst = False):
+    if isinstance(bits, BitVector):
+        byteData = bits.toBytes()
+    else:
+        byteData = np.packbits(np.asarray(bits, dtype=np.uint8)).tobytes()
+    if lsbFirst:
+        byteData = byteData.translate(_BYTE_BIT_REVERSE)
+    return byteData
+
+
+# converts a hex string to a BitVector, four bits per hex digit;
+# whitespace is ignored, so "DE AD BE EF" is accepted. With an odd
+# number of digits the final digit is a half byte of four bits, in the
+# same bit order as the bytes (so "A" is 0101 when lsbFirst is True)
+def hexToBits(hexString, lsbFirst = False):
+    hexString = "".join(hexString.split())
+    if len(hexString) % 2 == 0:
+        return bytesToBits(bytes.fromhex(hexString), lsbFirst)
+    bitVector = bytesToBits(bytes.fromhex(hexString[:-1]), lsbFirst)
+    nibbleBits = nibbleToBits(hexString[-1])
+    if LOGIC_X in nibbleBits:
+        raise ValueError("non-hex digit found in hex string")
+    if lsbFirst:
+        nibbleBits = nibbleBits[::-1]
+    return BitVector(bitVector.toList() + nibbleBits)
+
+
+# drops the unused digit of a trailing half byte from a hex string of
+# whole bytes; the bits of the half byte sit in the high nibble of the
+# last byte when MSB first and the low nibble when LSB first
+def _trimHalfByte(hexString, numBits, lsbFirst):
+    if not 0 < numBits % 8 <= 4:
+        return hexString
+    if lsbFirst:
+        return hexString[:-2] + hexString[-1:]
+    return hexString[:-1]
+
+
+# converts bits to an upper case hex string, with separator placed
+# between the bytes; a trailing half byte gives a single hex digit
+def bitsToHex(bits, lsbFirst = False, separator = ""):
+    numBits = len(bits)
+    byteData = bitsToBytes(bits, lsbFirst)
+    hexString = _trimHalfByte(byteData.hex().upper(), numBits, lsbFirst)
+    if separator:
+        hexString = separator.join(hexString[i:i+2]
+                                   for i in range(0, len(hexString), 2))
+    return hexString
+
+
+# converts every row of a (packets x bits) matrix to a hex string, as
+# bitsToHex() does, returning a list of strings; all of the rows are
+# packed in one numpy call, which makes dumping large captures quick
+def bitsToHexBatch(bitMatrix, lsbFirst = False):
+    bitMatrix = np.asarray(bitMatrix, dtype=np.uint8)
+    if bitMatrix.ndim == 1:
+        bitMatrix = bitMatrix.reshape(1, -1)
+    packed = np.packbits(bitMatrix, axis=1)
+    if lsbFirst:
+        packed = np.frombuffer(packed.tobytes().translate(_BYTE_BIT_REVERSE),
+                               dtype=np.uint8).reshape(packed.shape)
+    hexRows = packed.tobytes().hex().upper()
+    rowLen = 2*packed.shape[1]
+    if rowLen == 0:
+        return [""]*bitMatrix.shape[0]
+    return [_trimHalfByte(hexRows[i:i + rowLen], bitMatrix.shape[1], lsbFirst)
+            for i in range(0, len(hexRows), rowLen)]
+
+
 # prints a list of byte values as ASCII
 def print_bytes_as_ascii(byte_list):
     for byte in byte_list:
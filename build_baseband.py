@@ -1,4 +1,7 @@
+import hashlib
 import json
+import bit_list_utilities as blu
+import numpy as np
 from collections import OrderedDict
 from pprint import pprint
 
@@ -9,66 +12,252 @@ def toggleLevel(level):
         level = 0
     return level
 
+# converts a hex digit to a list of four bits
 def nibbleToBits(inputNib):
-    if inputNib == '0': bits = [0, 0, 0, 0]
-    if inputNib == '1': bits = [0, 0, 0, 1]
-    if inputNib == '2': bits = [0, 0, 1, 0]
-    if inputNib == '3': bits = [0, 0, 1, 1]
-    if inputNib == '4': bits = [0, 1, 0, 0]
-    if inputNib == '5': bits = [0, 1, 0, 1]
-    if inputNib == '6': bits = [0, 1, 1, 0]
-    if inputNib == '7': bits = [0, 1, 1, 1]
-    if inputNib == '8': bits = [1, 0, 0, 0]
-    if inputNib == '9': bits = [1, 0, 0, 1]
-    if inputNib == 'A': bits = [1, 0, 1, 0]
-    if inputNib == 'B': bits = [1, 0, 1, 1]
-    if inputNib == 'C': bits = [1, 1, 0, 0]
-    if inputNib == 'D': bits = [1, 1, 0, 1]
-    if inputNib == 'E': bits = [1, 1, 1, 0]
-    if inputNib == 'F': bits = [1, 1, 1, 1]
-    return bits
+    return blu.nibbleToBits(inputNib)
 
 def populateLevel(outFile, level, sampleCount):
-    for _ in xrange(sampleCount):
-        if level == 1:
-            outFile.write(b'\x01')
-        else:
-            outFile.write(b'\x00')
+    if level == 1:
+        outFile.write(b'\x01'*sampleCount)
+    else:
+        outFile.write(b'\x00'*sampleCount)
 
 
 
-class basebandDefinition:
-    initialVal = 0
-    elementList = []
-    widthList = []
-    waveList = []
+# The RunLengthBaseband class holds a baseband as a list of runs, each a
+# level and a width in samples, rather than one value per sample. Most
+# basebands are a few hundred runs long, so even a long transmit
+# schedule takes little memory. Basebands can be concatenated with +,
+# repeated with * (or repeat()), and resampled to a new sample rate,
+# which rescales the run widths; the samples themselves are only made
+# when they are needed, by expand() for the whole baseband, or by
+# iterSamples() and writeToFile() a chunk at a time.
+#
+# Levels are small integers, normally 0 and 1, though any uint8 value
+# can be held (such as the hop selections passed alongside a baseband
+# to rf_mod's fill_queue_vector()). Adjacent runs of the same level are
+# merged and empty runs dropped.
+class RunLengthBaseband(object):
+    def __init__(self, levels = None, widths = None, sampleRate = None):
+        if levels is None:
+            levels, widths = [], []
+        levels = np.asarray(levels, dtype=np.uint8).reshape(-1)
+        widths = np.asarray(widths, dtype=np.int64).reshape(-1)
+        if len(levels) != len(widths):
+            raise ValueError("each run needs one level and one width")
+        if np.any(widths < 0):
+            raise ValueError("run widths cannot be negative")
+        keep = widths > 0
+        levels, widths = levels[keep], widths[keep]
+        if len(levels) > 1:
+            # merge adjacent runs of the same level
+            runStarts = np.concatenate(([True], levels[1:] != levels[:-1]))
+            startIndices = np.flatnonzero(runStarts)
+            widths = np.add.reduceat(widths, startIndices)
+            levels = levels[startIndices]
+        self.levels = levels
+        self.widths = widths
+        self.sampleRate = sampleRate
+
+    # builds a baseband from a sequence of samples
+    @classmethod
+    def fromSamples(cls, samples, sampleRate = None):
+        samples = np.asarray(samples, dtype=np.uint8).reshape(-1)
+        if len(samples) == 0:
+            return cls(sampleRate=sampleRate)
+        edges = np.flatnonzero(samples[1:] != samples[:-1]) + 1
+        starts = np.concatenate(([0], edges))
+        ends = np.concatenate((edges, [len(samples)]))
+        return cls(samples[starts], ends - starts, sampleRate)
+
+    # builds a baseband from a list of [level, width] pairs with widths
+    # in microseconds, like basebandDefinition.widthList; each edge is
+    # rounded to the nearest sample, so rounding errors do not add up
+    @classmethod
+    def fromWidthList(cls, widthList, sampleRate):
+        levels = [pair[0] for pair in widthList]
+        microseconds = np.array([pair[1] for pair in widthList], dtype=np.float64)
+        return cls(levels, _edgeWidths(microseconds, sampleRate/1e6), sampleRate)
+
+    # number of samples
+    def __len__(self):
+        return int(self.widths.sum())
+
+    @property
+    def numRuns(self):
+        return len(self.levels)
+
+    # length in seconds
+    @property
+    def duration(self):
+        return len(self)/float(self.sampleRate)
+
+    def _checkRate(self, other):
+        if self.sampleRate is not None and other.sampleRate is not None and \
+           self.sampleRate != other.sampleRate:
+            raise ValueError("cannot combine basebands of different sample "
+                             "rates; resample one of them first")
+        return self.sampleRate if self.sampleRate is not None else other.sampleRate
+
+    def __add__(self, other):
+        if not isinstance(other, RunLengthBaseband):
+            return NotImplemented
+        return RunLengthBaseband(np.concatenate((self.levels, other.levels)),
+                                 np.concatenate((self.widths, other.widths)),
+                                 self._checkRate(other))
+
+    # returns the baseband repeated count times
+    def repeat(self, count):
+        return RunLengthBaseband(np.tile(self.levels, count),
+                                 np.tile(self.widths, count), self.sampleRate)
+
+    def __mul__(self, count):
+        return self.repeat(count)
+
+    __rmul__ = __mul__
+
+    # returns the baseband at a new sample rate, with the run edges moved
+    # to the nearest sample at that rate
+    def resample(self, newSampleRate):
+        if self.sampleRate is None:
+            raise ValueError("the baseband has no sample rate to resample from")
+        widths = _edgeWidths(self.widths.astype(np.float64),
+                             float(newSampleRate)/self.sampleRate)
+        return RunLengthBaseband(self.levels, widths, newSampleRate)
+
+    # returns every sample as a uint8 array
+    def expand(self):
+        return np.repeat(self.levels, self.widths)
+
+    # generator returning the samples in uint8 arrays of chunkSize samples
+    # (the last one may be shorter), without building the whole baseband
+    def iterSamples(self, chunkSize = 1 << 20):
+        ends = np.cumsum(self.widths)
+        totalLen = int(ends[-1]) if len(ends) else 0
+        runIndex = 0
+        for chunkStart in range(0, totalLen, chunkSize):
+            chunkEnd = min(chunkStart + chunkSize, totalLen)
+            lastRun = int(np.searchsorted(ends, chunkEnd, side="left"))
+            runEnds = np.minimum(ends[runIndex:lastRun+1], chunkEnd)
+            runStarts = np.maximum(np.concatenate((
+                [ends[runIndex] - self.widths[runIndex]], ends[runIndex:lastRun])),
+                chunkStart)
+            yield np.repeat(self.levels[runIndex:lastRun+1], runEnds - runStarts)
+            runIndex = int(np.searchsorted(ends, chunkEnd, side="right"))
+
+    # writes the baseband to a file of one byte per sample, repeated
+    # repeatVal times, a chunk at a time; a baseband that fits in a
+    # single chunk is expanded once and the buffer reused for each repeat
+    def writeToFile(self, outFileName, repeatVal = 1, chunkSize = 1 << 20):
+        with open(outFileName, 'wb') as outFile:
+            if len(self) <= chunkSize:
+                waveBytes = memoryview(self.expand().tobytes())
+                outFile.writelines([waveBytes]*repeatVal)
+            else:
+                for _ in range(repeatVal):
+                    for chunk in self.iterSamples(chunkSize):
+                        outFile.write(memoryview(chunk))
+
+    # returns the runs as a list of [level, width] pairs, with widths in
+    # samples
+    def toWidthList(self):
+        return [[int(level), int(width)]
+                for level, width in zip(self.levels, self.widths)]
+
+    def __eq__(self, other):
+        if not isinstance(other, RunLengthBaseband):
+            return NotImplemented
+        return self.sampleRate == other.sampleRate and \
+            np.array_equal(self.levels, other.levels) and \
+            np.array_equal(self.widths, other.widths)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "RunLengthBaseband({} runs, {} samples, sampleRate={})".format(
+            self.numRuns, len(self), self.sampleRate)
+
+
+# converts run widths to whole numbers of samples after scaling by
+# samplesPerUnit, placing each run edge on the nearest sample so that
+# the total length stays within half a sample of the exact value
+def _edgeWidths(widths, samplesPerUnit):
+    edges = np.rint(np.cumsum(widths)*samplesPerUnit).astype(np.int64)
+    return np.diff(np.concatenate(([0], edges)))
+
 
-    def __init__(self):
-        print "Creating new baseband definition object"
+# returns the payload bits of an NRZ, MANCHESTER, PWM or DIFF element as
+# a numpy array; the payload starts at dataIndex with either the word
+# HEX followed by hex bytes, or the word ASCII, then MSB or LSB (the bit
+# order of each character), then the text
+def elementBits(element, dataIndex):
+    if element[dataIndex] == "HEX":
+        bits = blu.hexToBits("".join(byte[:2] for byte in element[dataIndex+1:]))
+    elif element[dataIndex] == "ASCII":
+        text = element[dataIndex+2].encode("latin-1")
+        bits = blu.bytesToBits(text, lsbFirst=element[dataIndex+1] == "LSB")
+    else:
+        print("WARNING: unknown payload type {}".format(element[dataIndex]))
+        return np.zeros(0, dtype=np.int64)
+    return bits.toArray().astype(np.int64)
+
+
+# A baseband definition file describes a waveform one element per line,
+# with widths in microseconds and anything after a '#' ignored:
+#   INIT level                          initial level
+#   ARB level width width ...           runs of alternating levels,
+#                                       starting at level
+#   REG level lowWidth highWidth count  count pairs of alternating runs
+#   NRZ lowWidth highWidth payload      one run per bit
+#   MANCHESTER halfWidth payload        two half-bit runs per bit
+#   PWM shortWidth longWidth payload    a pulse and a gap per bit
+#   DIFF bitWidth payload               NRZ-I, one bit period per bit
+# where payload is "HEX" followed by hex bytes, or "ASCII", then "MSB"
+# or "LSB", then a string (for example: NRZ 250 750 HEX A5 3C). The
+# payload bits are mapped to runs through lookup tables, a whole element
+# at a time.
+class basebandDefinition:
+    def __init__(self, verbose = False):
+        if verbose:
+            print("Creating new baseband definition object")
+        self.initialVal = 0
+        self.elementList = []
+        self.widthList = []
+        self.waveList = []
         
     def readFromFile(self, inFileName):
         # read each line of the file into a list item
         with open(inFileName) as inFile:
-            lines = inFile.read().splitlines()
+            self.parseText(inFile.read())
+
+    # parses the text of a baseband definition, adding its elements to
+    # the element list
+    def parseText(self, text):
+        lines = text.splitlines()
 
         # split each line into list items
         for line in lines:
             # chop off anything at a '#' char and after
             decommentLine = line.split('#')[0]
             # ignore any empty lines
-            if len(decommentLine) > 0:
+            if len(decommentLine.split()) > 0:
                 # create list for this line
                 lineList = decommentLine.split() 
 
                 if lineList[0] == "INIT":
-                    initialVal = int(lineList[1])
+                    self.initialVal = int(lineList[1])
                 elif lineList[0] == "REG":
                     self.elementList.append(lineList)
                 elif lineList[0] == "NRZ":
                     self.elementList.append(lineList)
                 elif lineList[0] == "ARB":
                     self.elementList.append(lineList)
-                # add manchester and PWM
+                elif lineList[0] in ("MANCHESTER", "PWM", "DIFF"):
+                    self.elementList.append(lineList)
 
     def buildWidthList(self):
         level = self.initialVal
@@ -80,38 +269,48 @@ class basebandDefinition:
                     self.widthList.append([level, int(width)])
                     level = toggleLevel(level)
             if element[0] == "NRZ":
-                lowWidth = int(element[1])
-                highWidth = int(element[2])
-                if element[3] == "HEX":
-                    bitList = []
-                    for byte in element[4:]:
-                        bitList += nibbleToBits(byte[0]) + nibbleToBits(byte[1])
-                    for bit in bitList:
-                        if bit == 0:
-                            self.widthList.append([0, lowWidth])
-                        else:
-                            self.widthList.append([1, highWidth])
-                elif element[3] == "ASCII":
-                    bitList = []
-                    for char in element[5]:
-                        asciiVal = ord(char) # number from 0 to 255
-                        bitList = [int(n) for n in bin(asciiVal)[2:].zfill(8)]
-                        print str(asciiVal) + " = ",
-                        print bitList 
-                        if element[4] == "LSB": # need to reverse for LSB
-                            bitList = bitList[::-1]
-                        for bit in bitList:
-                            if bit == 0:
-                                self.widthList.append([0, lowWidth])
-                            else:
-                                self.widthList.append([1, highWidth])
+                # 0 = low for lowWidth, 1 = high for highWidth
+                bits = elementBits(element, 3)
+                widthTable = np.array([int(element[1]), int(element[2])])
+                self.addRuns(bits, widthTable[bits])
+                if len(bits) > 0:
+                    level = int(bits[-1])
+            if element[0] == "MANCHESTER":
+                # IEEE 802.3: 0 = high then low, 1 = low then high, each
+                # half lasting halfWidth
+                bits = elementBits(element, 2)
+                levelTable = np.array([[1, 0], [0, 1]])
+                self.addRuns(levelTable[bits].ravel(),
+                             np.full(2*len(bits), int(element[1])))
+                if len(bits) > 0:
+                    # the second half of a bit is at the bit's value
+                    level = int(bits[-1])
+            if element[0] == "PWM":
+                # each bit is a high pulse then a low gap: 0 = short
+                # pulse and long gap, 1 = long pulse and short gap
+                bits = elementBits(element, 3)
+                shortWidth = int(element[1])
+                longWidth = int(element[2])
+                widthTable = np.array([[shortWidth, longWidth],
+                                       [longWidth, shortWidth]])
+                self.addRuns(np.tile([1, 0], len(bits)), widthTable[bits].ravel())
+                if len(bits) > 0:
+                    level = 0
+            if element[0] == "DIFF":
+                # NRZ-I: each 1 toggles the level and each 0 holds it,
+                # starting from the current level
+                bits = elementBits(element, 2)
+                levels = (level + np.cumsum(bits)) % 2
+                self.addRuns(levels, np.full(len(bits), int(element[1])))
+                if len(levels) > 0:
+                    level = int(levels[-1])
  
             if element[0] == "REG":
                 level = int(element[1])
                 lowWidth = int(element[2])
                 highWidth = int(element[3])
                 pulseCount = int(element[4])
-                for i in xrange(2*pulseCount):
+                for i in range(2*pulseCount):
                     if level == 0:
                         self.widthList.append([0, lowWidth])
                     else:
@@ -120,32 +319,110 @@ class basebandDefinition:
             
         return []
 
+    # adds runs to the width list from arrays of levels and widths
+    def addRuns(self, levels, widths):
+        self.widthList.extend(np.column_stack((levels, widths)).tolist())
+
+    # converts the width list to a RunLengthBaseband at the sample rate;
+    # the widths are in microseconds, and rather than truncating each
+    # one to a whole number of samples, the running total is carried
+    # at full precision and every edge placed on the nearest sample
+    def buildRunLength(self, sampleRate):
+        levels = [1 if pair[0] == 1 else 0 for pair in self.widthList]
+        return RunLengthBaseband.fromWidthList(
+            [[level, pair[1]] for level, pair in zip(levels, self.widthList)],
+            sampleRate)
+
+    # expands the (level, width) runs of the width list into a uint8
+    # array holding one level per sample; widths are in microseconds
     def buildWave(self, sampleRate):
-        self.waveList = []
-        for pair in self.widthList:
-            for _ in xrange( int((1.0*sampleRate/1000000) * pair[1]) ):
-                self.waveList.append(pair[0])
+        self.waveList = self.buildRunLength(sampleRate).expand()
         
+    # writes the wave to a file of one byte per sample, repeated
+    # repeatVal times; the samples are converted to bytes once and the
+    # same buffer is written for each repeat
     def writeWaveToFile(self, outFileName, repeatVal):
+        waveBytes = memoryview(np.asarray(self.waveList, dtype=np.uint8).tobytes())
         with open(outFileName, 'wb') as outFile:
-            for _ in xrange(repeatVal):
-                for bit in self.waveList:
-                    if bit == 1:
-                        outFile.write(b'\x01')
-                    else:
-                        outFile.write(b'\x00')
+            outFile.writelines([waveBytes]*repeatVal)
 
 
     def printDefinition(self):
-        print self.elementList
+        print(self.elementList)
 
     def printWidths(self):
         for pair in self.widthList:
-            print pair
+            print(pair)
 
     def printWave(self):
         for bit in self.waveList:
-            print bit,
+            print(bit, end=' ')
+
+
+# A CompiledBaseband is the parsed form of a baseband definition file:
+# the initial level and the runs of (level, width in microseconds), held
+# in tuples so that it cannot be changed once built. It produces the
+# RunLengthBaseband for any sample rate, placing edges on the nearest
+# sample, and keeps the result for each rate it has been asked for; the
+# arrays of those basebands are read-only, since they are shared.
+#
+# compileBaseband() keeps the compiled form of each definition it has
+# read, keyed by a hash of the file contents, so a definition is only
+# parsed once however many times (and at whatever rates) it is built.
+class CompiledBaseband(object):
+    def __init__(self, initialVal, runs):
+        object.__setattr__(self, "initialVal", initialVal)
+        object.__setattr__(self, "runs", tuple((int(level), width)
+                                               for level, width in runs))
+        object.__setattr__(self, "_rateCache", {})
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CompiledBaseband objects cannot be changed")
+
+    # returns the baseband at the sample rate as a RunLengthBaseband
+    def runLength(self, sampleRate):
+        if sampleRate not in self._rateCache:
+            baseband = RunLengthBaseband.fromWidthList(self.runs, sampleRate)
+            baseband.levels.flags.writeable = False
+            baseband.widths.flags.writeable = False
+            self._rateCache[sampleRate] = baseband
+        return self._rateCache[sampleRate]
+
+    # returns the samples of the baseband at the sample rate
+    def expand(self, sampleRate):
+        return self.runLength(sampleRate).expand()
+
+    # total length in microseconds
+    @property
+    def duration(self):
+        return sum(width for _, width in self.runs)
+
+    def __repr__(self):
+        return "CompiledBaseband({} runs, {} us)".format(len(self.runs),
+                                                         self.duration)
+
+
+# compiled basebands, keyed by the SHA-1 hash of the definition text
+_compiledBasebands = {}
+
+# reads a baseband definition file and returns its CompiledBaseband,
+# parsing it only if a file with the same contents has not been seen
+def compileBaseband(inFileName, verbose = False):
+    with open(inFileName, 'rb') as inFile:
+        text = inFile.read()
+    key = hashlib.sha1(text).hexdigest()
+    if key not in _compiledBasebands:
+        definition = basebandDefinition(verbose = verbose)
+        definition.parseText(text.decode("utf-8"))
+        definition.buildWidthList()
+        _compiledBasebands[key] = CompiledBaseband(definition.initialVal,
+                                                   definition.widthList)
+    return _compiledBasebands[key]
+
+
+# empties the cache of compiled basebands
+def clearBasebandCache():
+    _compiledBasebands.clear()
 
 
 def microsecondsToSamples(time, sampleRate):
@@ -154,8 +431,7 @@ def microsecondsToSamples(time, sampleRate):
 def addSamples(basebandList, signalLevel, arbWidth, sampleRate):
     newBasebandList = basebandList
     valsToAdd = microsecondsToSamples(arbWidth, sampleRate)
-    for _ in xrange(valsToAdd):
-        newBasebandList.append(signalLevel)
+    newBasebandList.extend([signalLevel]*valsToAdd)
     if signalLevel == 1:
         newSignalLevel = 0
     else:
@@ -166,21 +442,21 @@ def buildBaseband(jsonFileName, basebandSampleRate, initialValue):
     signalLevel = initialValue
 
     # read from file (move to top level)
-    print "reading json data from file: " + jsonFileName
+    print("reading json data from file: " + jsonFileName)
     with open(jsonFileName) as jsonFile:
     #with open("../input_files/test.json") as jsonFile:
         jsonObj = json.load(jsonFile, object_pairs_hook=OrderedDict)
     print(odString(jsonObj))
     pprint(jsonObj)
 
-    print "building baseband"
+    print("building baseband")
     basebandList = []
     # start with preamble
     preambleJson = jsonObj["preamble"]
     pprint(preambleJson)
     for element in preambleJson:
         if element[0] == "arbitrary":
-            print "adding arbitrary timing"
+            print("adding arbitrary timing")
             for arbWidth in element[1]:
                 (basebandList, signalLevel) = addSamples(basebandList, signalLevel, arbWidth)
 
@@ -0,0 +1,294 @@
+# This script times the CRC, checksum and bit list functions that offline
+# analysis spends most of its time in, and tracks their speed over time.
+# Each function is timed across payload lengths (16 bits to 64 kbits),
+# batch sizes and CRC widths, with the original list based versions run
+# alongside the table driven and vectorized engines that replace them.
+#
+# The results are written as JSON, keyed by case name, holding the best
+# time per call in seconds. If a baseline file from an earlier run is
+# given, each case is compared against it and the script exits with a
+# status of 1 if any case is slower by more than the tolerance, so it
+# can be run as a check after changes. Cases found in only one of the
+# runs are listed rather than compared, and the exit status is 2 if the
+# two runs have no cases in common:
+#
+#   python crc_benchmark.py --output baseline.json
+#   python crc_benchmark.py --baseline baseline.json --tolerance 20
+#
+# --quick runs a reduced set of cases (shorter payloads, fewer repeats)
+# and --filter selects the cases whose names contain a string. Only the
+# standard library and numpy are needed, so it runs anywhere the CRC
+# code itself does.
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+import numpy as np
+
+import bit_list_utilities as blu
+import crc_custom as crc
+
+PAYLOAD_LENGTHS = [16, 256, 4096, 65536]
+QUICK_PAYLOAD_LENGTHS = [16, 256, 4096]
+BATCH_SIZES = [1, 100, 10000]
+QUICK_BATCH_SIZES = [1, 100]
+CRC_WIDTHS = [8, 16, 32, 64]
+
+# the list based crcCompute() takes about a second per megabit, so the
+# longest payloads are only run through the engines
+REFERENCE_CRC_MAX_BITS = 4096
+
+
+# times a function of no arguments, returning the best time per call of
+# repeat runs; each run makes enough calls to last at least minTime
+def timeCall(func, repeat = 5, minTime = 0.05):
+    numCalls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(numCalls):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= minTime or numCalls >= 1000000:
+            break
+        numCalls *= 2 if elapsed <= 0 else max(2, int(minTime / elapsed) + 1)
+
+    best = elapsed / numCalls
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(numCalls):
+            func()
+        best = min(best, (time.perf_counter() - start) / numCalls)
+    return best, numCalls
+
+
+def randomBits(numBits, rng):
+    return [rng.randint(0, 1) for _ in range(numBits)]
+
+
+def randomBytes(numBytes, rng):
+    return bytes(bytearray(rng.randint(0, 255) for _ in range(numBytes)))
+
+
+# returns a list of (case name, function) pairs; the data for each case
+# is built here so that only the function itself is timed
+def buildCases(quick):
+    rng = random.Random(1)
+    lengths = QUICK_PAYLOAD_LENGTHS if quick else PAYLOAD_LENGTHS
+    batchSizes = QUICK_BATCH_SIZES if quick else BATCH_SIZES
+    cases = []
+
+    # CRCs: the reference implementation against the engine, on bit
+    # lists and on packed bytes
+    for width in CRC_WIDTHS:
+        crcPoly = crc.MASTER_POLY_LIST[width][0]
+        crcArgs = dict(crcPoly=crcPoly, inputBitOrder=crc.CRC_NORM, initVal=1,
+                       reverseFinal=crc.CRC_REVERSE_FALSE, finalXOR=width*[0],
+                       padType=crc.CRC_NOPAD, padCount=0, padVal=0)
+        engine = crc.CrcEngine(**crcArgs)
+        reflectedEngine = crc.CrcEngine(**dict(crcArgs,
+                                               inputBitOrder=crc.CRC_REFLECT))
+        for numBits in lengths:
+            payload = randomBits(numBits, rng)
+            packed = blu.BitVector(payload).toBytes()
+            tag = "w{}/{}b".format(width, numBits)
+            if numBits <= REFERENCE_CRC_MAX_BITS:
+                cases.append(("crcCompute/list/" + tag,
+                              lambda p=payload, a=crcArgs:
+                              crc.crcCompute(payload=p, **a)))
+            cases.append(("CrcEngine.compute/list/" + tag,
+                          lambda p=payload, e=engine: e.compute(p)))
+            cases.append(("CrcEngine.computeInt/bytes/" + tag,
+                          lambda p=packed, e=engine: e.computeInt(p)))
+            cases.append(("CrcEngine.computeInt/bytes-reflect/" + tag,
+                          lambda p=packed, e=reflectedEngine: e.computeInt(p)))
+
+        # batches of short packets through the affine map
+        for batchSize in batchSizes:
+            payloads = np.array([randomBits(128, rng) for _ in range(batchSize)],
+                                dtype=np.uint8)
+            engine.affineMap(128)
+            tag = "w{}/128b/x{}".format(width, batchSize)
+            cases.append(("CrcEngine.computeMany/" + tag,
+                          lambda p=payloads, e=engine: e.computeMany(p)))
+            if batchSize <= 100:
+                rows = payloads.tolist()
+                cases.append(("CrcEngine.compute/loop/" + tag,
+                              lambda r=rows, e=engine: [e.compute(p) for p in r]))
+
+    # arithmetic checksums: one packet at a time against a whole batch
+    for numBits in lengths:
+        payload = randomBits(numBits, rng)
+        cases.append(("checksumCompute/{}b".format(numBits),
+                      lambda p=payload, n=numBits:
+                      crc.checksumCompute(p, 0, n - 1, numOutputBits=16)))
+    for batchSize in batchSizes:
+        payloads = np.array([randomBits(256, rng) for _ in range(batchSize)],
+                            dtype=np.uint8)
+        tag = "256b/x{}".format(batchSize)
+        cases.append(("checksumComputeMany/sum/" + tag,
+                      lambda p=payloads:
+                      crc.checksumComputeMany(p, 0, 255, numOutputBits=16)))
+        cases.append(("checksumComputeMany/fletcher/" + tag,
+                      lambda p=payloads:
+                      crc.checksumComputeMany(p, 0, 255, numOutputBits=16,
+                                              acsMethod=crc.ACS_FLETCHER)))
+        if batchSize <= 100:
+            rows = payloads.tolist()
+            cases.append(("checksumCompute/loop/" + tag,
+                          lambda r=rows: [crc.checksumCompute(p, 0, 255,
+                                                              numOutputBits=16)
+                                          for p in r]))
+
+    # bit list conversions
+    for numBits in [8, 16, 32, 64]:
+        bits = randomBits(numBits, rng)
+        value = blu.bitsToDec(bits)
+        cases.append(("bitsToDec/list/{}b".format(numBits),
+                      lambda b=bits: blu.bitsToDec(b)))
+        cases.append(("bitsToDec/BitVector/{}b".format(numBits),
+                      lambda b=blu.BitVector(bits): blu.bitsToDec(b)))
+        cases.append(("decToPaddedBits/{}b".format(numBits),
+                      lambda v=value, n=numBits: blu.decToPaddedBits(v, n)))
+        for batchSize in batchSizes:
+            bitMatrix = np.array([randomBits(numBits, rng)
+                                  for _ in range(batchSize)], dtype=np.uint8)
+            values = [rng.getrandbits(numBits) for _ in range(batchSize)]
+            tag = "{}b/x{}".format(numBits, batchSize)
+            cases.append(("bitsToDecBatch/" + tag,
+                          lambda m=bitMatrix: blu.bitsToDecBatch(m)))
+            cases.append(("decToPaddedBitsBatch/" + tag,
+                          lambda v=values, n=numBits:
+                          blu.decToPaddedBitsBatch(v, n)))
+            if batchSize <= 100:
+                rows = bitMatrix.tolist()
+                cases.append(("bitsToDec/loop/" + tag,
+                              lambda r=rows: [blu.bitsToDec(b) for b in r]))
+                cases.append(("decToPaddedBits/loop/" + tag,
+                              lambda v=values, n=numBits:
+                              [blu.decToPaddedBits(x, n) for x in v]))
+
+    for numBits in lengths:
+        numBytes = max(numBits // 8, 1)
+        data = randomBytes(numBytes, rng)
+        byteList = list(bytearray(data))
+        tag = "{}b".format(numBytes*8)
+        cases.append(("byteListToBits/list/" + tag,
+                      lambda b=byteList: blu.byteListToBits(b)))
+        cases.append(("byteListToBits/bytes/" + tag,
+                      lambda b=data: blu.byteListToBits(b)))
+
+    return cases
+
+
+# returns the sorted names of the cases run that are not in the
+# baseline, and of the baseline cases that were not run; only baseline
+# cases whose names contain nameFilter count as missing, if it is given
+def unmatchedCases(results, baseline, nameFilter = None):
+    newCases = sorted(name for name in results if name not in baseline)
+    missingCases = sorted(name for name in baseline
+                          if name not in results and
+                          (nameFilter is None or nameFilter in name))
+    return newCases, missingCases
+
+
+# compares results against a baseline, returning a list of
+# (case name, baseline time, new time, percent change) for the cases
+# that slowed down by more than tolerance percent; cases that are not
+# in both are left to unmatchedCases()
+def findRegressions(results, baseline, tolerance):
+    regressions = []
+    for name, result in sorted(results.items()):
+        if name not in baseline:
+            continue
+        baseTime = baseline[name]["seconds"]
+        newTime = result["seconds"]
+        if baseTime <= 0:
+            continue
+        change = 100.0*(newTime - baseTime)/baseTime
+        if change > tolerance:
+            regressions.append((name, baseTime, newTime, change))
+    return regressions
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the CRC, checksum and bit list functions")
+    parser.add_argument("--output", "-o", default=None,
+                        help="file to write the JSON results to")
+    parser.add_argument("--baseline", "-b", default=None,
+                        help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", "-t", type=float, default=10.0,
+                        help="percent slowdown allowed before a case counts "
+                             "as a regression (default 10)")
+    parser.add_argument("--repeat", "-r", type=int, default=5,
+                        help="number of timing runs per case (default 5)")
+    parser.add_argument("--min-time", type=float, default=0.05,
+                        help="minimum length of each timing run in seconds")
+    parser.add_argument("--quick", "-q", action="store_true",
+                        help="run a reduced set of cases")
+    parser.add_argument("--filter", "-f", default=None,
+                        help="only run cases whose names contain this string")
+    args = parser.parse_args(argv)
+
+    repeat = 2 if args.quick else args.repeat
+    minTime = args.min_time/5 if args.quick else args.min_time
+    results = {}
+    for name, func in buildCases(args.quick):
+        if args.filter is not None and args.filter not in name:
+            continue
+        seconds, numCalls = timeCall(func, repeat, minTime)
+        results[name] = {"seconds": seconds, "calls": numCalls}
+        print("{:60} {:12.3f} us".format(name, seconds*1e6))
+
+    report = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "quick": args.quick,
+        },
+        "results": results,
+    }
+    if args.output is not None:
+        with open(args.output, "w") as outFile:
+            json.dump(report, outFile, indent=2, sort_keys=True)
+
+    if args.baseline is None:
+        return 0
+    with open(args.baseline) as baselineFile:
+        baseline = json.load(baselineFile)["results"]
+    newCases, missingCases = unmatchedCases(results, baseline, args.filter)
+    if newCases:
+        print("Cases not in the baseline (not compared):")
+        for name in newCases:
+            print("  " + name)
+    if missingCases:
+        print("Baseline cases not run:")
+        for name in missingCases:
+            print("  " + name)
+    if len(newCases) == len(results):
+        print("ERROR: no cases in common with {}, nothing was "
+              "compared".format(args.baseline))
+        return 2
+
+    regressions = findRegressions(results, baseline, args.tolerance)
+    if not regressions:
+        print("No regressions beyond {}% against {} ({} cases "
+              "compared)".format(args.tolerance, args.baseline,
+                                 len(results) - len(newCases)))
+        return 0
+    print("Regressions beyond {}% against {}:".format(args.tolerance,
+                                                      args.baseline))
+    for name, baseTime, newTime, change in regressions:
+        print("  {:58} {:10.3f} -> {:10.3f} us ({:+.1f}%)".format(
+            name, baseTime*1e6, newTime*1e6, change))
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
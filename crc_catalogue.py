@@ -0,0 +1,299 @@
+# This module holds a catalogue of published CRC models, along the lines
+# of the RevEng catalogue, with each model stored as a CrcDefinition.
+# The models are described by the usual parameters:
+#   width  - number of CRC bits
+#   poly   - polynomial, without the leading one
+#   init   - register preload (CrcDefinition.initReg)
+#   refin  - True if each input byte is processed LSB first (CRC_REFLECT)
+#   refout - True if the final register is reversed (CRC_REVERSE_TRUE)
+#   xorout - final XOR
+#   check  - CRC of the ASCII string "123456789"
+#
+# The catalogue is indexed by check value, so a CRC computed by an unknown
+# device over "123456789" (or any other known payload, using
+# modelsForPayload) can be looked up directly. The CRCs of all-zero and
+# all-one payloads are indexed as well, one index per payload length,
+# built the first time that length is asked for. matchModels() tries
+# every model against a set of captured packets, which narrows an
+# unknown CRC down to a few candidates before running any brute force
+# search with crc_custom.crcIterate().
+#
+# The catalogue definitions have no data or CRC positions; use
+# crcModel() to get a copy with the packet layout filled in.
+
+import copy
+import bit_list_utilities as blu
+import crc_custom as crc
+import numpy as np
+
+CHECK_PAYLOAD = b"123456789"
+
+# (name, width, poly, init, refin, refout, xorout, check)
+CRC_MODEL_PARAMS = [
+    ("CRC-3/GSM",                  3, 0x3, 0x0, False, False, 0x7, 0x4),
+    ("CRC-3/ROHC",                 3, 0x3, 0x7, True, True, 0x0, 0x6),
+    ("CRC-4/G-704",                4, 0x3, 0x0, True, True, 0x0, 0x7),
+    ("CRC-4/INTERLAKEN",           4, 0x3, 0xf, False, False, 0xf, 0xb),
+    ("CRC-5/EPC-C1G2",             5, 0x09, 0x09, False, False, 0x00, 0x00),
+    ("CRC-5/G-704",                5, 0x15, 0x00, True, True, 0x00, 0x07),
+    ("CRC-5/USB",                  5, 0x05, 0x1f, True, True, 0x1f, 0x19),
+    ("CRC-6/CDMA2000-A",           6, 0x27, 0x3f, False, False, 0x00, 0x0d),
+    ("CRC-6/CDMA2000-B",           6, 0x07, 0x3f, False, False, 0x00, 0x3b),
+    ("CRC-6/DARC",                 6, 0x19, 0x00, True, True, 0x00, 0x26),
+    ("CRC-6/G-704",                6, 0x03, 0x00, True, True, 0x00, 0x06),
+    ("CRC-6/GSM",                  6, 0x2f, 0x00, False, False, 0x3f, 0x13),
+    ("CRC-7/MMC",                  7, 0x09, 0x00, False, False, 0x00, 0x75),
+    ("CRC-7/ROHC",                 7, 0x4f, 0x7f, True, True, 0x00, 0x53),
+    ("CRC-7/UMTS",                 7, 0x45, 0x00, False, False, 0x00, 0x61),
+    ("CRC-8/AUTOSAR",              8, 0x2f, 0xff, False, False, 0xff, 0xdf),
+    ("CRC-8/BLUETOOTH",            8, 0xa7, 0x00, True, True, 0x00, 0x26),
+    ("CRC-8/CDMA2000",             8, 0x9b, 0xff, False, False, 0x00, 0xda),
+    ("CRC-8/DARC",                 8, 0x39, 0x00, True, True, 0x00, 0x15),
+    ("CRC-8/DVB-S2",               8, 0xd5, 0x00, False, False, 0x00, 0xbc),
+    ("CRC-8/GSM-A",                8, 0x1d, 0x00, False, False, 0x00, 0x37),
+    ("CRC-8/GSM-B",                8, 0x49, 0x00, False, False, 0xff, 0x94),
+    ("CRC-8/I-432-1",              8, 0x07, 0x00, False, False, 0x55, 0xa1),
+    ("CRC-8/I-CODE",               8, 0x1d, 0xfd, False, False, 0x00, 0x7e),
+    ("CRC-8/LTE",                  8, 0x9b, 0x00, False, False, 0x00, 0xea),
+    ("CRC-8/MAXIM-DOW",            8, 0x31, 0x00, True, True, 0x00, 0xa1),
+    ("CRC-8/MIFARE-MAD",           8, 0x1d, 0xc7, False, False, 0x00, 0x99),
+    ("CRC-8/NRSC-5",               8, 0x31, 0xff, False, False, 0x00, 0xf7),
+    ("CRC-8/OPENSAFETY",           8, 0x2f, 0x00, False, False, 0x00, 0x3e),
+    ("CRC-8/ROHC",                 8, 0x07, 0xff, True, True, 0x00, 0xd0),
+    ("CRC-8/SAE-J1850",            8, 0x1d, 0xff, False, False, 0xff, 0x4b),
+    ("CRC-8/SMBUS",                8, 0x07, 0x00, False, False, 0x00, 0xf4),
+    ("CRC-8/TECH-3250",            8, 0x1d, 0xff, True, True, 0x00, 0x97),
+    ("CRC-8/WCDMA",                8, 0x9b, 0x00, True, True, 0x00, 0x25),
+    ("CRC-10/ATM",                10, 0x233, 0x000, False, False, 0x000, 0x199),
+    ("CRC-10/CDMA2000",           10, 0x3d9, 0x3ff, False, False, 0x000, 0x233),
+    ("CRC-10/GSM",                10, 0x175, 0x000, False, False, 0x3ff, 0x12a),
+    ("CRC-11/FLEXRAY",            11, 0x385, 0x01a, False, False, 0x000, 0x5a3),
+    ("CRC-11/UMTS",               11, 0x307, 0x000, False, False, 0x000, 0x061),
+    ("CRC-12/CDMA2000",           12, 0xf13, 0xfff, False, False, 0x000, 0xd4d),
+    ("CRC-12/DECT",               12, 0x80f, 0x000, False, False, 0x000, 0xf5b),
+    ("CRC-12/GSM",                12, 0xd31, 0x000, False, False, 0xfff, 0xb34),
+    ("CRC-12/UMTS",               12, 0x80f, 0x000, False, True, 0x000, 0xdaf),
+    ("CRC-13/BBC",                13, 0x1cf5, 0x0000, False, False, 0x0000, 0x04fa),
+    ("CRC-14/DARC",               14, 0x0805, 0x0000, True, True, 0x0000, 0x082d),
+    ("CRC-14/GSM",                14, 0x202d, 0x0000, False, False, 0x3fff, 0x30ae),
+    ("CRC-15/CAN",                15, 0x4599, 0x0000, False, False, 0x0000, 0x059e),
+    ("CRC-15/MPT1327",            15, 0x6815, 0x0000, False, False, 0x0001, 0x2566),
+    ("CRC-16/ARC",                16, 0x8005, 0x0000, True, True, 0x0000, 0xbb3d),
+    ("CRC-16/CDMA2000",           16, 0xc867, 0xffff, False, False, 0x0000, 0x4c06),
+    ("CRC-16/CMS",                16, 0x8005, 0xffff, False, False, 0x0000, 0xaee7),
+    ("CRC-16/DDS-110",            16, 0x8005, 0x800d, False, False, 0x0000, 0x9ecf),
+    ("CRC-16/DECT-R",             16, 0x0589, 0x0000, False, False, 0x0001, 0x007e),
+    ("CRC-16/DECT-X",             16, 0x0589, 0x0000, False, False, 0x0000, 0x007f),
+    ("CRC-16/DNP",                16, 0x3d65, 0x0000, True, True, 0xffff, 0xea82),
+    ("CRC-16/EN-13757",           16, 0x3d65, 0x0000, False, False, 0xffff, 0xc2b7),
+    ("CRC-16/GENIBUS",            16, 0x1021, 0xffff, False, False, 0xffff, 0xd64e),
+    ("CRC-16/GSM",                16, 0x1021, 0x0000, False, False, 0xffff, 0xce3c),
+    ("CRC-16/IBM-3740",           16, 0x1021, 0xffff, False, False, 0x0000, 0x29b1),
+    ("CRC-16/IBM-SDLC",           16, 0x1021, 0xffff, True, True, 0xffff, 0x906e),
+    ("CRC-16/ISO-IEC-14443-3-A",  16, 0x1021, 0xc6c6, True, True, 0x0000, 0xbf05),
+    ("CRC-16/KERMIT",             16, 0x1021, 0x0000, True, True, 0x0000, 0x2189),
+    ("CRC-16/LJ1200",             16, 0x6f63, 0x0000, False, False, 0x0000, 0xbdf4),
+    ("CRC-16/M17",                16, 0x5935, 0xffff, False, False, 0x0000, 0x772b),
+    ("CRC-16/MAXIM-DOW",          16, 0x8005, 0x0000, True, True, 0xffff, 0x44c2),
+    ("CRC-16/MCRF4XX",            16, 0x1021, 0xffff, True, True, 0x0000, 0x6f91),
+    ("CRC-16/MODBUS",             16, 0x8005, 0xffff, True, True, 0x0000, 0x4b37),
+    ("CRC-16/NRSC-5",             16, 0x080b, 0xffff, True, True, 0x0000, 0xa066),
+    ("CRC-16/OPENSAFETY-A",       16, 0x5935, 0x0000, False, False, 0x0000, 0x5d38),
+    ("CRC-16/OPENSAFETY-B",       16, 0x755b, 0x0000, False, False, 0x0000, 0x20fe),
+    ("CRC-16/PROFIBUS",           16, 0x1dcf, 0xffff, False, False, 0xffff, 0xa819),
+    ("CRC-16/RIELLO",             16, 0x1021, 0xb2aa, True, True, 0x0000, 0x63d0),
+    ("CRC-16/SPI-FUJITSU",        16, 0x1021, 0x1d0f, False, False, 0x0000, 0xe5cc),
+    ("CRC-16/T10-DIF",            16, 0x8bb7, 0x0000, False, False, 0x0000, 0xd0db),
+    ("CRC-16/TELEDISK",           16, 0xa097, 0x0000, False, False, 0x0000, 0x0fb3),
+    ("CRC-16/TMS37157",           16, 0x1021, 0x89ec, True, True, 0x0000, 0x26b1),
+    ("CRC-16/UMTS",               16, 0x8005, 0x0000, False, False, 0x0000, 0xfee8),
+    ("CRC-16/USB",                16, 0x8005, 0xffff, True, True, 0xffff, 0xb4c8),
+    ("CRC-16/XMODEM",             16, 0x1021, 0x0000, False, False, 0x0000, 0x31c3),
+    ("CRC-17/CAN-FD",             17, 0x1685b, 0x00000, False, False, 0x00000, 0x04f03),
+    ("CRC-21/CAN-FD",             21, 0x102899, 0x000000, False, False, 0x000000, 0x0ed841),
+    ("CRC-24/BLE",                24, 0x00065b, 0x555555, True, True, 0x000000, 0xc25a56),
+    ("CRC-24/FLEXRAY-A",          24, 0x5d6dcb, 0xfedcba, False, False, 0x000000, 0x7979bd),
+    ("CRC-24/FLEXRAY-B",          24, 0x5d6dcb, 0xabcdef, False, False, 0x000000, 0x1f23b8),
+    ("CRC-24/INTERLAKEN",         24, 0x328b63, 0xffffff, False, False, 0xffffff, 0xb4f3e6),
+    ("CRC-24/LTE-A",              24, 0x864cfb, 0x000000, False, False, 0x000000, 0xcde703),
+    ("CRC-24/LTE-B",              24, 0x800063, 0x000000, False, False, 0x000000, 0x23ef52),
+    ("CRC-24/OPENPGP",            24, 0x864cfb, 0xb704ce, False, False, 0x000000, 0x21cf02),
+    ("CRC-24/OS-9",               24, 0x800063, 0xffffff, False, False, 0xffffff, 0x200fa5),
+    ("CRC-30/CDMA",               30, 0x2030b9c7, 0x3fffffff, False, False, 0x3fffffff, 0x04c34abf),
+    ("CRC-31/PHILIPS",            31, 0x04c11db7, 0x7fffffff, False, False, 0x7fffffff, 0x0ce9e46c),
+    ("CRC-32/AIXM",               32, 0x814141ab, 0x00000000, False, False, 0x00000000, 0x3010bf7f),
+    ("CRC-32/AUTOSAR",            32, 0xf4acfb13, 0xffffffff, True, True, 0xffffffff, 0x1697d06a),
+    ("CRC-32/BASE91-D",           32, 0xa833982b, 0xffffffff, True, True, 0xffffffff, 0x87315576),
+    ("CRC-32/BZIP2",              32, 0x04c11db7, 0xffffffff, False, False, 0xffffffff, 0xfc891918),
+    ("CRC-32/CD-ROM-EDC",         32, 0x8001801b, 0x00000000, True, True, 0x00000000, 0x6ec2edc4),
+    ("CRC-32/CKSUM",              32, 0x04c11db7, 0x00000000, False, False, 0xffffffff, 0x765e7680),
+    ("CRC-32/ISCSI",              32, 0x1edc6f41, 0xffffffff, True, True, 0xffffffff, 0xe3069283),
+    ("CRC-32/ISO-HDLC",           32, 0x04c11db7, 0xffffffff, True, True, 0xffffffff, 0xcbf43926),
+    ("CRC-32/JAMCRC",             32, 0x04c11db7, 0xffffffff, True, True, 0x00000000, 0x340bc6d9),
+    ("CRC-32/MEF",                32, 0x741b8cd7, 0xffffffff, True, True, 0x00000000, 0xd2c22f51),
+    ("CRC-32/MPEG-2",             32, 0x04c11db7, 0xffffffff, False, False, 0x00000000, 0x0376e6e7),
+    ("CRC-32/XFER",               32, 0x000000af, 0x00000000, False, False, 0x00000000, 0xbd0be338),
+    ("CRC-40/GSM",                40, 0x0004820009, 0x0000000000, False, False, 0xffffffffff, 0xd4164fc646),
+    ("CRC-64/ECMA-182",           64, 0x42f0e1eba9ea3693, 0x0000000000000000, False, False, 0x0000000000000000, 0x6c40df5f0b497347),
+    ("CRC-64/GO-ISO",             64, 0x000000000000001b, 0xffffffffffffffff, True, True, 0xffffffffffffffff, 0xb90956c775a41001),
+    ("CRC-64/MS",                 64, 0x259c84cba6426349, 0xffffffffffffffff, True, True, 0x0000000000000000, 0x75d4b74f024eceea),
+    ("CRC-64/WE",                 64, 0x42f0e1eba9ea3693, 0xffffffffffffffff, False, False, 0xffffffffffffffff, 0x62ec59e3f1a4f00a),
+    ("CRC-64/XZ",                 64, 0x42f0e1eba9ea3693, 0xffffffffffffffff, True, True, 0xffffffffffffffff, 0x995dc9bbdf1939fa),
+    ("CRC-82/DARC",               82, 0x0308c0111011401440411, 0x0, True, True, 0x0, 0x09ea83f625023801fd612),
+]
+
+
+# builds a CrcDefinition from the catalogue parameters of a model
+def _modelDefinition(width, poly, init, refin, refout, xorout):
+    crcDef = crc.CrcDefinition(
+        crcLen=width,
+        crcPoly=[1] + blu.decToPaddedBits(poly, width),
+        dataStart=0,
+        dataStop=0,
+        inputBitOrder=crc.CRC_REFLECT if refin else crc.CRC_NORM,
+        initVal=0,
+        reverseFinal=crc.CRC_REVERSE_TRUE if refout else crc.CRC_REVERSE_FALSE,
+        finalXOR=blu.decToPaddedBits(xorout, width),
+        padType=crc.CRC_NOPAD,
+        padCount=0,
+        padVal=0,
+        initReg=blu.decToPaddedBits(init, width) if init else None)
+    return crcDef
+
+
+# the catalogue itself, mapping each model name to its CrcDefinition,
+# in the order of CRC_MODEL_PARAMS; CHECK_VALUES holds the published
+# check value of each
+CRC_MODELS = {}
+CRC_MODEL_NAMES = []
+CHECK_VALUES = {}
+for _params in CRC_MODEL_PARAMS:
+    _name = _params[0]
+    CRC_MODELS[_name] = _modelDefinition(*_params[1:7])
+    CRC_MODELS[_name].name = _name
+    CRC_MODEL_NAMES.append(_name)
+    CHECK_VALUES[_name] = _params[7]
+
+# index from (width, check value) to the names of the models producing it
+CHECK_INDEX = {}
+for _params in CRC_MODEL_PARAMS:
+    CHECK_INDEX.setdefault((_params[1], _params[7]), []).append(_params[0])
+
+
+# returns the CRC of a payload (a bytes object or a bit list) under the
+# named model, as an integer
+def modelCRC(name, payload):
+    return CRC_MODELS[name].compile().computeInt(payload)
+
+
+# returns a copy of the named model with the packet layout filled in
+def crcModel(name, dataStart, dataStop, crcStart, crcStop):
+    crcDef = copy.deepcopy(CRC_MODELS[name])
+    crcDef.crcEngine = None
+    crcDef.dataStart = dataStart
+    crcDef.dataStop = dataStop
+    crcDef.crcStart = crcStart
+    crcDef.crcStop = crcStop
+    return crcDef
+
+
+# returns a list of the names of models whose check value (the CRC of
+# "123456789") is checkValue; width narrows the search to CRCs of that
+# width, which avoids matches between CRCs of different lengths
+def modelsForCheck(checkValue, width = None):
+    if width is not None:
+        return list(CHECK_INDEX.get((width, checkValue), []))
+    return [name for name in CRC_MODEL_NAMES
+            if CHECK_VALUES[name] == checkValue]
+
+
+# indexes of the CRCs of all-zero and all-one payloads, keyed by the
+# payload length in bits and built on first use
+_ZERO_INDEXES = {}
+_ONES_INDEXES = {}
+
+def _vectorIndex(indexes, numBits, bitVal):
+    if numBits not in indexes:
+        payload = np.full(numBits, bitVal, dtype=np.uint8)
+        index = {}
+        for name in CRC_MODEL_NAMES:
+            key = (CRC_MODELS[name].crcLen, modelCRC(name, payload))
+            index.setdefault(key, []).append(name)
+        indexes[numBits] = index
+    return indexes[numBits]
+
+
+# returns a list of the names of models that give crcValue for a
+# payload of numBits zeros
+def modelsForZeros(crcValue, numBits, width):
+    return list(_vectorIndex(_ZERO_INDEXES, numBits, 0).get((width, crcValue), []))
+
+
+# returns a list of the names of models that give crcValue for a
+# payload of numBits ones
+def modelsForOnes(crcValue, numBits, width):
+    return list(_vectorIndex(_ONES_INDEXES, numBits, 1).get((width, crcValue), []))
+
+
+# returns a list of the names of models that give crcValue for any
+# known payload; this computes every model of the right width, so use
+# modelsForCheck() when the payload is "123456789"
+def modelsForPayload(payload, crcValue, width):
+    if isinstance(payload, (bytes, bytearray)) and bytes(payload) == CHECK_PAYLOAD:
+        return modelsForCheck(crcValue, width)
+    return [name for name in CRC_MODEL_NAMES
+            if CRC_MODELS[name].crcLen == width and
+            modelCRC(name, payload) == crcValue]
+
+
+# Tries every catalogue model of the CRC's width against a set of
+# packets with the given layout, returning a list of (name, match count)
+# pairs for the models that matched at least minMatches packets (by
+# default, all of them), best first.
+#
+# If ignoreFinalXOR is True, a model also counts a packet as matched when
+# its CRC differs from the observed one by the final XOR that most of
+# the packets share, which finds CRCs that use a published polynomial,
+# init and reflection with a different final XOR (or a constant header
+# inside the data range). For packets of a single length a different
+# init is absorbed the same way, so models that differ only in init and
+# final XOR tie. The inferred XOR is returned with each match, as
+# (name, match count, final XOR bits).
+def matchModels(dataListofLists, dataStart, dataStop, crcStart, crcStop,
+                minMatches = None, ignoreFinalXOR = False):
+    width = crcStop - crcStart + 1
+    if minMatches is None:
+        minMatches = len(dataListofLists)
+
+    matches = []
+    for name in CRC_MODEL_NAMES:
+        if CRC_MODELS[name].crcLen != width:
+            continue
+        crcDef = crcModel(name, dataStart, dataStop, crcStart, crcStop)
+        if not ignoreFinalXOR:
+            matchCount = int(np.sum(crcDef.checkCRCMany(dataListofLists)))
+            if matchCount >= minMatches:
+                matches.append((name, matchCount))
+            continue
+
+        computed = crcDef.computeCRCMany(dataListofLists)
+        observed = np.zeros_like(computed)
+        for i, packet in enumerate(dataListofLists):
+            # negative indices count back from the end of each packet,
+            # as they do in checkCRCMany()
+            _, _, packetCrcStart, packetCrcStop = \
+                crcDef.fieldIndices(len(packet))
+            crcBits = list(packet[packetCrcStart:packetCrcStop+1])
+            if len(crcBits) == width:
+                observed[i] = crcBits
+        differences, _ = blu.bitsToDecBatch(computed ^ observed)
+        xorVals, xorCounts = np.unique(differences, return_counts=True)
+        matchCount = int(xorCounts.max()) if len(xorCounts) else 0
+        if matchCount >= minMatches:
+            xorDiff = int(xorVals[xorCounts.argmax()])
+            finalXOR = [bit ^ diffBit for bit, diffBit in zip(
+                crcDef.finalXOR, blu.decToPaddedBits(xorDiff, width))]
+            matches.append((name, matchCount, finalXOR))
+
+    matches.sort(key=lambda match: -match[1])
+    return matches
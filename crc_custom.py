@@ -1,6 +1,11 @@
 
 import bit_list_utilities as blu
+import collections
 import itertools 
+import multiprocessing
+import numpy as np
+import os
+import tempfile
 
 # CRC input bit order
 CRC_NORM = 0 # data bits are processed from MSB to LSB
@@ -25,13 +30,29 @@ CRC_PAD_TO_EVEN = 1 # pad packet to an even multiple of the pad count
 CRC_PAD_ABS = 2 # pad packet with pad count worth of bits
 CRC_PAD_OPTIONS = [CRC_NOPAD, CRC_PAD_TO_EVEN, CRC_PAD_ABS]
 
+# arithmetic checksum methods (see checksumComputeMany)
+ACS_SUM = 0
+ACS_XOR = 1
+ACS_ONES_COMPLEMENT = 2
+ACS_TWOS_COMPLEMENT = 3
+ACS_FLETCHER = 4
+ACS_ADLER = 5
+ACS_METHOD_OPTIONS = [ACS_SUM, ACS_XOR, ACS_ONES_COMPLEMENT,
+                      ACS_TWOS_COMPLEMENT, ACS_FLETCHER, ACS_ADLER]
+
+# results of CrcDefinition.correctCRC()
+CRC_CORRECT_OK = 0 # the CRC matched, nothing to correct
+CRC_CORRECT_FIXED = 1 # a unique error pattern was found and corrected
+CRC_CORRECT_AMBIGUOUS = 2 # more than one error pattern fits the CRC
+CRC_CORRECT_FAILED = 3 # no error pattern of up to maxErrors bits fits
+
 MASTER_CRC_OPTIONS = list(itertools.product(CRC_BIT_ORDER_OPTIONS, 
                                             CRC_INIT_OPTIONS,
                                             CRC_REVERSE_FINAL_OPTIONS))
 
 # initialize master poly list, which contains a list of common
 # polynomials indexed by length
-MASTER_POLY_LIST = [list([]) for _ in xrange(65)]
+MASTER_POLY_LIST = [list([]) for _ in range(65)]
  
 # Common CRC Polynomials
 POLY_3_GSM = [1,0,1,1]
@@ -138,10 +159,23 @@ POLY_64_ECMA = [1] + blu.decToPaddedBits(intVal=0x42F0E1EBA9EA3693, numBits=64)
 POLY_64_ISO  = [1] + blu.decToPaddedBits(intVal=0x000000000000001B, numBits=64)
 MASTER_POLY_LIST[64] = [POLY_64_ECMA, POLY_64_ISO]
 
+# returns bits start...stop (inclusive) of a packet, or of every row of
+# a packet matrix; as in Python, negative indices count back from the
+# end of the packet, so a stop of -1 is the last bit
+def _fieldSlice(data, start, stop):
+    if isinstance(data, np.ndarray) and data.ndim == 2:
+        return data[:, start:stop + 1 or None]
+    return data[start:stop + 1 or None]
+
+
 # This class defines all of the parameters of a CRC, and is easier to pass
 # into and out of functions than a set of variables. It is also possible to 
 # assign lists to each of the variables and use as an input to the 
 # brute force crc discovery functions  
+#
+# The data and CRC indices can be negative, counting back from the end
+# of the packet (-1 is the last bit), which places the fields in packets
+# of differing lengths, such as a CRC at the end of each packet.
 class CrcDefinition:
     crcLen = 2
     crcPoly = [1, 0, 1]
@@ -156,11 +190,14 @@ class CrcDefinition:
     padType = CRC_NOPAD
     padCount = 0
     padVal = 0
+    initReg = None
+    crcEngine = None
+    matchCount = 0
     
     def __init__(self, crcLen, crcPoly, dataStart, dataStop,
                  inputBitOrder, initVal, reverseFinal,
                  finalXOR, padType, padCount, padVal,
-                 crcStart = 0, crcStop = 0):
+                 crcStart = 0, crcStop = 0, initReg = None):
             self.crcLen = crcLen
             self.crcPoly = crcPoly
             self.dataStart = dataStart
@@ -174,38 +211,195 @@ class CrcDefinition:
             self.padVal = padVal
             self.crcStart = crcStart
             self.crcStop = crcStop
+            self.initReg = initReg
 
     
+    # returns a table-driven CrcEngine built from the CRC parameters;
+    # the engine is kept with the object and only rebuilt when one of
+    # the parameters has changed
+    def compile(self):
+        params = (tuple(self.crcPoly), self.inputBitOrder, self.initVal,
+                  self.reverseFinal, tuple(self.finalXOR), self.padType,
+                  self.padCount, self.padVal, tuple(self.initReg or ()))
+        if self.crcEngine is None or self.crcEngine.params != params:
+            self.crcEngine = CrcEngine(*params)
+        return self.crcEngine
+
+    # returns (dataStart, dataStop, crcStart, crcStop) for a packet of
+    # packetLen bits, with any negative indices made positive
+    def fieldIndices(self, packetLen):
+        return tuple(index + packetLen if index < 0 else index
+                     for index in (self.dataStart, self.dataStop,
+                                   self.crcStart, self.crcStop))
+
     # computes CRC of the specified dataStart...dataStop range using
     # the CRC definition; use this when you want to generate a CRC
     def computeCRC(self, inputData):
-        return crcCompute(payload=inputData[self.dataStart:self.dataStop+1],
-                          crcPoly=self.crcPoly,
-                          inputBitOrder=self.inputBitOrder,
-                          initVal=self.initVal,
-                          reverseFinal=self.reverseFinal,
-                          finalXOR=self.finalXOR,
-                          padType=self.padType,
-                          padCount=self.padCount,
-                          padVal=self.padVal)
+        return self.compile().compute(
+            _fieldSlice(inputData, self.dataStart, self.dataStop))
 
 
     # if your data already contains a CRC and you want to check it,
     # make sure the crcStart...crcStop indices are defined and 
     # run this function
     def checkCRC(self, inputData):
-        crcObserved = inputData[self.crcStart:self.crcStop+1]
-        crcComputed = crcCompute(payload=inputData[self.dataStart:self.dataStop+1],
-                                 crcPoly=self.crcPoly,
-                                 inputBitOrder=self.inputBitOrder,
-                                 initVal=self.initVal,
-                                 reverseFinal=self.reverseFinal,
-                                 finalXOR=self.finalXOR,
-                                 padType=self.padType,
-                                 padCount=self.padCount,
-                                 padVal=self.padVal)
+        crcObserved = list(_fieldSlice(inputData, self.crcStart, self.crcStop))
+        crcComputed = self.computeCRC(inputData)
         return crcObserved == crcComputed 
     
+    # computes the CRC of many packets at once; the packets can be given
+    # as a 2-D array with one packet per row, or as a list of packets,
+    # which are grouped by length and computed one group at a time.
+    # Returns a (packets x CRC bits) matrix
+    def computeCRCMany(self, packets):
+        engine = self.compile()
+        crcMatrix = None
+        for indices, packetMatrix in _packetGroups(packets):
+            computed = engine.computeMany(
+                _fieldSlice(packetMatrix, self.dataStart, self.dataStop))
+            if crcMatrix is None:
+                crcMatrix = np.zeros((_packetCount(packets), engine.outLen),
+                                     dtype=np.uint8)
+            crcMatrix[indices] = computed
+        if crcMatrix is None:
+            crcMatrix = np.zeros((0, engine.outLen), dtype=np.uint8)
+        return crcMatrix
+
+    # checks the CRC of many packets at once, returning an array with
+    # one boolean per packet; see computeCRCMany() for the input format
+    def checkCRCMany(self, packets):
+        engine = self.compile()
+        results = np.zeros(_packetCount(packets), dtype=bool)
+        for indices, packetMatrix in _packetGroups(packets):
+            crcObserved = _fieldSlice(packetMatrix, self.crcStart, self.crcStop)
+            if crcObserved.shape[1] != engine.outLen:
+                continue
+            crcComputed = engine.computeMany(
+                _fieldSlice(packetMatrix, self.dataStart, self.dataStop))
+            results[indices] = np.all(crcObserved == crcComputed, axis=1)
+        return results
+
+    # Attempts to repair a packet whose CRC does not match, assuming that
+    # at most maxErrors bits of the data and CRC fields are in error. The
+    # difference between the observed and computed CRCs (the syndrome)
+    # is looked up in tables of the syndromes of every pattern of up to
+    # maxErrors errors, built once per payload length, so each packet
+    # costs one CRC and a dictionary lookup. Patterns with fewer errors
+    # take precedence. Returns a tuple of:
+    #   status     - one of the CRC_CORRECT_* values
+    #   packet     - a copy of the packet as a bit list, with the errors
+    #                corrected if the status is CRC_CORRECT_FIXED
+    #   candidates - list of tuples of the packet indices of the errors;
+    #                empty for CRC_CORRECT_FAILED and a single empty tuple
+    #                for CRC_CORRECT_OK
+    # The tables grow with the square of the packet length for
+    # maxErrors=2 and the cube for maxErrors=3.
+    def correctCRC(self, inputData, maxErrors = 2):
+        packet = list(inputData)
+        engine = self.compile()
+        dataStart, dataStop, crcStart, crcStop = self.fieldIndices(len(packet))
+        crcObserved = _fieldSlice(packet, crcStart, crcStop)
+        if len(crcObserved) != engine.outLen:
+            return CRC_CORRECT_FAILED, packet, []
+        crcComputed = self.computeCRC(packet)
+        syndrome = blu.bitsToDec(crcObserved) ^ blu.bitsToDec(crcComputed)
+        if syndrome == 0:
+            return CRC_CORRECT_OK, packet, [()]
+
+        payloadLen = len(_fieldSlice(packet, dataStart, dataStop))
+        for table in engine.syndromeTables(payloadLen, maxErrors):
+            patterns = table.get(syndrome, [])
+            candidates = [tuple(dataStart + pos if pos < payloadLen
+                                else crcStart + pos - payloadLen
+                                for pos in pattern)
+                          for pattern in patterns]
+            if len(candidates) == 1:
+                for index in candidates[0]:
+                    packet[index] ^= 1
+                return CRC_CORRECT_FIXED, packet, candidates
+            if len(candidates) > 1:
+                return CRC_CORRECT_AMBIGUOUS, packet, candidates
+        return CRC_CORRECT_FAILED, packet, []
+
+    # Builds a set of packets that are copies of inputData apart from one
+    # field, which takes each of the values in valueList in turn, with the
+    # CRC of each packet filled in. The field is given as a list of packet
+    # indices, MSB first, as for blu.extractDisjointedBits(). Since the CRC
+    # is linear, the CRC of the base packet is computed once and each new
+    # CRC is the base CRC XORed with the contribution of the field bits
+    # that changed, which is done for all of the packets in one matrix
+    # product. Returns a (values x packet bits) uint8 matrix; each row,
+    # converted with tolist(), is ready to be turned into a baseband for
+    # rf_mod.fsk_hop_tx_flowgraph.fill_queue_vector()
+    def sweepCRC(self, inputData, fieldIndexList, valueList):
+        basePacket = np.array(list(inputData), dtype=np.uint8)
+        dataStart, dataStop, crcStart, crcStop = \
+            self.fieldIndices(len(basePacket))
+        fieldIndices = np.asarray(fieldIndexList, dtype=np.int64)
+        fieldIndices = np.where(fieldIndices < 0,
+                                fieldIndices + len(basePacket), fieldIndices)
+        if np.any((fieldIndices >= crcStart) & (fieldIndices <= crcStop)):
+            raise ValueError("the swept field overlaps the CRC")
+        fieldBits, valid = blu.decToPaddedBitsBatch(valueList, len(fieldIndices))
+        if not np.all(valid):
+            raise ValueError("sweep values do not fit in the field")
+
+        packets = np.repeat(basePacket[np.newaxis, :], len(fieldBits), axis=0)
+        packets[:, fieldIndices] = fieldBits
+        crcBits = np.array(self.computeCRC(basePacket.tolist()), dtype=np.uint8)
+
+        # only field bits inside the data range change the CRC
+        payloadLen = len(_fieldSlice(basePacket, dataStart, dataStop))
+        rows, _ = self.compile().affineMap(payloadLen)
+        inData = (fieldIndices >= dataStart) & \
+                 (fieldIndices < dataStart + payloadLen)
+        changed = fieldBits[:, inData] ^ basePacket[fieldIndices[inData]]
+        fieldRows = rows[fieldIndices[inData] - dataStart]
+        # float32 matrix products are exact for sums below 2**24
+        crcDelta = np.dot(changed.astype(np.float32),
+                          fieldRows.astype(np.float32))
+        packets[:, crcStart:crcStop+1] = \
+            (crcDelta.astype(np.int64) & 1).astype(np.uint8) ^ crcBits
+        return packets
+
+    # Chooses values for the filler bits (a list of packet indices inside
+    # the data range) so that the packet's CRC becomes targetCrc, given as
+    # a bit list or an integer. The change to the CRC caused by each
+    # filler bit is known from the CRC's linearity, so the filler is found
+    # by solving a set of equations over GF(2) rather than by searching;
+    # at least as many filler bits as CRC bits are usually needed. Filler
+    # bits that are not needed keep their values from inputData.
+    # Returns the packet as a bit list with the filler and the target CRC
+    # written in, or None if no setting of the filler gives the target
+    def forgeCRC(self, inputData, fillerIndexList, targetCrc):
+        packet = list(inputData)
+        engine = self.compile()
+        if not isinstance(targetCrc, int):
+            targetCrc = blu.bitsToDec(list(targetCrc))
+
+        dataStart, dataStop, crcStart, crcStop = self.fieldIndices(len(packet))
+        fillerIndexList = [index + len(packet) if index < 0 else index
+                           for index in fillerIndexList]
+        payloadLen = len(_fieldSlice(packet, dataStart, dataStop))
+        rows, _ = engine.affineMap(payloadLen)
+        columns = []
+        for index in fillerIndexList:
+            if dataStart <= index < dataStart + payloadLen:
+                columns.append(blu.bitsToDec(rows[index - dataStart].tolist()))
+            else:
+                columns.append(0)
+        needed = targetCrc ^ blu.bitsToDec(self.computeCRC(packet))
+        flips = _gf2Solve(columns, needed)
+        if flips is None:
+            return None
+
+        for i, index in enumerate(fillerIndexList):
+            if (flips >> i) & 1:
+                packet[index] ^= 1
+        packet[crcStart:crcStop+1] = \
+            blu.decToPaddedBits(targetCrc, engine.outLen)
+        return packet
+
     # generates a string containing the CRC properties stored in the object
     def crcPropertiesString(self):
         str  = "CRC Properties:\n"
@@ -218,6 +412,7 @@ class CrcDefinition:
         str += "  Pad Type = {}\n".format(self.padType)
         str += "  Pad Count = {}\n".format(self.padCount)
         str += "  Pad Value = {}\n".format(self.padVal)
+        str += "  Initial Register = {}\n".format(self.initReg)
         str += "  Indices:\n"
         str += "    CRC Start  = {:3}\n".format(self.crcStart)
         str += "    CRC Stop   = {:3}\n".format(self.crcStop)        
@@ -228,73 +423,60 @@ class CrcDefinition:
         
     # if you have set the variables in this object to lists of possible values,
     # this function then iterates over all of these CRC properies and tries them
-    # out on the list of input data values; after iterating through all of the
-    # possibilities, it returns the most successful options 
-    def crcIterate(self, inputDataList, verbose):
-        solutionSpace = list(itertools.product(MASTER_POLY_LIST[self.crcLen],
-                                          self.inputBitOrder,
-                                          self.initVal,
-                                          self.reverseFinal,
-                                          self.finalXOR,
-                                          self.PadType,
-                                          self.PadCount,
-                                          self.PadVal,
-                                          self.crcStart,
-                                          self.crcStop,
-                                          self.dataStart,
-                                          self.dataStop))
-        
-        masterSuccessList = []
-        for crcPoly, inputBitOrder, initVal, reverseFinal,\
-            finalXOR, padType, PadCount, PadVal,\
-            crcStart, crcStop, dataStart, dataStop in solutionSpace:
-            
-            successList = []
-            for inputData in inputDataList:
-                crcObserved = inputData[crcStart:crcStop+1]
-                crcComputed = crcCompute(payload=inputData[dataStart:dataStop+1],
-                                         crcPoly=crcPoly,
-                                         inputBitOrder=inputBitOrder,
-                                         initVal=initVal,
-                                         reverseFinal=reverseFinal,
-                                         finalXOR=finalXOR,
-                                         padType=padType,
-                                         padCount=padCount,
-                                         padVal=padVal)
-                successList.append(crcObserved == crcComputed)
-                
-            masterSuccessList.append(successList)
-
-        # go through results and determine the most successful attempt
-        successCount = []
-        for successList in masterSuccessList:
-            successCount.append(sum(int(successList)))
-        
-        # this returns the index of the best attempt
-        indexOfBest = successCount.index(max(successCount))
+    # out on the list of input data values; it returns a list of CrcDefinition
+    # objects for the most successful options, best first (see the module
+    # level crcIterate() function for details)
+    def crcIterate(self, inputDataList, verbose = False, processes = None):
+        return crcIterate(dataListofLists=inputDataList,
+                          dataStartList=_optionList(self.dataStart),
+                          dataStopList=_optionList(self.dataStop),
+                          crcPolyLen=self.crcLen,
+                          crcPolyList=_bitListOptions(self.crcPoly),
+                          inputBitOrderList=_optionList(self.inputBitOrder),
+                          initValList=_optionList(self.initVal),
+                          reverseFinalList=_optionList(self.reverseFinal),
+                          finalXORList=_bitListOptions(self.finalXOR),
+                          padTypeList=_optionList(self.padType),
+                          padCountList=_optionList(self.padCount),
+                          padValList=_optionList(self.padVal),
+                          crcStartList=_optionList(self.crcStart),
+                          crcStopList=_optionList(self.crcStop),
+                          processes=processes,
+                          verbose=verbose)
 
-        # display the results of the most successful attempts
-        if verbose:
-            print("Successes: {} at index = {}".format(max(successCount), indexOfBest))
-            print(masterSuccessList)
-            
-        # return a CRC object containing the parameters of the most successful
-        # need to acess the solution space with the index and get the values
-        print(solutionSpace[indexOfBest])
-        return 0
+
+# wraps a single value in a list so it can be used as a list of options
+def _optionList(value):
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+# same as _optionList(), but for values that are themselves bit lists
+# (polynomials and final XOR masks); an empty list stays empty
+def _bitListOptions(value):
+    if len(value) > 0 and isinstance(value[0], (list, tuple)):
+        return [list(bits) for bits in value]
+    if len(value) == 0:
+        return []
+    return [list(value)]
 
 
 class AcsDefinition():
-    dataStart = 0,
-    dataStop = 0, 
-    acsStart = 0,
-    acsStop = 0,
-    dataInvert = False, 
-    dataReverse = CRC_REVERSE_FALSE, 
-    numOutputBits = 8, 
+    dataStart = 0
+    dataStop = 0
+    acsStart = 0
+    acsStop = 0
+    dataInvert = False
+    dataReverse = CRC_REVERSE_FALSE
+    numOutputBits = 8
     initSum = 0
+    acsMethod = ACS_SUM
+    wordBits = 8
+    matchCount = 0
     
-    def __init__(self, dataStart, dataStop, dataInvert, dataReverse, numOutputBits, initSum, acsStart, acsStop):
+    def __init__(self, dataStart, dataStop, dataInvert, dataReverse, numOutputBits, initSum, acsStart, acsStop,
+                 acsMethod = ACS_SUM, wordBits = 8):
         self.dataStart = dataStart
         self.dataStop = dataStop
         self.dataInvert = dataInvert 
@@ -303,6 +485,8 @@ class AcsDefinition():
         self.initSum = initSum
         self.acsStart = acsStart
         self.acsStop = acsStop
+        self.acsMethod = acsMethod
+        self.wordBits = wordBits
         
         
     def computeACS(self, inputData):
@@ -312,24 +496,41 @@ class AcsDefinition():
                                dataInvert=self.dataInvert, 
                                dataReverse=self.dataReverse, 
                                numOutputBits=self.numOutputBits, 
-                               initSum=self.initSum)
+                               initSum=self.initSum,
+                               acsMethod=self.acsMethod,
+                               wordBits=self.wordBits)
         
         
     def checkACS(self, inputData):
         acsObserved = inputData[self.acsStart:self.acsStop+1]
-        acsComputed = checksumCompute(dataList=inputData, 
-                                      dataStart=self.dataStart, 
-                                      dataStop=self.dataStop, 
-                                      dataInvert=self.dataInvert, 
-                                      dataReverse=self.dataReverse, 
-                                      numOutputBits=self.numOutputBits, 
-                                      initSum=self.initSum)
+        acsComputed = self.computeACS(inputData)
         return blu.bitsToDec(acsObserved) == acsComputed 
+
+    # computes the checksum of many packets at once, returning an array
+    # of checksum values; see checksumComputeMany() for the input format
+    def computeACSMany(self, packets):
+        return checksumComputeMany(packets,
+                                   dataStart=self.dataStart,
+                                   dataStop=self.dataStop,
+                                   dataInvert=self.dataInvert,
+                                   dataReverse=self.dataReverse,
+                                   numOutputBits=self.numOutputBits,
+                                   initSum=self.initSum,
+                                   acsMethod=self.acsMethod,
+                                   wordBits=self.wordBits)
+
+    # checks the checksum of many packets at once, returning an array
+    # with one boolean per packet
+    def checkACSMany(self, packets):
+        observed = _observedChecksums(packets, self.acsStart, self.acsStop)
+        return self.computeACSMany(packets) == observed
         
         
     # generates a string containing the ACS properties stored in the object
     def acsPropertiesString(self):
         str  = "ACS Properties:\n"
+        str += "  Method = {}\n".format(self.acsMethod)
+        str += "  Word Bits = {}\n".format(self.wordBits)
         str += "  Invert Data = {}\n".format(self.dataInvert)
         str += "  Reverse Data = {}\n".format(self.dataReverse)
         str += "  Number of Output Bits = {}\n".format(self.numOutputBits)
@@ -342,13 +543,532 @@ class AcsDefinition():
         return str
 
         
-    def iterateACS(self, inputDataList, verbose):
-        return 0
+    # if you have set the variables in this object to lists of possible
+    # values, this function iterates over all of them and tries them out
+    # on the list of input data values, reading the checksum from the
+    # acsStart...acsStop bits; it returns a list of AcsDefinition objects
+    # for the most successful options, best first (see checkSumIterate())
+    def iterateACS(self, inputDataList, verbose = False, processes = None):
+        return checkSumIterate(dataListofLists=inputDataList,
+                               observedChecksumList=None,
+                               dataStartList=_optionList(self.dataStart),
+                               dataStopList=_optionList(self.dataStop),
+                               dataInvertList=_optionList(self.dataInvert),
+                               dataReverseList=_optionList(self.dataReverse),
+                               singleByteList=[],
+                               initSumList=_optionList(self.initSum),
+                               acsStartList=_optionList(self.acsStart),
+                               acsStopList=_optionList(self.acsStop),
+                               acsMethodList=_optionList(self.acsMethod),
+                               wordBitsList=_optionList(self.wordBits),
+                               processes=processes,
+                               verbose=verbose)
         
+#####################################
+# The CrcEngine class computes the same CRC as crcCompute(), bit for bit,
+# but uses lookup tables instead of polynomial long division on a list.
+# Bytes are processed eight at a time (slicing-by-8) for CRCs up to 64
+# bits wide and one at a time for wider CRCs. Byte-aligned payloads with
+# CRC_REFLECT or CRC_REVERSE input ordering are run through reflected
+# tables, so the data never needs to be reordered.
+#
+# The payload can be a bit list, a BitVector, a numpy array of bits or
+# a bytes object (eight bits per byte, MSB first). The parameters are
+# the same as those of crcCompute(). A few unusual configurations that
+# do not produce a regular CRC (a byte-swapped output on a CRC that is
+# not 16 bits wide, a polynomial without a leading one, a final XOR
+# shorter than the CRC) are passed to crcCompute() unchanged.
+
+# bit reversal of each possible byte value
+_BYTE_REVERSE = [int("{:08b}".format(i)[::-1], 2) for i in range(256)]
+
+
+# reverses the order of the lowest numBits bits of an integer
+def _reverseBits(value, numBits):
+    return int("{:0{}b}".format(value, numBits)[::-1], 2)
+
+
+# returns the lookup tables for the polynomial (a bit list including
+# the leading one); CRCs narrower than 8 bits are computed left-aligned
+# in an 8-bit register. Returns a list of numSlices tables of 256
+# entries, where table j holds the register contribution of a byte
+# followed by j zero bytes. Reflected tables process each byte LSB first
+# and hold the bit-reversed register. The tables come from the module's
+# CrcTableCache, so they are only built once
+def crcTables(crcPoly, reflect = False, numSlices = 8):
+    return CRC_TABLE_CACHE.get(crcPoly, reflect, numSlices)
+
+
+# The CrcTableCache class holds the CRC lookup tables that have been
+# built, keyed by polynomial, width, reflection and number of slices, so
+# that engines for the same polynomial (such as the candidates tried by
+# crcIterate) share them. The most recently used maxEntries table sets
+# are kept in memory.
+#
+# If cacheDir is given, the tables (for CRCs up to 64 bits wide) are
+# also stored there as .npy files, so that later sessions and other
+# processes can load them rather than build them. This only saves the
+# build time: the engines index the tables a byte at a time, which is
+# fastest on Python lists, so each process still holds its own copy of
+# every table it loads. Files are written to a temporary name and then renamed, so
+# a reader never sees a partial file. A readOnly cache uses the files
+# already in cacheDir but never writes new ones; crcIterate() gives its
+# worker processes a read-only view of the module cache.
+#
+# The module cache, CRC_TABLE_CACHE, stores its tables in the directory
+# named by the CRC_TABLE_CACHE_DIR environment variable, if it is set.
+class CrcTableCache(object):
+    def __init__(self, maxEntries = 256, cacheDir = None, readOnly = False):
+        self.maxEntries = maxEntries
+        self.cacheDir = cacheDir
+        self.readOnly = readOnly
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.diskLoads = 0
+        if cacheDir is not None and not readOnly:
+            if not os.path.isdir(cacheDir):
+                os.makedirs(cacheDir)
+
+    # returns the tables for the polynomial, from memory, from disk or
+    # newly built, in that order of preference
+    def get(self, crcPoly, reflect = False, numSlices = 8):
+        width = len(crcPoly) - 1
+        key = (blu.bitsToDec(list(crcPoly[1:])), width, bool(reflect),
+               numSlices)
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        self.misses += 1
+        tables = self._load(key)
+        if tables is None:
+            tables = _buildCrcTables(crcPoly, reflect, numSlices)
+            self._store(key, tables)
+        self.entries[key] = tables
+        while len(self.entries) > self.maxEntries:
+            self.entries.popitem(last=False)
+        return tables
+
+    # empties the in-memory cache; files on disk are left alone
+    def clear(self):
+        self.entries.clear()
+
+    def _diskPath(self, key):
+        poly, width, reflect, numSlices = key
+        if self.cacheDir is None or max(width, 8) > 64:
+            return None
+        hexDigits = max(1, -(-width // 4))
+        fileName = "crc{}_{:0{}x}_{}{}.npy".format(
+            width, poly, hexDigits, "r" if reflect else "n", numSlices)
+        return os.path.join(self.cacheDir, fileName)
+
+    def _load(self, key):
+        path = self._diskPath(key)
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            tableArray = np.load(path)
+        except (IOError, OSError, ValueError):
+            return None
+        if tableArray.shape != (key[3], 256):
+            return None
+        self.diskLoads += 1
+        return tableArray.tolist()
+
+    def _store(self, key, tables):
+        path = self._diskPath(key)
+        if path is None or self.readOnly:
+            return
+        tmpFd, tmpPath = tempfile.mkstemp(dir=self.cacheDir, suffix=".tmp")
+        try:
+            with os.fdopen(tmpFd, "wb") as tmpFile:
+                np.save(tmpFile, np.array(tables, dtype=np.uint64))
+            os.replace(tmpPath, path)
+        except (IOError, OSError):
+            if os.path.exists(tmpPath):
+                os.remove(tmpPath)
+
+
+CRC_TABLE_CACHE = CrcTableCache(
+    cacheDir=os.environ.get("CRC_TABLE_CACHE_DIR") or None)
+
+# replaces the module table cache, for example to turn on the disk store
+# partway through a session
+def setCrcTableCache(cache):
+    global CRC_TABLE_CACHE
+    CRC_TABLE_CACHE = cache
+
+
+def _buildCrcTables(crcPoly, reflect, numSlices):
+    width = len(crcPoly) - 1
+    regWidth = max(width, 8)
+    regMask = (1 << regWidth) - 1
+    regTop = 1 << (regWidth - 1)
+    poly = blu.bitsToDec(list(crcPoly[1:])) << (regWidth - width)
+
+    tables = [[]]
+    for byte in range(256):
+        reg = byte << (regWidth - 8)
+        for _ in range(8):
+            if reg & regTop:
+                reg = ((reg << 1) & regMask) ^ poly
+            else:
+                reg = (reg << 1) & regMask
+        tables[0].append(reg)
+    for j in range(1, numSlices):
+        tables.append([((reg << 8) & regMask) ^ tables[0][reg >> (regWidth - 8)]
+                       for reg in tables[j-1]])
+
+    if reflect:
+        tables = [[_reverseBits(table[_BYTE_REVERSE[byte]], regWidth)
+                   for byte in range(256)] for table in tables]
+    return tables
+
+
+# converts a payload into packed bytes (MSB first) and a bit count
+def _payloadToPacked(payload):
+    if isinstance(payload, (bytes, bytearray)):
+        return bytes(payload), 8*len(payload)
+    if isinstance(payload, blu.BitVector):
+        return payload.toBytes(), len(payload)
+    bits = np.asarray(payload, dtype=np.uint8)
+    return np.packbits(bits).tobytes(), len(bits)
+
+
+# reorders an array of bits as crcCompute() does for each input bit order
+def _orderBits(bits, inputBitOrder):
+    if inputBitOrder == CRC_REFLECT:
+        bits = bits.copy()
+        byteBits = 8*(len(bits)//8)
+        bits[:byteBits] = bits[:byteBits].reshape(-1, 8)[:, ::-1].ravel()
+        return bits
+    elif inputBitOrder == CRC_REVERSE:
+        return bits[::-1]
+    return bits
+
+
+# returns the number of pad bits that crcCompute() adds to a payload
+def _padBitCount(payloadLen, padType, padCount):
+    if padType == CRC_PAD_ABS:
+        return max(padCount, 0)
+    elif padType == CRC_PAD_TO_EVEN:
+        if padCount != 0:
+            return payloadLen % padCount
+        return payloadLen
+    return 0
+
+
+def _packetCount(packets):
+    if isinstance(packets, np.ndarray) and packets.ndim == 2:
+        return packets.shape[0]
+    return len(packets)
+
+
+# splits a set of packets into groups of equal length, returning a list
+# of (indices, packet matrix) pairs
+def _packetGroups(packets):
+    if isinstance(packets, np.ndarray) and packets.ndim == 2:
+        return [(np.arange(packets.shape[0]), packets.astype(np.uint8))]
+    groupIndices = {}
+    for i, packet in enumerate(packets):
+        groupIndices.setdefault(len(packet), []).append(i)
+    groups = []
+    for indices in groupIndices.values():
+        for i in indices:
+            if isinstance(packets[i], (list, tuple)) and blu.LOGIC_X in packets[i]:
+                raise ValueError("packet {} holds unknown (LOGIC_X) bits, which "
+                                 "cannot be checked in a batch".format(i))
+        packetMatrix = np.array([np.asarray(packets[i], dtype=np.uint8)
+                                 for i in indices], dtype=np.uint8)
+        groups.append((np.array(indices), packetMatrix))
+    return groups
+
+
+class CrcEngine(object):
+    def __init__(self, crcPoly, inputBitOrder, initVal, reverseFinal,
+                 finalXOR, padType, padCount, padVal, initReg = None):
+        self.initReg = list(initReg or [])
+        self.params = (tuple(crcPoly), inputBitOrder, initVal, reverseFinal,
+                       tuple(finalXOR), padType, padCount, padVal,
+                       tuple(self.initReg))
+        self.crcPoly = list(crcPoly)
+        self.inputBitOrder = inputBitOrder
+        self.initVal = initVal
+        self.reverseFinal = reverseFinal
+        self.finalXOR = list(finalXOR)
+        self.padType = padType
+        self.padCount = padCount
+        self.padVal = padVal
+        self.width = len(self.crcPoly) - 1
+        self.outLen = self.width
+        self.affineMaps = {}
+        self.syndromeTableCache = {}
+
+        # fall back to crcCompute() for anything that is not a regular CRC
+        self.useReference = \
+            self.width < 1 or self.crcPoly[0] != 1 or \
+            any(bit not in (0, 1) for bit in self.crcPoly) or \
+            len(self.finalXOR) < self.width or \
+            initVal not in (0, 1) or \
+            reverseFinal not in CRC_REVERSE_FINAL_OPTIONS or \
+            (reverseFinal == CRC_REVERSE_BYTES and self.width != 16) or \
+            (padType in (CRC_PAD_ABS, CRC_PAD_TO_EVEN) and padVal not in (0, 1)) or \
+            (len(self.initReg) > 0 and (len(self.initReg) != self.width or
+                                        any(bit not in (0, 1) for bit in self.initReg)))
+        if self.useReference:
+            if reverseFinal == CRC_REVERSE_BYTES and self.width != 16:
+                self.outLen = 16
+            return
+
+        self.regWidth = max(self.width, 8)
+        self.regShift = self.regWidth - self.width
+        self.regMask = (1 << self.regWidth) - 1
+        self.crcMask = (1 << self.width) - 1
+        self.initMask = self.crcMask if initVal == 1 else 0
+        self.xorVal = blu.bitsToDec([1 if bit == 1 else 0
+                                     for bit in self.finalXOR[:self.width]])
+        self.polyLeft = blu.bitsToDec(self.crcPoly[1:]) << self.regShift
+        self.preload = (blu.bitsToDec(self.initReg) << self.regShift) \
+            if self.initReg else 0
+        self.reflectedPreload = _reverseBits(self.preload, self.regWidth)
+        self.numSlices = 8 if self.regWidth <= 64 else 1
+        self.tables = crcTables(self.crcPoly, False, self.numSlices)
+        self.reflectedTables = crcTables(self.crcPoly, True, self.numSlices)
+
+    # runs byte-aligned data through the normal (MSB first) tables and
+    # returns the left-aligned register
+    def _registerNormal(self, data, reg = 0):
+        regWidth = self.regWidth
+        regMask = self.regMask
+        t0 = self.tables[0]
+        i = 0
+        if self.numSlices == 8:
+            t1, t2, t3, t4, t5, t6, t7 = self.tables[1:8]
+            alignShift = 64 - regWidth
+            blockEnd = len(data) - len(data) % 8
+            while i < blockEnd:
+                v = (reg << alignShift) ^ int.from_bytes(data[i:i+8], "big")
+                reg = t7[v >> 56] ^ t6[(v >> 48) & 0xFF] ^ \
+                      t5[(v >> 40) & 0xFF] ^ t4[(v >> 32) & 0xFF] ^ \
+                      t3[(v >> 24) & 0xFF] ^ t2[(v >> 16) & 0xFF] ^ \
+                      t1[(v >> 8) & 0xFF] ^ t0[v & 0xFF]
+                i += 8
+        topShift = regWidth - 8
+        for byte in data[i:]:
+            reg = ((reg << 8) & regMask) ^ t0[(reg >> topShift) ^ byte]
+        return reg
+
+    # runs byte-aligned data through the reflected (LSB first) tables and
+    # returns the bit-reversed, left-aligned register
+    def _registerReflected(self, data, reg = 0):
+        t0 = self.reflectedTables[0]
+        i = 0
+        if self.numSlices == 8:
+            t1, t2, t3, t4, t5, t6, t7 = self.reflectedTables[1:8]
+            blockEnd = len(data) - len(data) % 8
+            while i < blockEnd:
+                v = reg ^ int.from_bytes(data[i:i+8], "little")
+                reg = t7[v & 0xFF] ^ t6[(v >> 8) & 0xFF] ^ \
+                      t5[(v >> 16) & 0xFF] ^ t4[(v >> 24) & 0xFF] ^ \
+                      t3[(v >> 32) & 0xFF] ^ t2[(v >> 40) & 0xFF] ^ \
+                      t1[(v >> 48) & 0xFF] ^ t0[v >> 56]
+                i += 8
+        for byte in data[i:]:
+            reg = (reg >> 8) ^ t0[(reg ^ byte) & 0xFF]
+        return reg
+
+    # returns the remainder that crcCompute() leaves in the final bits
+    # of its working list, before the final reversal and XOR, along
+    # with the number of pad bits used
+    def _remainder(self, payload):
+        packedData, numBits = _payloadToPacked(payload)
+        padBits = _padBitCount(numBits, self.padType, self.padCount)
+        if padBits >= self.width:
+            # the division never reaches the final bits
+            return 0, padBits
+
+        if padBits == 0 and numBits % 8 == 0:
+            if self.inputBitOrder == CRC_REFLECT:
+                reg = _reverseBits(self._registerReflected(
+                    packedData, self.reflectedPreload), self.regWidth)
+            elif self.inputBitOrder == CRC_REVERSE:
+                reg = _reverseBits(self._registerReflected(
+                    packedData[::-1], self.reflectedPreload), self.regWidth)
+            else:
+                reg = self._registerNormal(packedData, self.preload)
+            return (reg >> self.regShift) ^ self.initMask, 0
+
+        # general case: pad and reorder the bits as crcCompute() does;
+        # the first numBits bits are divided and the bits that follow
+        # them are XORed into the remainder
+        bits = np.unpackbits(np.frombuffer(packedData, dtype=np.uint8),
+                             count=numBits)
+        bits = np.concatenate((bits, np.full(padBits, self.padVal, np.uint8)))
+        bits = _orderBits(bits, self.inputBitOrder)
+        # bits ahead of the last whole byte go through one at a time
+        regTop = self.regWidth - 1
+        reg = self.preload
+        for bit in bits[:numBits % 8].tolist():
+            feedback = (reg >> regTop) ^ bit
+            reg = (reg << 1) & self.regMask
+            if feedback:
+                reg ^= self.polyLeft
+        reg = self._registerNormal(
+            np.packbits(bits[numBits % 8:numBits]).tobytes(), reg)
+        following = np.concatenate((bits[numBits:],
+                                    np.full(self.width, self.initVal, np.uint8)))
+        followVal = blu.bitsToDec(following[:self.width].tolist())
+        return (reg >> self.regShift) ^ followVal, padBits
+
+    # returns the CRC as an integer, with the first bit of the CRC as
+    # the most significant bit
+    def computeInt(self, payload):
+        if self.useReference:
+            return blu.bitsToDec(self.compute(payload))
+
+        remainder, padBits = self._remainder(payload)
+        if padBits >= self.width:
+            crcVal = self.initMask
+        else:
+            # pad bits push the start of the remainder past the division
+            crcVal = ((remainder << padBits) & self.crcMask) | \
+                     (self.initMask >> (self.width - padBits))
+
+        if self.reverseFinal == CRC_REVERSE_TRUE:
+            crcVal = _reverseBits(crcVal, self.width)
+        elif self.reverseFinal == CRC_REVERSE_BYTES:
+            crcVal = ((crcVal & 0xFF) << 8) | (crcVal >> 8)
+        return crcVal ^ self.xorVal
+
+    # Every step of the CRC is linear over GF(2), so for a fixed payload
+    # length the CRC bits are an affine function of the payload bits:
+    #     crc = const XOR (XOR of row[i] for each payload bit i that is 1)
+    # This returns the rows as a (payload bits x CRC bits) matrix and
+    # const as a vector of CRC bits, computed once per payload length
+    def affineMap(self, payloadLen):
+        if payloadLen in self.affineMaps:
+            return self.affineMaps[payloadLen]
+
+        zeroPayload = np.zeros(payloadLen, dtype=np.uint8)
+        constVal = self.computeInt(zeroPayload)
+        if self.useReference:
+            # probe the reference implementation one bit at a time
+            rowVals = []
+            for i in range(payloadLen):
+                zeroPayload[i] = 1
+                rowVals.append(self.computeInt(zeroPayload) ^ constVal)
+                zeroPayload[i] = 0
+        else:
+            rowVals = self._affineRows(payloadLen)
+
+        rows, _ = blu.decToPaddedBitsBatch(rowVals, self.outLen)
+        const, _ = blu.decToPaddedBitsBatch([constVal], self.outLen)
+        self.affineMaps[payloadLen] = (rows.reshape(payloadLen, self.outLen),
+                                       const[0])
+        return self.affineMaps[payloadLen]
+
+    # returns a list of maxErrors dictionaries, where dictionary k maps
+    # each CRC syndrome (the observed CRC XOR the computed CRC, as an
+    # integer) to the list of patterns of k+1 bit errors that produce
+    # it; positions below payloadLen are payload bits and the rest are
+    # CRC bits. Errors that leave the CRC unchanged are not listed
+    def syndromeTables(self, payloadLen, maxErrors):
+        key = (payloadLen, maxErrors)
+        if key not in self.syndromeTableCache:
+            rows, _ = self.affineMap(payloadLen)
+            columns = [blu.bitsToDec(row) for row in rows.tolist()]
+            columns += [1 << (self.outLen - 1 - j) for j in range(self.outLen)]
+            tables = []
+            for numErrors in range(1, maxErrors + 1):
+                table = {}
+                for pattern in itertools.combinations(range(len(columns)),
+                                                      numErrors):
+                    syndrome = 0
+                    for pos in pattern:
+                        syndrome ^= columns[pos]
+                    if syndrome != 0:
+                        table.setdefault(syndrome, []).append(pattern)
+                tables.append(table)
+            self.syndromeTableCache[key] = tables
+        return self.syndromeTableCache[key]
+
+    # computes the linear contribution of each payload bit to the CRC
+    def _affineRows(self, payloadLen):
+        padBits = _padBitCount(payloadLen, self.padType, self.padCount)
+        if padBits >= self.width:
+            return [0]*payloadLen
+
+        # contribution of each position of the padded and reordered
+        # payload to the remainder; divided bit j contributes
+        # x^(width + payloadLen-1-j) mod poly, and the bits following
+        # the division are XORed straight into the remainder
+        polyLow = blu.bitsToDec(self.crcPoly[1:])
+        crcTop = 1 << (self.width - 1)
+        power = polyLow
+        dividedVals = []
+        for _ in range(payloadLen):
+            dividedVals.append(power)
+            if power & crcTop:
+                power = ((power << 1) & self.crcMask) ^ polyLow
+            else:
+                power = (power << 1) & self.crcMask
+        dividedVals.reverse()
+
+        orderedLen = payloadLen + padBits
+        positions = _orderBits(np.arange(orderedLen), self.inputBitOrder)
+        orderedPos = np.empty(orderedLen, dtype=np.int64)
+        orderedPos[positions] = np.arange(orderedLen)
+
+        rowVals = []
+        for j in orderedPos[:payloadLen].tolist():
+            if j < payloadLen:
+                remainder = dividedVals[j]
+            elif j - payloadLen < self.width:
+                remainder = crcTop >> (j - payloadLen)
+            else:
+                remainder = 0
+            crcVal = (remainder << padBits) & self.crcMask
+            if self.reverseFinal == CRC_REVERSE_TRUE:
+                crcVal = _reverseBits(crcVal, self.width)
+            elif self.reverseFinal == CRC_REVERSE_BYTES:
+                crcVal = ((crcVal & 0xFF) << 8) | (crcVal >> 8)
+            rowVals.append(crcVal)
+        return rowVals
+
+    # computes the CRC of every row of a (packets x payload bits) matrix
+    # in a single matrix product, returning a (packets x CRC bits) matrix
+    def computeMany(self, payloadMatrix):
+        payloadMatrix = np.asarray(payloadMatrix, dtype=np.uint8)
+        rows, const = self.affineMap(payloadMatrix.shape[1])
+        # float32 matrix products are exact for sums below 2**24
+        products = np.dot(payloadMatrix.astype(np.float32),
+                          rows.astype(np.float32))
+        return (products.astype(np.int64) & 1).astype(np.uint8) ^ const
+
+    # returns the CRC as a list of bits, like crcCompute()
+    def compute(self, payload):
+        if self.useReference:
+            if isinstance(payload, (bytes, bytearray)):
+                payload = blu.byteListToBits(list(bytearray(payload)))
+            return crcCompute(payload=list(payload),
+                              crcPoly=self.crcPoly,
+                              inputBitOrder=self.inputBitOrder,
+                              initVal=self.initVal,
+                              reverseFinal=self.reverseFinal,
+                              finalXOR=self.finalXOR,
+                              padType=self.padType,
+                              padCount=self.padCount,
+                              padVal=self.padVal,
+                              initReg=self.initReg or None)
+        return blu.decToPaddedBits(self.computeInt(payload), self.width)
+
+
 #####################################
 # Note: payload and crcPoly are lists of integers, each valued either 1 or 0
 def crcCompute(payload, crcPoly, inputBitOrder, initVal, reverseFinal,
-               finalXOR, padType, padCount, padVal):
+               finalXOR, padType, padCount, padVal, initReg = None):
 
     # print out inputs before proceeding
     if False:
@@ -361,6 +1081,7 @@ def crcCompute(payload, crcPoly, inputBitOrder, initVal, reverseFinal,
         print("padType: " + str(padType))
         print("padCount: " + str(padCount))
         print("padVal: " + str(padVal))
+        print("initReg: {}".format(initReg))
         
     # pad the packet as instructed
     payloadPad = payload[:];
@@ -397,6 +1118,12 @@ def crcCompute(payload, crcPoly, inputBitOrder, initVal, reverseFinal,
     for i in range(len(crcPoly) - 1):
         payloadIn.append(initVal) # CRCs can have different initial values
 
+    # the register preload (the "init" of most published CRC models) is
+    # XORed into the first bits of the working value
+    if initReg is not None:
+        for i in range(min(len(initReg), len(crcPoly) - 1)):
+            payloadIn[i] = (payloadIn[i] + initReg[i]) % 2
+
     #print("range i and j and len(payloadIn):")
     #print(range(len(payload)))
     #print(range(len(crcPoly)))
@@ -439,10 +1166,22 @@ def crcCompute(payload, crcPoly, inputBitOrder, initVal, reverseFinal,
 # value, then simply pass a single-element list.
 #
 # Note: passing an empty list for the crcPoly will cause the function to
-# iterate over all common polynomials for that length.
+# iterate over all common polynomials for that length, and passing an
+# empty list for the finalXOR will try all zeros and all ones.
+#
+# The observed CRC is taken from crcStart...crcStop; if these lists are
+# not given, the CRC is assumed to immediately follow the data.
+#
+# The configurations are generated as they are needed rather than all
+# at once, and are handed out to a pool of worker processes (pass
+# processes=1 to run everything in this process). A configuration is
+# dropped as soon as more than maxMismatches packets fail to match, and
+# if stopOnFullMatch is set the search ends at the first configuration
+# that matches every packet.
 #
-# The function returns the set of parameters that has the most success
-# matching the observed CRC.
+# The function returns a list of up to maxResults CrcDefinition objects,
+# best first; the matchCount of each is set to the number of packets
+# that the configuration matched.
 def crcIterate(dataListofLists,
                dataStartList, 
                dataStopList,
@@ -454,16 +1193,766 @@ def crcIterate(dataListofLists,
                finalXORList, 
                padTypeList, 
                padCountList, 
-               padValList):
-    return 0
+               padValList,
+               crcStartList = None,
+               crcStopList = None,
+               maxMismatches = 0,
+               stopOnFullMatch = True,
+               processes = None,
+               maxResults = 10,
+               verbose = False):
+    if len(crcPolyList) == 0:
+        crcPolyList = MASTER_POLY_LIST[crcPolyLen]
+    if len(finalXORList) == 0:
+        finalXORList = [crcPolyLen*[0], crcPolyLen*[1]]
+
+    # build the list of layouts, placing the CRC after the data by default
+    layouts = []
+    for dataStart, dataStop in itertools.product(dataStartList, dataStopList):
+        if crcStartList is None:
+            crcStarts = [dataStop + 1]
+        else:
+            crcStarts = crcStartList
+        for crcStart in crcStarts:
+            if crcStopList is None:
+                crcStops = [crcStart + crcPolyLen - 1]
+            else:
+                crcStops = crcStopList
+            for crcStop in crcStops:
+                layouts.append((crcStart, crcStop, dataStart, dataStop))
+
+    solutionSpace = enumerate(
+        params + layout for params, layout in itertools.product(
+            itertools.product(crcPolyList, inputBitOrderList, initValList,
+                              reverseFinalList, finalXORList, padTypeList,
+                              padCountList, padValList),
+            layouts))
+
+    pool = None
+    if processes == 1:
+        _crcTrialInit(dataListofLists, maxMismatches)
+        trialResults = map(_crcTrial, solutionSpace)
+    else:
+        # build the tables up front so the workers can read them from
+        # the disk store rather than each building its own
+        if CRC_TABLE_CACHE.cacheDir is not None:
+            for crcPoly in crcPolyList:
+                numSlices = 8 if max(len(crcPoly) - 1, 8) <= 64 else 1
+                crcTables(crcPoly, False, numSlices)
+                crcTables(crcPoly, True, numSlices)
+        trialArgs = (dataListofLists, maxMismatches, CRC_TABLE_CACHE.cacheDir)
+        pool = multiprocessing.Pool(processes, initializer=_crcTrialInit,
+                                    initargs=trialArgs)
+        trialResults = pool.imap_unordered(_crcTrial, solutionSpace,
+                                           chunksize=32)
+
+    successList = []
+    trialCount = 0
+    try:
+        for result in trialResults:
+            trialCount += 1
+            if result is None:
+                continue
+            successList.append(result)
+            if verbose:
+                print("Candidate {} matched {} of {} packets".format(
+                    result[1], result[0], len(dataListofLists)))
+            if stopOnFullMatch and result[0] == len(dataListofLists):
+                break
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    if verbose:
+        print("Tried {} configurations, {} passed".format(trialCount,
+                                                          len(successList)))
+
+    # rank by the number of matches, then by position in the search
+    successList.sort(key=lambda result: (-result[0], result[1]))
+    crcList = []
+    for matchCount, _, params in successList[:maxResults]:
+        crcPoly, inputBitOrder, initVal, reverseFinal, finalXOR, \
+            padType, padCount, padVal, crcStart, crcStop, \
+            dataStart, dataStop = params
+        crcDef = CrcDefinition(crcLen=len(crcPoly) - 1,
+                               crcPoly=list(crcPoly),
+                               dataStart=dataStart,
+                               dataStop=dataStop,
+                               inputBitOrder=inputBitOrder,
+                               initVal=initVal,
+                               reverseFinal=reverseFinal,
+                               finalXOR=list(finalXOR),
+                               padType=padType,
+                               padCount=padCount,
+                               padVal=padVal,
+                               crcStart=crcStart,
+                               crcStop=crcStop)
+        crcDef.matchCount = matchCount
+        crcList.append(crcDef)
+    return crcList
+
+
+# state shared by the crcIterate() workers; each worker process receives
+# the packets once when it starts, rather than with every configuration
+_trialPackets = []
+_trialMaxMismatches = 0
+_trialLayouts = {}
+
+def _crcTrialInit(packets, maxMismatches, tableCacheDir = None):
+    global _trialPackets, _trialMaxMismatches, _trialLayouts
+    _trialPackets = packets
+    _trialMaxMismatches = maxMismatches
+    _trialLayouts = {}
+    if tableCacheDir is not None:
+        setCrcTableCache(CrcTableCache(cacheDir=tableCacheDir, readOnly=True))
+
+
+# returns the payloads (as BitVectors) and observed CRCs for a layout,
+# building them the first time the layout is seen
+def _trialLayout(crcStart, crcStop, dataStart, dataStop):
+    layout = (crcStart, crcStop, dataStart, dataStop)
+    if layout not in _trialLayouts:
+        _trialLayouts[layout] = [
+            (blu.BitVector(_fieldSlice(packet, dataStart, dataStop)),
+             list(_fieldSlice(packet, crcStart, crcStop)))
+            for packet in _trialPackets]
+    return _trialLayouts[layout]
+
+
+# tries a single configuration against the packets, giving up as soon as
+# the number of mismatches exceeds the limit; returns None for a failed
+# configuration, or (match count, index, parameters)
+def _crcTrial(indexedParams):
+    index, params = indexedParams
+    engine = CrcEngine(*params[:8])
+    mismatches = 0
+    for payload, crcObserved in _trialLayout(*params[8:]):
+        if engine.compute(payload) != crcObserved:
+            mismatches += 1
+            if mismatches > _trialMaxMismatches:
+                return None
+    return (len(_trialPackets) - mismatches, index, params)
+
+# Solves a set of linear equations over GF(2): returns a bit mask of
+# the columns (integers) whose XOR is target, or None if there is none.
+# A basis of the columns is built by elimination, each basis vector
+# keeping track of the columns it was made from
+def _gf2Solve(columns, target):
+    basis = {} # leading bit -> (vector, column mask)
+    for i, column in enumerate(columns):
+        vector, mask = column, 1 << i
+        while vector:
+            lead = vector.bit_length() - 1
+            if lead not in basis:
+                basis[lead] = (vector, mask)
+                break
+            vector ^= basis[lead][0]
+            mask ^= basis[lead][1]
+
+    solution = 0
+    while target:
+        lead = target.bit_length() - 1
+        if lead not in basis:
+            return None
+        target ^= basis[lead][0]
+        solution ^= basis[lead][1]
+    return solution
+
+#####################################
+# The following functions recover a CRC algebraically rather than by
+# trying every option. For two packets of the same length, the XOR of
+# their CRCs is the CRC (with zero initial value and no final XOR) of
+# the XOR of their payloads, so the unknown initial value and final XOR
+# cancel out. Each such pair gives a polynomial D(x) = d(x)*x^w + c(x),
+# where d is the payload difference and c the CRC difference, and the
+# CRC polynomial must divide every one of them. The greatest common
+# divisor of a few pairs is usually the polynomial itself.
+#
+# Once the polynomial is known, each packet gives the sum of the two
+# constants: the register preload (initReg), whose effect on the CRC
+# depends on the payload length L (it adds initReg*x^L mod P), and the
+# final XOR, which does not. Comparing packets of two lengths cancels
+# the final XOR and leaves a set of linear equations in the bits of
+# initReg, which are solved over GF(2); the final XOR then follows
+# from any one packet.
+#
+# Polynomials are handled as Python integers, with bit n holding the
+# coefficient of x^n.
+
+# returns the quotient and remainder of polynomial division over GF(2)
+def _gf2DivMod(dividend, divisor):
+    quotient = 0
+    divisorLen = divisor.bit_length()
+    while dividend.bit_length() >= divisorLen:
+        shift = dividend.bit_length() - divisorLen
+        quotient |= 1 << shift
+        dividend ^= divisor << shift
+    return quotient, dividend
+
+
+def _gf2Gcd(a, b):
+    while b:
+        a, b = b, _gf2DivMod(a, b)[1]
+    return a
+
+
+# returns the degree-w factors of a polynomial, by trial division with
+# every cofactor of the remaining degree (up to maxCofactorDegree)
+def _gf2FactorsOfDegree(poly, width, maxCofactorDegree = 16):
+    cofactorDegree = poly.bit_length() - 1 - width
+    if cofactorDegree == 0:
+        return [poly]
+    if cofactorDegree < 0 or cofactorDegree > maxCofactorDegree:
+        return []
+    factors = []
+    for cofactor in range(1 << cofactorDegree, 1 << (cofactorDegree + 1)):
+        quotient, remainder = _gf2DivMod(poly, cofactor)
+        if remainder == 0 and quotient & 1 and quotient not in factors:
+            factors.append(quotient)
+    return factors
+
+
+# undoes the final reversal of CRC_REVERSE_TRUE or CRC_REVERSE_BYTES
+def _unreverseFinal(crcVal, width, reverseFinal):
+    if reverseFinal == CRC_REVERSE_TRUE:
+        return _reverseBits(crcVal, width)
+    elif reverseFinal == CRC_REVERSE_BYTES:
+        return ((crcVal & 0xFF) << 8) | (crcVal >> 8)
+    return crcVal
+
+
+# returns the remainder of x^shift*value divided by poly
+def _gf2ShiftMod(value, shift, poly):
+    return _gf2DivMod(value << shift, poly)[1]
+
+
+# Solves for the register preload from the constants that packets of
+# different payload lengths add to the CRC: constants maps each length
+# to the unreversed observed CRC XORed with the CRC computed with no
+# preload or final XOR. Returns the preload as an integer (0 if there
+# is only one length), or None if the constants are inconsistent
+def _solveInitReg(constants, polyVal, width):
+    lengths = sorted(constants)
+    if len(lengths) < 2:
+        return 0
+    baseLen = lengths[0]
+    columns = [0]*width
+    target = 0
+    for k, length in enumerate(lengths[1:]):
+        lengthDiff = _gf2DivMod((1 << baseLen) ^ (1 << length), polyVal)[1]
+        for i in range(width):
+            columns[i] |= _gf2ShiftMod(lengthDiff, i, polyVal) << (k*width)
+        target |= (constants[baseLen] ^ constants[length]) << (k*width)
+    return _gf2Solve(columns, target)
+
+
+# This function recovers the CRC polynomial, register preload and final
+# XOR from a set of packets whose data and CRC locations are known,
+# without a polynomial list. Each combination of input bit order and
+# final reversal is tried; packets are paired with others of the same
+# payload length, so at least two differing packets of one length are
+# needed (more give a cleaner result). Padding is not considered.
+#
+# To place the fields in packets of differing lengths, give the indices
+# as negative numbers counted back from the end of each packet (for a
+# 16 bit CRC ending each packet, dataStop=-17, crcStart=-16, crcStop=-1).
+# With payloads of two or more lengths the preload is separated from
+# the final XOR and returned in initReg. With a single payload length
+# the two cannot be told apart (any preload fits, given the right final
+# XOR), so the preload is folded into the final XOR: initReg is left
+# as None and initVal set to 1 when that gives an all-zero final XOR,
+# otherwise 0. Such a definition only holds for that payload length.
+#
+# Returns the CrcDefinition that validates the most packets, with its
+# matchCount set, or None if no polynomial could be found.
+def crcSolve(dataListofLists, dataStart, dataStop, crcStart, crcStop,
+             verbose = False):
+    if (crcStart < 0) != (crcStop < 0):
+        raise ValueError("crcStart and crcStop must both count from the "
+                         "start of the packet or both from the end")
+    width = crcStop - crcStart + 1
+    reverseFinalList = [CRC_REVERSE_FALSE, CRC_REVERSE_TRUE]
+    if width == 16:
+        reverseFinalList.append(CRC_REVERSE_BYTES)
+
+    # packets with a complete CRC field, as (payload bits, observed CRC)
+    packets = []
+    for packet in dataListofLists:
+        crcBits = list(_fieldSlice(packet, crcStart, crcStop))
+        crcObserved = blu.bitsToDec(crcBits)
+        if len(crcBits) != width or crcObserved < 0:
+            continue
+        payload = np.asarray(_fieldSlice(packet, dataStart, dataStop),
+                             dtype=np.uint8)
+        packets.append((payload, crcObserved))
+
+    bestCrc = None
+    for inputBitOrder, reverseFinal in itertools.product(CRC_BIT_ORDER_OPTIONS,
+                                                         reverseFinalList):
+        # convert each packet to an ordered payload value and an
+        # unreversed CRC value, grouped by payload length
+        groups = {}
+        for payload, crcObserved in packets:
+            payloadVal = blu.bitsToDec(_orderBits(payload, inputBitOrder).tolist())
+            groups.setdefault(len(payload), []).append(
+                (payloadVal, _unreverseFinal(crcObserved, width, reverseFinal)))
+
+        gcdPoly = 0
+        for pairs in groups.values():
+            payload0, crc0 = pairs[0]
+            for payloadVal, crcVal in pairs[1:]:
+                diffPoly = ((payloadVal ^ payload0) << width) ^ crcVal ^ crc0
+                gcdPoly = _gf2Gcd(gcdPoly, diffPoly) if gcdPoly else diffPoly
+        if gcdPoly == 0:
+            continue
+
+        for polyVal in _gf2FactorsOfDegree(gcdPoly, width):
+            crcPoly = blu.decToPaddedBits(polyVal, width + 1)
+            crcDef = CrcDefinition(crcLen=width, crcPoly=crcPoly,
+                                   dataStart=dataStart, dataStop=dataStop,
+                                   inputBitOrder=inputBitOrder, initVal=0,
+                                   reverseFinal=reverseFinal,
+                                   finalXOR=width*[0], padType=CRC_NOPAD,
+                                   padCount=0, padVal=0,
+                                   crcStart=crcStart, crcStop=crcStop)
+            # the constant added to the CRC at each payload length, taken
+            # from the first packet of that length
+            engine = crcDef.compile()
+            constants = {}
+            for payload, crcObserved in packets:
+                if len(payload) not in constants:
+                    constants[len(payload)] = _unreverseFinal(
+                        crcObserved ^ engine.computeInt(payload.tolist()),
+                        width, reverseFinal)
+
+            initRegVal = _solveInitReg(constants, polyVal, width)
+            if initRegVal is None:
+                continue
+            if initRegVal:
+                # when the polynomial has a factor of x+1, the preloads
+                # differing by P/(x+1) give the same CRCs at every length
+                # (they only change the final XOR); of the two, prefer the
+                # one with the plainer final XOR, as published models have
+                baseLen = min(constants)
+                options = [initRegVal]
+                cofactor, remainder = _gf2DivMod(polyVal, 3)
+                if remainder == 0:
+                    options.append(initRegVal ^ cofactor)
+                allOnes = (1 << width) - 1
+                choices = []
+                for option in options:
+                    xorVal = constants[baseLen] ^ \
+                        _gf2ShiftMod(option, baseLen, polyVal)
+                    xorVal = _unreverseFinal(xorVal, width, reverseFinal)
+                    choices.append((xorVal not in (0, allOnes), option, xorVal))
+                _, initRegVal, xorVal = min(choices)
+                crcDef.initReg = blu.decToPaddedBits(initRegVal, width)
+            else:
+                # a single length (or no preload): fold any preload into
+                # the final XOR, preferring initVal=1 if that clears it
+                payload, crcObserved = packets[0]
+                for initVal in [1, 0]:
+                    crcDef.initVal = initVal
+                    xorVal = crcObserved ^ crcDef.compile().computeInt(
+                        payload.tolist())
+                    if xorVal == 0:
+                        break
+            crcDef.finalXOR = blu.decToPaddedBits(xorVal, width)
+            crcDef.matchCount = int(np.sum(crcDef.checkCRCMany(dataListofLists)))
+            if verbose:
+                print("Order {}, reverse {}: poly {} matched {} packets".format(
+                    inputBitOrder, reverseFinal, crcPoly, crcDef.matchCount))
+            if bestCrc is None or crcDef.matchCount > bestCrc.matchCount:
+                bestCrc = crcDef
+            if bestCrc.matchCount == len(dataListofLists):
+                return bestCrc
+    return bestCrc
+
+
+#####################################
+# The following functions search for the location of the CRC and the
+# data that it covers when neither is known. For a given polynomial,
+# every data range and every CRC position outside of that range is
+# tried. Rather than computing each CRC from scratch, the CRC register
+# of every packet is updated one bit at a time as the end of the data
+# range moves along the packet, so each data range start costs a single
+# pass over the packet.
+#
+# The initial value and final XOR are not known either, but for the
+# correct layout every packet implies the same final XOR (the observed
+# CRC XORed with the computed one); a layout scores the number of
+# packets that agree on the most common final XOR.
+
+# reverses the lowest width bits of each item in a uint64 array
+def _reverseBitsArray(values, width):
+    valueBytes = values.astype(">u8").view(np.uint8).reshape(-1, 8)
+    reversedBytes = np.array(_BYTE_REVERSE, dtype=np.uint8)[valueBytes[:, ::-1]]
+    reversedVals = reversedBytes.copy().view(">u8").reshape(-1).astype(np.uint64)
+    return reversedVals >> np.uint64(64 - width)
+
+
+# for each column of a matrix, returns the number of times the most
+# common value appears and the value itself
+def _modalCounts(values):
+    sortedVals = np.sort(values, axis=0)
+    newRun = np.ones(sortedVals.shape, dtype=bool)
+    newRun[1:] = sortedVals[1:] != sortedVals[:-1]
+    rowIndex = np.arange(sortedVals.shape[0])[:, np.newaxis]
+    runStart = np.maximum.accumulate(np.where(newRun, rowIndex, 0), axis=0)
+    runLen = rowIndex - runStart + 1
+    bestRow = runLen.argmax(axis=0)
+    columns = np.arange(sortedVals.shape[1])
+    return runLen[bestRow, columns], sortedVals[bestRow, columns]
+
+
+# This function searches a set of packets for the layout (data range
+# and CRC position) of a CRC using each of the polynomials in
+# crcPolyList (polynomials up to 64 bits wide). Each combination of the
+# input bit orders and final reversals in the lists is tried; padding
+# is not considered and the CRC is assumed to lie outside of the data.
+# Data ranges shorter than minDataLen bits are skipped.
+#
+# The search runs on the most common packet length, using at most
+# maxPackets packets of that length, and the data range starts are
+# spread over a pool of worker processes (processes=1 runs in this
+# process). The best layouts are then checked against every packet.
+#
+# Returns a list of up to maxResults CrcDefinition objects, best first,
+# with matchCount set to the number of packets each one validates.
+def crcLayoutSearch(dataListofLists,
+                    crcPolyList,
+                    inputBitOrderList = None,
+                    reverseFinalList = None,
+                    minDataLen = 8,
+                    maxPackets = 64,
+                    maxResults = 10,
+                    processes = None,
+                    verbose = False):
+    if inputBitOrderList is None:
+        inputBitOrderList = CRC_BIT_ORDER_OPTIONS
+    if reverseFinalList is None:
+        reverseFinalList = CRC_REVERSE_FINAL_OPTIONS
+
+    lengthCounts = {}
+    for packet in dataListofLists:
+        lengthCounts[len(packet)] = lengthCounts.get(len(packet), 0) + 1
+    packetLen = max(lengthCounts, key=lambda length: lengthCounts[length])
+    packetMatrix = np.array([np.asarray(packet, dtype=np.uint8)
+                             for packet in dataListofLists
+                             if len(packet) == packetLen][:maxPackets],
+                            dtype=np.uint8)
+
+    crcPolyList = [list(crcPoly) for crcPoly in crcPolyList
+                   if 1 <= len(crcPoly) - 1 <= 64]
+    tasks = [(polyIndex, inputBitOrder, dataStart)
+             for polyIndex in range(len(crcPolyList))
+             for inputBitOrder in inputBitOrderList
+             for dataStart in range(packetLen)]
+    layoutArgs = (packetMatrix, crcPolyList, reverseFinalList,
+                  minDataLen, maxResults)
+
+    if processes == 1:
+        _layoutTrialInit(*layoutArgs)
+        taskResults = map(_layoutTrial, tasks)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(processes, initializer=_layoutTrialInit,
+                                    initargs=layoutArgs)
+        taskResults = pool.imap_unordered(_layoutTrial, tasks, chunksize=4)
+
+    candidates = []
+    try:
+        for taskCandidates in taskResults:
+            candidates.extend(taskCandidates)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    # check the best few against the whole packet set; a constant
+    # header next to the data can be folded into the final XOR, so on
+    # equal scores the shortest data range is preferred
+    candidates.sort(key=lambda candidate: (-candidate[0],
+                                           candidate[1][4] - candidate[1][3]))
+    crcList = []
+    for score, params in candidates[:4*maxResults]:
+        polyIndex, inputBitOrder, reverseFinal, dataStart, dataStop, \
+            crcStart, xorVal = params
+        crcPoly = crcPolyList[polyIndex]
+        width = len(crcPoly) - 1
+        crcDef = CrcDefinition(crcLen=width, crcPoly=crcPoly,
+                               dataStart=dataStart, dataStop=dataStop,
+                               inputBitOrder=inputBitOrder, initVal=0,
+                               reverseFinal=reverseFinal,
+                               finalXOR=blu.decToPaddedBits(xorVal, width),
+                               padType=CRC_NOPAD, padCount=0, padVal=0,
+                               crcStart=crcStart, crcStop=crcStart + width - 1)
+        crcDef.matchCount = int(np.sum(crcDef.checkCRCMany(dataListofLists)))
+        if verbose:
+            print("Data {}-{}, CRC {}-{}: {} matches".format(
+                dataStart, dataStop, crcDef.crcStart, crcDef.crcStop,
+                crcDef.matchCount))
+        crcList.append(crcDef)
+    crcList.sort(key=lambda crcDef: (-crcDef.matchCount,
+                                     crcDef.dataStop - crcDef.dataStart))
+    return crcList[:maxResults]
+
+
+# state shared by the crcLayoutSearch() workers
+_layoutMatrix = None
+_layoutPolys = []
+_layoutReverseFinals = []
+_layoutMinDataLen = 0
+_layoutMaxResults = 0
+_layoutObserved = {}
+
+def _layoutTrialInit(packetMatrix, crcPolyList, reverseFinalList,
+                     minDataLen, maxResults):
+    global _layoutMatrix, _layoutPolys, _layoutReverseFinals
+    global _layoutMinDataLen, _layoutMaxResults, _layoutObserved
+    _layoutMatrix = packetMatrix
+    _layoutPolys = crcPolyList
+    _layoutReverseFinals = reverseFinalList
+    _layoutMinDataLen = minDataLen
+    _layoutMaxResults = maxResults
+    _layoutObserved = {}
+
+
+# returns a (packets x positions) matrix holding the value of the width
+# bits starting at each position of each packet, along with a mask of
+# the positions whose value is not the same in every packet
+def _layoutObservedValues(width):
+    if width not in _layoutObserved:
+        numPositions = _layoutMatrix.shape[1] - width + 1
+        observed = np.zeros((_layoutMatrix.shape[0], max(numPositions, 0)),
+                            dtype=np.uint64)
+        for j in range(width):
+            observed = (observed << np.uint64(1)) | \
+                _layoutMatrix[:, j:j + numPositions].astype(np.uint64)
+        varies = np.any(observed != observed[:1], axis=0)
+        _layoutObserved[width] = (observed, varies)
+    return _layoutObserved[width]
+
+
+# scans every data range beginning at dataStart for one polynomial and
+# input bit order, returning the best few (score, parameters) results
+def _layoutTrial(task):
+    polyIndex, inputBitOrder, dataStart = task
+    crcPoly = _layoutPolys[polyIndex]
+    width = len(crcPoly) - 1
+    observed, varies = _layoutObservedValues(width)
+    numPackets, packetLen = _layoutMatrix.shape
+    positions = np.arange(observed.shape[1])
+
+    polyLow = blu.bitsToDec(crcPoly[1:])
+    polyLowArr = np.uint64(polyLow)
+    crcMask = np.uint64((1 << width) - 1)
+    topShift = np.uint64(width - 1)
+    one = np.uint64(1)
+
+    def shiftIn(reg, bits):
+        feedback = ((reg >> topShift) & one) ^ bits.astype(np.uint64)
+        return ((reg << one) & crcMask) ^ (feedback * polyLowArr)
+
+    reg = np.zeros(numPackets, dtype=np.uint64)
+    prependVal = polyLow # x^(len + width) mod poly, for CRC_REVERSE
+    results = []
+    for dataStop in range(dataStart, packetLen):
+        dataLen = dataStop - dataStart + 1
+        if inputBitOrder == CRC_REVERSE:
+            # each new bit goes in front of the previous ones
+            reg ^= _layoutMatrix[:, dataStop].astype(np.uint64) * \
+                np.uint64(prependVal)
+            prependVal <<= 1
+            if prependVal >> width:
+                prependVal = (prependVal ^ polyLow) & int(crcMask)
+        elif inputBitOrder == CRC_REFLECT:
+            # only whole bytes are reflected
+            if dataLen % 8 != 0:
+                continue
+            for j in range(dataStop, dataStop - 8, -1):
+                reg = shiftIn(reg, _layoutMatrix[:, j])
+        else:
+            reg = shiftIn(reg, _layoutMatrix[:, dataStop])
+        if dataLen < _layoutMinDataLen:
+            continue
+
+        validPositions = varies & ((positions + width - 1 < dataStart) |
+                                   (positions > dataStop))
+        if not np.any(validPositions):
+            continue
+        for reverseFinal in _layoutReverseFinals:
+            if reverseFinal == CRC_REVERSE_TRUE:
+                crcVals = _reverseBitsArray(reg, width)
+            elif reverseFinal == CRC_REVERSE_BYTES:
+                if width != 16:
+                    continue
+                crcVals = ((reg & np.uint64(0xFF)) << np.uint64(8)) | \
+                          (reg >> np.uint64(8))
+            else:
+                crcVals = reg
+            xorVals = observed[:, validPositions] ^ crcVals[:, np.newaxis]
+            counts, modes = _modalCounts(xorVals)
+            for column in np.argsort(-counts)[:_layoutMaxResults]:
+                if counts[column] < 2:
+                    break
+                crcStart = int(positions[validPositions][column])
+                results.append((int(counts[column]),
+                                (polyIndex, inputBitOrder, reverseFinal,
+                                 dataStart, dataStop, crcStart,
+                                 int(modes[column]))))
+
+    results.sort(key=lambda result: (-result[0], result[1][4] - dataStart))
+    return results[:_layoutMaxResults]
+
+
+#####################################
+# The following functions compute arithmetic checksums (ACS) over whole
+# batches of packets at once. The data range of each packet is split
+# into words of wordBits bits (bytes by default); a trailing partial
+# word is taken as the value of the bits that remain, as if they were a
+# complete, shorter word. Each word may be inverted and bit reversed
+# before it is added in, and with CRC_REVERSE_BYTES the bytes of the
+# final checksum are swapped. The checksum methods are:
+#
+#   ACS_SUM             - sum of the words, modulo 2^numOutputBits
+#   ACS_XOR             - XOR of the words
+#   ACS_ONES_COMPLEMENT - ones' complement of the end-around-carry sum,
+#                         as used by the internet checksum (16-bit words)
+#   ACS_TWOS_COMPLEMENT - two's complement of the sum, so that adding the
+#                         checksum to the words gives zero
+#   ACS_FLETCHER        - Fletcher-16: two running sums of the words,
+#                         modulo 255, with the second in the upper byte
+#   ACS_ADLER           - Adler-32: as Fletcher, but modulo 65521 with
+#                         16-bit sums and the first sum starting at one
+#
+# initSum is the starting value of the sum (the first sum for Fletcher
+# and Adler) and results are truncated to numOutputBits.
+#
+# The sums are kept in int64 arrays where they cannot overflow; wider
+# checksums, words or sums (such as 64-bit checksums) are computed with
+# numpy arrays of Python ints, which are exact but much slower.
+
+# returns the numpy dtype that holds the sums of numWords words of
+# wordBits bits, truncated to numOutputBits, without overflowing
+def _checksumDtype(numOutputBits, wordBits, numWords):
+    if max(numOutputBits, wordBits + max(numWords, 1).bit_length()) < 63:
+        return np.int64
+    return object
+
+
+# returns a (packets x words) matrix of the word values in the data
+# range of each packet
+def _checksumWords(dataMatrix, dataInvert, dataReverse, wordBits,
+                   dtype = np.int64):
+    numPackets, dataLen = dataMatrix.shape
+    numWords = -(-dataLen // wordBits)
+    bits = np.zeros((numPackets, numWords*wordBits), dtype=dtype)
+    bits[:, :dataLen] = dataMatrix
+    if dataInvert:
+        bits[:, :dataLen] ^= 1
+
+    weights = np.zeros(numWords*wordBits, dtype=dtype)
+    for wordStart in range(0, dataLen, wordBits):
+        wordLen = min(wordBits, dataLen - wordStart)
+        if dataReverse == CRC_REVERSE_TRUE:
+            shifts = range(wordLen)
+        else:
+            shifts = range(wordLen - 1, -1, -1)
+        weights[wordStart:wordStart + wordLen] = [1 << shift for shift in shifts]
+    return (bits*weights).reshape(numPackets, numWords, wordBits).sum(axis=2)
+
+
+# combines the words of each packet into a checksum
+def _checksumReduce(words, numOutputBits, initSum, acsMethod):
+    numWords = words.shape[1]
+    outMask = (1 << numOutputBits) - 1
+    if acsMethod == ACS_XOR:
+        sums = np.bitwise_xor.reduce(words, axis=1) ^ initSum
+    elif acsMethod in (ACS_FLETCHER, ACS_ADLER):
+        if acsMethod == ACS_FLETCHER:
+            modulus, sumBits, firstSum = 255, 8, initSum
+        else:
+            modulus, sumBits, firstSum = 65521, 16, 1 + initSum
+        # the second sum adds up the running first sum after each word,
+        # so word k is counted (numWords - k) times
+        wordCounts = np.arange(numWords, 0, -1, dtype=np.int64)
+        sum1 = (firstSum + (words % modulus).sum(axis=1)) % modulus
+        sum2 = (numWords*firstSum + (words % modulus).dot(wordCounts)) % modulus
+        sums = (sum2 << sumBits) | sum1
+    else:
+        sums = initSum + words.sum(axis=1)
+        if acsMethod == ACS_ONES_COMPLEMENT:
+            while np.any(sums >> numOutputBits):
+                sums = (sums & outMask) + (sums >> numOutputBits)
+            sums = ~sums
+        elif acsMethod == ACS_TWOS_COMPLEMENT:
+            sums = -sums
+    return sums & outMask
+
+
+# swaps the byte order of each checksum
+def _checksumSwapBytes(sums, numOutputBits):
+    swapped = np.zeros_like(sums)
+    for byteIndex in range(-(-numOutputBits // 8)):
+        byteVals = (sums >> (8*byteIndex)) & 0xFF
+        swapped |= byteVals << (numOutputBits - 8*(byteIndex + 1))
+    return swapped & ((1 << numOutputBits) - 1)
+
+
+# computes the checksum of many packets at once, returning an int64
+# array with one checksum per packet (an array of Python ints for
+# checksums too wide for int64); the packets can be given as a 2-D
+# array with one packet per row, or as a list of packets, which must
+# not hold LOGIC_X bits
+def checksumComputeMany(packets,
+                        dataStart, dataStop,
+                        dataInvert = False,
+                        dataReverse = CRC_REVERSE_FALSE,
+                        numOutputBits = 8,
+                        initSum = 0,
+                        acsMethod = ACS_SUM,
+                        wordBits = 8):
+    groupSums = []
+    for indices, packetMatrix in _packetGroups(packets):
+        dataMatrix = packetMatrix[:, dataStart:dataStop+1]
+        dtype = _checksumDtype(numOutputBits, wordBits,
+                               -(-dataMatrix.shape[1] // wordBits))
+        words = _checksumWords(dataMatrix, dataInvert, dataReverse,
+                               wordBits, dtype)
+        groupSums.append((indices, _checksumReduce(words, numOutputBits,
+                                                   initSum, acsMethod)))
+    wide = any(groupSum.dtype == object for _, groupSum in groupSums)
+    sums = np.zeros(_packetCount(packets), dtype=object if wide else np.int64)
+    for indices, groupSum in groupSums:
+        sums[indices] = groupSum
+    if dataReverse == CRC_REVERSE_BYTES:
+        sums = _checksumSwapBytes(sums, numOutputBits)
+    return sums
+
 
 # This function iterates over a series of payloads and associated arithmetic
-# checksum options. Each iteration uses a different set of CRC configurations, 
-# as supplied in the arguments. Each argument is a list of the values that
-# you want to iterate over. If you want to fix a particular configuration
-# value, then simply pass a single-element list.
-# The function returns the set of parameters that has the most success
-# matching the observed checksum.
+# checksum options. Each iteration uses a different set of checksum
+# configurations, as supplied in the arguments. Each argument is a list of
+# the values that you want to iterate over. If you want to fix a particular
+# configuration value, then simply pass a single-element list.
+#
+# The observed checksums can be given in observedChecksumList, one integer
+# per packet, in which case singleByteList selects the checksum widths to
+# try (True for 8 bits, False for 16), and the checksum is taken to sit
+# in the bits straight after the data when the results are returned.
+# Alternatively, pass None for the
+# observed checksums along with acsStartList and acsStopList, and the
+# checksum is read from those bits of each packet, its width set by the
+# layout. The checksum methods default to all of them; the word sizes to
+# bytes plus the full checksum width.
+#
+# The function returns a list of up to maxResults AcsDefinition objects,
+# best first, with matchCount set to the number of packets matched; only
+# configurations matching at least minMatches packets (by default, all
+# of them) are kept. The options are spread over a pool of worker
+# processes unless processes=1.
 def checkSumIterate(dataListofLists,
                     observedChecksumList,
                     dataStartList, 
@@ -471,36 +1960,172 @@ def checkSumIterate(dataListofLists,
                     dataInvertList, 
                     dataReverseList, 
                     singleByteList, 
-                    initSumList):
-    return 0
+                    initSumList,
+                    acsStartList = None,
+                    acsStopList = None,
+                    acsMethodList = None,
+                    wordBitsList = None,
+                    minMatches = None,
+                    processes = None,
+                    maxResults = 10,
+                    verbose = False):
+    if acsMethodList is None:
+        acsMethodList = ACS_METHOD_OPTIONS
+    if minMatches is None:
+        minMatches = _packetCount(dataListofLists)
+
+    # layouts are (acsStart, acsStop, numOutputBits) triples; observed
+    # checksums are not read from the packets, so their position is
+    # only filled in once the data bounds are known
+    if observedChecksumList is None:
+        layouts = [(acsStart, acsStop, acsStop - acsStart + 1)
+                   for acsStart, acsStop in itertools.product(acsStartList,
+                                                              acsStopList)
+                   if acsStop >= acsStart]
+    else:
+        layouts = [(None, None, 8 if singleByte else 16)
+                   for singleByte in singleByteList]
+
+    options = []
+    for acsStart, acsStop, numOutputBits in layouts:
+        if wordBitsList is None:
+            wordSizes = sorted(set([8, min(numOutputBits, 32)]))
+        else:
+            wordSizes = wordBitsList
+        options.extend(itertools.product(
+            dataStartList, dataStopList, dataInvertList, dataReverseList,
+            [numOutputBits], initSumList, [acsStart], [acsStop],
+            acsMethodList, wordSizes))
+
+    trialArgs = (dataListofLists, observedChecksumList, minMatches)
+    pool = None
+    if processes == 1:
+        _acsTrialInit(*trialArgs)
+        trialResults = map(_acsTrial, enumerate(options))
+    else:
+        pool = multiprocessing.Pool(processes, initializer=_acsTrialInit,
+                                    initargs=trialArgs)
+        trialResults = pool.imap_unordered(_acsTrial, enumerate(options),
+                                           chunksize=32)
+
+    successList = []
+    try:
+        for result in trialResults:
+            if result is not None:
+                successList.append(result)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    if verbose:
+        print("Tried {} configurations, {} passed".format(len(options),
+                                                          len(successList)))
+
+    successList.sort(key=lambda result: (-result[0], result[1]))
+    acsList = []
+    for matchCount, _, params in successList[:maxResults]:
+        dataStart, dataStop, dataInvert, dataReverse, numOutputBits, \
+            initSum, acsStart, acsStop, acsMethod, wordBits = params
+        if acsStart is None:
+            acsStart = dataStop + 1
+            acsStop = dataStop + numOutputBits
+        acsDef = AcsDefinition(dataStart=dataStart,
+                               dataStop=dataStop,
+                               dataInvert=dataInvert,
+                               dataReverse=dataReverse,
+                               numOutputBits=numOutputBits,
+                               initSum=initSum,
+                               acsStart=acsStart,
+                               acsStop=acsStop,
+                               acsMethod=acsMethod,
+                               wordBits=wordBits)
+        acsDef.matchCount = matchCount
+        acsList.append(acsDef)
+        if verbose:
+            print("Matched {} packets:".format(matchCount))
+            print(acsDef.acsPropertiesString())
+    return acsList
 
-# this function computes a simple arithmetic checksum and returns the 
+
+# state shared by the checkSumIterate() workers
+_acsPackets = []
+_acsObserved = None
+_acsMinMatches = 0
+_acsObservedLayouts = {}
+
+def _acsTrialInit(packets, observedChecksumList, minMatches):
+    global _acsPackets, _acsObserved, _acsMinMatches, _acsObservedLayouts
+    _acsPackets = packets
+    if observedChecksumList is not None:
+        observedChecksumList = np.asarray(observedChecksumList, dtype=np.int64)
+    _acsObserved = observedChecksumList
+    _acsMinMatches = minMatches
+    _acsObservedLayouts = {}
+
+
+# returns the checksum held in the acsStart...acsStop bits of every
+# packet, or -1 for packets that are too short to hold it
+def _observedChecksums(packets, acsStart, acsStop):
+    dtype = _checksumDtype(acsStop - acsStart + 1, 1, 1)
+    observed = np.full(_packetCount(packets), -1, dtype=dtype)
+    weights = np.array([1 << shift for shift in
+                        range(acsStop - acsStart, -1, -1)], dtype=dtype)
+    for indices, packetMatrix in _packetGroups(packets):
+        if packetMatrix.shape[1] > acsStop:
+            fieldBits = packetMatrix[:, acsStart:acsStop+1].astype(dtype)
+            observed[indices] = fieldBits.dot(weights)
+    return observed
+
+
+# returns the observed checksums for a layout, reading them from the
+# packets the first time the layout is seen
+def _acsObservedValues(acsStart, acsStop):
+    if _acsObserved is not None:
+        return _acsObserved
+    layout = (acsStart, acsStop)
+    if layout not in _acsObservedLayouts:
+        _acsObservedLayouts[layout] = _observedChecksums(_acsPackets,
+                                                         acsStart, acsStop)
+    return _acsObservedLayouts[layout]
+
+
+# tries a single configuration against the packets; returns None for a
+# failed configuration, or (match count, index, parameters)
+def _acsTrial(indexedParams):
+    index, params = indexedParams
+    dataStart, dataStop, dataInvert, dataReverse, numOutputBits, \
+        initSum, acsStart, acsStop, acsMethod, wordBits = params
+    computed = checksumComputeMany(_acsPackets, dataStart, dataStop,
+                                   dataInvert, dataReverse, numOutputBits,
+                                   initSum, acsMethod, wordBits)
+    matchCount = int(np.sum(computed == _acsObservedValues(acsStart,
+                                                            acsStop)))
+    if matchCount < _acsMinMatches:
+        return None
+    return (matchCount, index, params)
+
+
+# this function computes an arithmetic checksum and returns the 
 # value in a decimal integer
 def checksumCompute(dataList, 
                     dataStart, dataStop, 
                     dataInvert = False, 
                     dataReverse = CRC_REVERSE_FALSE, 
                     numOutputBits = 8, 
-                    initSum = 0):
-
-    if (dataStop - dataStart + 1) % 8 != 0:
-        print("WARNING: Input data contains incomplete byte.")
-        print("         Length of list should be evenly divisible by 8.")
-    sum = initSum
-    for i in xrange(dataStart, dataStop, 8):
-        bitsInByte = dataList[i:i+8]
-        if dataReverse == CRC_REVERSE_TRUE:
-            sum += blu.bitsToDec(bitList=bitsInByte, 
-                                 invert=dataInvert,
-                                 reverse=True)
-        else:
-            sum += blu.bitsToDec(bitList=bitsInByte, 
-                                 invert=dataInvert,
-                                 reverse=False)
-            
-    modVal = 2**numOutputBits
-    sum = sum % modVal
-    if dataReverse == CRC_REVERSE_BYTES:
-        print("Warning: arithmetic checksum byte swap feature not yet implemented")
-    return sum
+                    initSum = 0,
+                    acsMethod = ACS_SUM,
+                    wordBits = 8):
+
+    if (dataStop - dataStart + 1) % wordBits != 0:
+        print("WARNING: Input data contains incomplete word.")
+        print("         Length of list should be evenly divisible by {}.".format(
+            wordBits))
+    if not isinstance(dataList, np.ndarray) and blu.LOGIC_X in dataList:
+        raise ValueError("the checksum of data with unknown (LOGIC_X) bits "
+                         "cannot be computed")
+    dataMatrix = np.asarray(dataList, dtype=np.uint8).reshape(1, -1)
+    return int(checksumComputeMany(dataMatrix, dataStart, dataStop,
+                                   dataInvert, dataReverse, numOutputBits,
+                                   initSum, acsMethod, wordBits)[0])
 
@@ -0,0 +1,283 @@
+# This module keeps a catalogue of I-Q captures, named in the format
+# described in rf_file_handler (<prefix>_c<center freq>_s<rate>.iq), in
+# a SQLite database. For each capture it holds the values parsed from
+# the file name, the length of the capture in samples and seconds, and
+# a power summary (mean and peak sample power, in dB) taken from a few
+# blocks spread through the file, so that finding captures does not
+# mean parsing every file name and reading every file again:
+#
+#   catalogue = IqCatalogue("captures.db")
+#   catalogue.scan(["/data/captures"])
+#   for path in catalogue.paths(centerFreq=315e6, sampRate=8e6,
+#                               minDuration=2.0):
+#       ...
+#
+# Scans are incremental: a file whose size and modification time, and
+# the modification time of its .sigmf-meta sidecar, are the same as when
+# it was last catalogued is skipped without being opened, so rescanning
+# a large archive only reads the new and changed files.
+
+import os
+import sqlite3
+import time
+import numpy as np
+
+from rf_file_handler import iqFileObject, parseFileName, META_EXTENSION
+
+# number and length of the blocks of samples read for the power summary
+POWER_BLOCKS = 16
+POWER_BLOCK_SIZE = 4096
+
+# center frequencies and sample rates closer than this (in Hz) to the
+# value asked for match in queries
+FREQ_TOLERANCE = 0.5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS captures (
+    path        TEXT PRIMARY KEY,
+    directory   TEXT NOT NULL,
+    prefix      TEXT NOT NULL,
+    centerFreq  REAL NOT NULL,
+    sampRate    REAL NOT NULL,
+    numSamples  INTEGER NOT NULL,
+    duration    REAL NOT NULL,
+    meanPowerDb REAL,
+    peakPowerDb REAL,
+    fileSize    INTEGER NOT NULL,
+    mtime       REAL NOT NULL,
+    metaMtime   REAL,
+    scanTime    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS capturesByFreq ON captures (centerFreq, sampRate);
+CREATE INDEX IF NOT EXISTS capturesByDirectory ON captures (directory);
+"""
+
+_COLUMNS = ["path", "directory", "prefix", "centerFreq", "sampRate",
+            "numSamples", "duration", "meanPowerDb", "peakPowerDb",
+            "fileSize", "mtime", "metaMtime", "scanTime"]
+
+
+# returns the mean and peak power, in dB, of numBlocks blocks of
+# blockSize samples spread evenly through the capture, or (None, None)
+# for an empty capture
+def powerSummary(iqFile, numBlocks = POWER_BLOCKS, blockSize = POWER_BLOCK_SIZE):
+    numSamples = iqFile.numSamples
+    if numSamples == 0:
+        return None, None
+    blockSize = min(blockSize, numSamples)
+    starts = np.unique(np.linspace(0, numSamples - blockSize,
+                                   numBlocks).astype(np.int64))
+    powerSum = 0.0
+    peakPower = 0.0
+    for start in starts.tolist():
+        block = iqFile.sampleSlice(start, start + blockSize)
+        power = block.real.astype(np.float64)**2 + block.imag.astype(np.float64)**2
+        powerSum += power.sum()
+        peakPower = max(peakPower, float(power.max()))
+    meanPower = powerSum/(len(starts)*blockSize)
+    return _toDb(meanPower), _toDb(peakPower)
+
+
+# returns the modification time of the sidecar of an .iq file, or None
+# if it has no sidecar
+def _metaMtime(path):
+    try:
+        return os.stat(os.path.splitext(path)[0] + META_EXTENSION).st_mtime
+    except OSError:
+        return None
+
+
+def _toDb(power):
+    # an all-zero capture would be -inf dB, which SQLite cannot compare
+    return 10*np.log10(max(power, 1e-30))
+
+
+# generator returning the DirEntry of each .iq file in a directory, and
+# in its subdirectories if recursive is True
+def _iqFileEntries(directory, recursive):
+    try:
+        entries = list(os.scandir(directory))
+    except OSError as err:
+        print("WARNING: cannot read directory {}: {}".format(directory, err))
+        return
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            if recursive:
+                for subEntry in _iqFileEntries(entry.path, recursive):
+                    yield subEntry
+        elif entry.name.endswith(".iq") and entry.is_file():
+            yield entry
+
+
+# The IqCatalogue holds the connection to the catalogue database, which
+# is created if it does not already exist.
+class IqCatalogue(object):
+    def __init__(self, dbPath):
+        self.dbPath = dbPath
+        self.connection = sqlite3.connect(dbPath)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(_SCHEMA)
+        # catalogues made before sidecars were tracked lack the column
+        columns = [row["name"] for row in
+                   self.connection.execute("PRAGMA table_info(captures)")]
+        if "metaMtime" not in columns:
+            with self.connection:
+                self.connection.execute(
+                    "ALTER TABLE captures ADD COLUMN metaMtime REAL")
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    # returns the number of captures in the catalogue
+    def __len__(self):
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM captures").fetchone()[0]
+
+    # adds the .iq files in each directory to the catalogue, reading
+    # only the files that are new or whose size, modification time or
+    # sidecar have changed since they were last catalogued; files that have gone from a
+    # scanned directory are dropped from the catalogue if prune is True.
+    # Files whose names cannot be parsed are skipped with a warning.
+    # Returns a dictionary counting the files added, updated, unchanged,
+    # removed and skipped.
+    def scan(self, directories, recursive = True, prune = True,
+             verbose = False):
+        if isinstance(directories, str):
+            directories = [directories]
+        counts = dict(added=0, updated=0, unchanged=0, removed=0, skipped=0)
+        for directory in directories:
+            directory = os.path.abspath(directory)
+            known = self._knownFiles(directory, recursive)
+            seen = set()
+            with self.connection:
+                for entry in _iqFileEntries(directory, recursive):
+                    path = os.path.abspath(entry.path)
+                    seen.add(path)
+                    stat = entry.stat()
+                    metaMtime = _metaMtime(path)
+                    if known.get(path) == (stat.st_size, stat.st_mtime,
+                                           metaMtime):
+                        counts["unchanged"] += 1
+                        continue
+                    record = self._buildRecord(path, stat, metaMtime)
+                    if record is None:
+                        counts["skipped"] += 1
+                        continue
+                    self.connection.execute(
+                        "INSERT OR REPLACE INTO captures ({}) VALUES ({})".format(
+                            ", ".join(_COLUMNS), ", ".join("?"*len(_COLUMNS))),
+                        [record[column] for column in _COLUMNS])
+                    counts["updated" if path in known else "added"] += 1
+                    if verbose:
+                        print("Catalogued " + path)
+                if prune:
+                    gone = [path for path in known if path not in seen]
+                    self.connection.executemany(
+                        "DELETE FROM captures WHERE path = ?",
+                        [(path,) for path in gone])
+                    counts["removed"] += len(gone)
+        if verbose:
+            print(counts)
+        return counts
+
+    # returns a dictionary of (size, mtime, sidecar mtime) keyed by path
+    # for the files already catalogued in a directory
+    def _knownFiles(self, directory, recursive):
+        if recursive:
+            rows = self.connection.execute(
+                "SELECT path, fileSize, mtime, metaMtime FROM captures "
+                "WHERE directory = ? OR directory LIKE ? ESCAPE '\\'",
+                (directory, _escapeLike(os.path.join(directory, "")) + "%"))
+        else:
+            rows = self.connection.execute(
+                "SELECT path, fileSize, mtime, metaMtime FROM captures "
+                "WHERE directory = ?",
+                (directory,))
+        return dict((row["path"],
+                     (row["fileSize"], row["mtime"], row["metaMtime"]))
+                    for row in rows)
+
+    # returns the catalogue record for a file, or None if its name
+    # cannot be parsed or it cannot be read
+    def _buildRecord(self, path, stat, metaMtime):
+        if parseFileName(path) is None:
+            print("WARNING: skipping " + path + ", the center frequency and "
+                  "sample rate are not in the file name")
+            return None
+        # a sidecar that cannot be read is ignored with a warning
+        iqFile = iqFileObject(fileName = path)
+        try:
+            meanPowerDb, peakPowerDb = powerSummary(iqFile)
+            numSamples = iqFile.numSamples
+        except (OSError, ValueError) as err:
+            print("WARNING: skipping {}: {}".format(path, err))
+            return None
+        finally:
+            iqFile.close()
+        return dict(path=path, directory=os.path.dirname(path),
+                    prefix=iqFile.prefix, centerFreq=iqFile.centerFreq,
+                    sampRate=iqFile.sampRate, numSamples=numSamples,
+                    duration=numSamples/float(iqFile.sampRate),
+                    meanPowerDb=meanPowerDb, peakPowerDb=peakPowerDb,
+                    fileSize=stat.st_size, mtime=stat.st_mtime,
+                    metaMtime=metaMtime, scanTime=time.time())
+
+    # returns a list of dictionaries, one per capture, for the captures
+    # matching all of the filters given, sorted by path:
+    #   centerFreq, sampRate  - exact values (within FREQ_TOLERANCE)
+    #   minFreq, maxFreq      - range of center frequencies
+    #   minDuration, maxDuration - range of lengths in seconds
+    #   minMeanPowerDb        - lowest mean power
+    #   prefix                - prefix, with * and ? as wildcards
+    #   directory             - directory the captures are in (or below)
+    def query(self, centerFreq = None, sampRate = None, minFreq = None,
+              maxFreq = None, minDuration = None, maxDuration = None,
+              minMeanPowerDb = None, prefix = None, directory = None):
+        conditions = []
+        params = []
+        if centerFreq is not None:
+            conditions.append("centerFreq BETWEEN ? AND ?")
+            params += [centerFreq - FREQ_TOLERANCE, centerFreq + FREQ_TOLERANCE]
+        if sampRate is not None:
+            conditions.append("sampRate BETWEEN ? AND ?")
+            params += [sampRate - FREQ_TOLERANCE, sampRate + FREQ_TOLERANCE]
+        for column, operator, value in [("centerFreq", ">=", minFreq),
+                                        ("centerFreq", "<=", maxFreq),
+                                        ("duration", ">=", minDuration),
+                                        ("duration", "<=", maxDuration),
+                                        ("meanPowerDb", ">=", minMeanPowerDb)]:
+            if value is not None:
+                conditions.append("{} {} ?".format(column, operator))
+                params.append(value)
+        if prefix is not None:
+            conditions.append("prefix GLOB ?")
+            params.append(prefix)
+        if directory is not None:
+            directory = os.path.abspath(directory)
+            conditions.append("(directory = ? OR directory LIKE ? ESCAPE '\\')")
+            params += [directory, _escapeLike(os.path.join(directory, "")) + "%"]
+        sql = "SELECT * FROM captures"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY path"
+        return [dict(row) for row in self.connection.execute(sql, params)]
+
+    # returns the paths of the captures matching the filters of query()
+    def paths(self, **filters):
+        return [record["path"] for record in self.query(**filters)]
+
+    # returns an iqFileObject for each capture matching the filters of
+    # query(), ready to be read a chunk at a time
+    def iqFiles(self, **filters):
+        return [iqFileObject(fileName = path) for path in self.paths(**filters)]
+
+
+# escapes the wildcard characters of a LIKE pattern
+def _escapeLike(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
@@ -4,3 +4,10 @@ HW_SEL_FILE = 0
 HW_SEL_HACKRF = 1
 HW_SEL_USRP = 2
 HW_SEL_LIME = 3
+
+# I-Q sample formats, named as SigMF datatypes
+IQ_CF32 = "cf32_le"  # complex float32 (gr_complex), 8 bytes per sample
+IQ_CI16 = "ci16_le"  # complex int16, 4 bytes per sample
+IQ_CI8 = "ci8"       # complex int8 (HackRF native), 2 bytes per sample
+IQ_DATATYPES = [IQ_CF32, IQ_CI16, IQ_CI8]
+IQ_BYTES_PER_SAMPLE = {IQ_CF32: 8, IQ_CI16: 4, IQ_CI8: 2}
@@ -14,6 +14,8 @@ import osmosdr
 import numpy
 import rf_mod
 from rf_const import HW_SEL_FILE, HW_SEL_HACKRF, HW_SEL_USRP, HW_SEL_LIME
+from rf_const import IQ_CF32
+from rf_file_source import iq_file_source
 
 
 
@@ -25,7 +27,8 @@ class ntsc_fm_demod_flowgraph(gr.top_block):
                  bb_lpf_cutoff, bb_lpf_transition,
                  tcp_str,
                  hw_sel,
-                 fifo_name = "", repeat=True, iq_file_name=""):
+                 fifo_name = "", repeat=True, iq_file_name="",
+                 iq_data_type=IQ_CF32):
 
         gr.top_block.__init__(self)
 
@@ -47,6 +50,7 @@ class ntsc_fm_demod_flowgraph(gr.top_block):
             print("  FIFO Name: {}".format(fifo_name))
             print("  Repeat: {}".format(repeat))
             print("  IQ File Name: {}".format(iq_file_name))
+            print("  IQ Data Type: {}".format(iq_data_type))
 
         # start by dumping baseband into a file and viewing in grc
 
@@ -117,14 +121,12 @@ class ntsc_fm_demod_flowgraph(gr.top_block):
         else:
             if verbose > 0:
                 print("Using {} as input...".format(iq_file_name))
-            self.blocks_file_source_0 = blocks.file_source(
-                gr.sizeof_gr_complex * 1,
-                iq_file_name,
-                repeat=repeat)
+            iq_source = iq_file_source(self, iq_file_name,
+                                       iq_data_type, repeat)
             self.blocks_throttle_0 = blocks.throttle(
                 gr.sizeof_gr_complex * 1, samp_rate, True)
             self.connect(
-                (self.blocks_file_source_0, 0),
+                (iq_source, 0),
                 (self.blocks_throttle_0, 0)
             )
 
@@ -270,7 +272,10 @@ class ook_rx_zmq(gr.top_block):
                  hw_sel,
                  payload_len,
                  transition_width = 0,
-                 iq_file_name=""):
+                 iq_file_name="",
+                 access_code="01010101010101010101",
+                 access_code_threshold=0,
+                 iq_data_type=IQ_CF32):
 
         gr.top_block.__init__(self)
 
@@ -283,6 +288,7 @@ class ook_rx_zmq(gr.top_block):
             print("  Transition Width: {} MHz".format(transition_width/1000000.0))
             print("  Threshold: {}".format(threshold))
             print("  IQ File Name: {}".format(iq_file_name))
+            print("  IQ Data Type: {}".format(iq_data_type))
             print("  ZMQ TCP ADDR: {}".format(tcp_str))
             print("  HW Sel: {}".format(hw_sel))
 
@@ -319,13 +325,11 @@ class ook_rx_zmq(gr.top_block):
                 freq - center_freq,
                 samp_rate)
         if hw_sel == HW_SEL_FILE:
-            self.blocks_file_source_0 = blocks.file_source(
-                gr.sizeof_gr_complex * 1,
-                iq_file_name,
-                True)
+            iq_source = iq_file_source(self, iq_file_name,
+                                       iq_data_type, True)
             # skip the throttle block, we just want to get done
             self.connect(
-                (self.blocks_file_source_0, 0),
+                (iq_source, 0),
                 (self.freq_xlating_fir_filter_xxx_0, 0))
         elif hw_sel == HW_SEL_HACKRF:
             self.osmosdr_source_0 = osmosdr.source(
@@ -418,11 +422,12 @@ class ook_rx_zmq(gr.top_block):
             (self.digital_binary_slicer_fb_0, 0),
             (self.blocks_keep_one_in_n_0, 0))
 
-        # find preamble and apply tag
+        # find preamble and apply tag; the same sync word can be found
+        # in offline bit streams with sync_search.SyncWordMatcher
         self.digital_correlate_access_code_xx_ts_0 = \
             digital.correlate_access_code_bb_ts(
-                "01010101010101010101",
-                0,
+                access_code,
+                access_code_threshold,
                 "packet_len")
         self.connect(
             (self.blocks_keep_one_in_n_0, 0),
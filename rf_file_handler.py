@@ -14,16 +14,67 @@
 #
 # If you need to use a decimal point, simply include a "p" character:
 #     keyfob01_315p1_s8M.iq
+#
+# An iqFileObject made from a file name also gives access to the samples
+# in the file (complex64, as written by the gnuradio file sinks) through
+# a numpy memmap, so any part of a large capture can be read without
+# reading the file from the start: by sample range (sampleSlice), by
+# time (timeSlice), or a chunk at a time (iterChunks). Files can also
+# hold 16 or 8 bit integer samples (ci16, ci8), which take a half or a
+# quarter of the space; these are upcast to complex64 a slice or chunk
+# at a time as they are read, and convertIqFile() converts files between
+# the formats.
+#
+# Anything the file name cannot hold goes in a SigMF style JSON sidecar
+# next to the data, keyfob00_c315M_s8M.sigmf-meta for the file above:
+# the sample format (see the IQ_ datatypes in rf_const), the exact
+# center frequency and sample rate, gain, hardware, and annotations
+# marking the bursts in the capture. The sidecar is written with the
+# annotations last, so that opening a file only parses the header before
+# them; the annotations, which can run to many thousands for a long
+# capture, are parsed the first time they are used.
+
+import json
+import os
+import re
+import numpy as np
+
+from rf_const import IQ_CF32, IQ_CI16, IQ_CI8, IQ_DATATYPES, \
+    IQ_BYTES_PER_SAMPLE
 
 debug = False
 
+# the regular expressions are compiled once, when the module is loaded,
+# as catalogues of captures parse thousands of file names
+DECIMAL_REGEX = re.compile(r"([0-9]+)p([0-9]+)")
+META_ANNOTATIONS_REGEX = re.compile(r'^\s*"annotations"\s*:', re.MULTILINE)
+
+# file name extension of the metadata sidecars
+META_EXTENSION = ".sigmf-meta"
+
+# extension namespace for the sidecar fields that SigMF has no core
+# field for
+META_NAMESPACE = "rf_utilities"
+SIGMF_VERSION = "1.0.0"
+
+# numpy types of the I and Q values of each datatype, and the integer
+# value that a float value of 1.0 maps to; this is the largest positive
+# value, so a unit-amplitude signal encodes without clipping (and the
+# most negative integer decodes to slightly beyond -1.0)
+IQ_NUMPY_TYPES = {IQ_CF32: np.float32, IQ_CI16: np.int16, IQ_CI8: np.int8}
+IQ_FULL_SCALE = {IQ_CF32: 1.0, IQ_CI16: 32767.0, IQ_CI8: 127.0}
+
+# default number of samples converted at a time
+CONVERT_CHUNK_SIZE = 1 << 20
+FILE_NAME_REGEX = re.compile(
+    r"_c([0-9p]+)([GMkK]?)_s([0-9p]+)([GMkK]?)\.iq$")
+
 def fileNameTextToFloat(valStr, unitStr):
     # if there's a 'p' character, then we have to deal with decimal vals
     if 'p' in valStr:
-        print("decimal value found")
-        regex = re.compile(r"([0-9]+)p([0-9]+)")
-        wholeVal = regex.findall(valStr)[0][0]
-        decimalVal = regex.findall(valStr)[0][1]
+        if debug:
+            print("decimal value found")
+        wholeVal, decimalVal = DECIMAL_REGEX.findall(valStr)[0]
         baseVal = 1.0*int(wholeVal) + 1.0*int(decimalVal)/10**len(decimalVal)
     else:
         baseVal = 1.0*int(valStr)
@@ -32,7 +83,7 @@ def fileNameTextToFloat(valStr, unitStr):
         multiplier = 1e9
     elif unitStr == "M":
         multiplier = 1e6
-    elif unitStr == "k":
+    elif unitStr in ("k", "K"):
         multiplier = 1e3
     else:
         multiplier = 1.0
@@ -40,10 +91,91 @@ def fileNameTextToFloat(valStr, unitStr):
     return baseVal * multiplier
 
 
-import re
+# returns a value as text for a file name, with the largest unit
+# (G, M or k) that keeps it at least one, and a "p" in place of the
+# decimal point; values are kept to the nearest Hz
+def valueToFileNameText(value):
+    value = round(value)
+    for unitStr, multiplier in (("G", 10**9), ("M", 10**6), ("k", 10**3)):
+        if value >= multiplier:
+            break
+    else:
+        unitStr, multiplier = "", 1
+    wholeVal, decimalVal = divmod(int(value), multiplier)
+    valStr = str(wholeVal)
+    if decimalVal:
+        digits = len(str(multiplier)) - 1
+        valStr += "p" + str(decimalVal).zfill(digits).rstrip("0")
+    return valStr + unitStr
+
+
+# parses the name of an I-Q file (with or without a path), returning a
+# tuple of (prefix, center frequency, sample rate), or None if the name
+# does not follow the format above
+def parseFileName(fileName):
+    justName = os.path.basename(fileName)
+    match = FILE_NAME_REGEX.search(justName)
+    if match is None:
+        return None
+    centerValStr, centerUnitStr, sampValStr, sampUnitStr = match.groups()
+
+    if debug:
+        print(centerValStr)
+        print(centerUnitStr)
+        print(sampValStr)
+        print(sampUnitStr)
+
+    # compute center frequency and sample rate
+    centerFreq = fileNameTextToFloat(centerValStr, centerUnitStr)
+    sampRate = fileNameTextToFloat(sampValStr, sampUnitStr)
+    return justName[0:match.start()], centerFreq, sampRate
+
+
+# converts an array of interleaved I and Q values, or of complex64
+# samples, of one datatype to another; float values are scaled so that
+# 1.0 is the full scale of the integer types, then multiplied by scale.
+# Values beyond the range of an integer type are clipped. Returns a
+# tuple of the converted array (complex64 for IQ_CF32, otherwise
+# interleaved integers) and the number of samples in which the I or Q
+# value was clipped.
+def convertIq(data, inType, outType, scale = 1.0):
+    for datatype in (inType, outType):
+        if datatype not in IQ_DATATYPES:
+            raise ValueError("unsupported I-Q datatype: {}".format(datatype))
+    data = np.asarray(data)
+    if inType == IQ_CF32:
+        values = data.astype(np.complex64, copy=False).view(np.float32)
+    else:
+        values = data.reshape(-1)
+    factor = scale*IQ_FULL_SCALE[outType]/IQ_FULL_SCALE[inType]
+
+    if outType == IQ_CF32:
+        result = values.astype(np.float32)
+        if factor != 1.0:
+            result *= np.float32(factor)
+        return result.view(np.complex64), 0
+
+    info = np.iinfo(IQ_NUMPY_TYPES[outType])
+    if inType == outType and factor == 1.0:
+        return values.copy(), 0
+    scaled = values.astype(np.float32)*np.float32(factor)
+    np.rint(scaled, out=scaled)
+    clipped = (scaled < info.min) | (scaled > info.max)
+    numClipped = int(np.count_nonzero(clipped.reshape(-1, 2).any(axis=1)))
+    np.clip(scaled, info.min, info.max, out=scaled)
+    return scaled.astype(IQ_NUMPY_TYPES[outType]), numClipped
+
+
 class iqFileObject():
     def __init__(self, prefix = None, centerFreq = None, 
-                       sampRate = None, fileName = None):
+                       sampRate = None, fileName = None,
+                       datatype = IQ_CF32, gain = None, hardware = None):
+        self.filePath = fileName
+        self._samples = None
+        self.datatype = datatype
+        self.gain = gain
+        self.hardware = hardware
+        self._annotations = None
         # if no file name is specified, store the parameters
         if fileName is None:
             self.prefix = prefix
@@ -52,88 +184,282 @@ class iqFileObject():
         # if the file name is specified, we must derive the parameters
         # from the file name
         else:
-            # first check if we have a simple file name or a name+path
-            regex = re.compile(r"\/")
-            if regex.match(fileName):
-                # separate the filename from the rest of the path
-                regex = re.compile(r"\/([a-zA-Z0-9_.]+)$")
-                justName = regex.findall(fileName)[0]
-            else:
-                justName = fileName
-            # get the substrings representing the values
-            regex = re.compile(r"_c([0-9p]+)([GMK])_s([0-9p]+)([GMk])\.iq$")
-            paramList = regex.findall(justName)
-            centerValStr = paramList[0][0]
-            centerUnitStr = paramList[0][1]
-            sampValStr = paramList[0][2]
-            sampUnitStr = paramList[0][3]
+            params = parseFileName(fileName)
+            if params is None:
+                raise ValueError("cannot get the center frequency and sample "
+                                 "rate from the file name " + fileName)
+            self.prefix, self.centerFreq, self.sampRate = params
 
-            if debug:
-                print(centerValStr)
-                print(centerUnitStr)
-                print(sampValStr)
-                print(sampUnitStr)
-
-            # compute center frequency and sample rate
-            self.centerFreq = fileNameTextToFloat(centerValStr, centerUnitStr)
-            self.sampRate = fileNameTextToFloat(sampValStr, sampUnitStr)
-
-            # get the prefix
-            nonPrefixLen = len("_c" + centerValStr + centerUnitStr +\
-                               "_s" + sampValStr + sampUnitStr + ".iq")
-            self.prefix = justName[0:len(justName)-nonPrefixLen]
-             
             if debug:
                 print(self.centerFreq)
                 print(self.sampRate)
                 print(self.prefix)
 
+            # a sidecar holds the exact values, and anything else known
+            # about the capture; one that cannot be read is ignored, so
+            # the capture can still be opened
+            if os.path.exists(self.metaPath()):
+                try:
+                    self.readMeta()
+                except (OSError, ValueError, TypeError, AttributeError,
+                        KeyError, IndexError) as err:
+                    print("WARNING: ignoring unreadable sidecar {} ({}), "
+                          "using the values in the file name".format(
+                              self.metaPath(), err))
+                    self.prefix, self.centerFreq, self.sampRate = params
+                    self.datatype = datatype
+                    self.gain = gain
+                    self.hardware = hardware
+                    self._annotations = []
+
     def fileName(self):
         tempStr = self.prefix
-        # add center frequency
-        # first determine if we should use k, M, G or nothing
-        # then divide by the appropriate unit
-        if self.centerFreq > 1e9:
-            unitMag = 'G'
-            wholeVal = int(1.0*self.centerFreq/1e9)
-            decimalVal = (1.0*self.centerFreq - 1e9*wholeVal)
-            decimalVal = int(decimalVal/1e7)
-        elif self.centerFreq > 1e6:
-            unitMag = 'M'
-            wholeVal = int(1.0*self.centerFreq/1e6)
-            decimalVal = (1.0*self.centerFreq - 1e6*wholeVal)
-            decimalVal = int(decimalVal/1e4)
-        elif self.centerFreq > 1e3:
-            unitMag = 'k'
-            wholeVal = int(1.0*self.centerFreq/1e3)
-            decimalVal = (1.0*self.centerFreq - 1e3*wholeVal)
-            decimalVal = int(decimalVal/1e1)
-        else:
-            unitMag = ''
-            value = int(self.centerFreq)
-        if decimalVal == 0:
-            tempStr += "_c{}{}".format(wholeVal, unitMag)
-        else: 
-            tempStr += "_c{}p{}{}".format(wholeVal, decimalVal, unitMag)
-
-        # do the same thing for the sample rate
-        if self.sampRate > 1e6:
-            unitMag = 'M'
-            wholeVal = int(1.0*self.sampRate/1e6)
-            decimalVal = (1.0*self.sampRate - 1e6*wholeVal)
-            decimalVal = int(decimalVal/1e4)
-        elif self.sampRate > 1e3:
-            unitMag = 'k'
-            wholeVal = int(1.0*self.sampRate/1e3)
-            decimalVal = (1.0*self.sampRate - 1e3*wholeVal)
-            value = self.sampRate/1e1
-        else:
-            unitMag = ''
-            value = int(self.sampRate)
-        if decimalVal == 0:
-            tempStr += "_s{}{}".format(wholeVal, unitMag)
-        else: 
-            tempStr += "_s{}p{}{}".format(wholeVal, decimalVal, unitMag)
+        tempStr += "_c" + valueToFileNameText(self.centerFreq)
+        tempStr += "_s" + valueToFileNameText(self.sampRate)
         tempStr += ".iq"
         return tempStr
 
+    # path of the I-Q file: the name it was made from, if any, otherwise
+    # the name built from the parameters
+    def path(self):
+        if self.filePath is not None:
+            return self.filePath
+        return self.fileName()
+
+    # read-only memmap of the file, opened on first use: one complex64
+    # per sample for IQ_CF32 files, otherwise a row of two integers (I
+    # and Q) per sample
+    @property
+    def rawSamples(self):
+        if self._samples is None:
+            bytesPerSample = IQ_BYTES_PER_SAMPLE[self.datatype]
+            numSamples = os.path.getsize(self.path())//bytesPerSample
+            if self.datatype == IQ_CF32:
+                dtype, shape = np.complex64, (numSamples,)
+            else:
+                dtype, shape = IQ_NUMPY_TYPES[self.datatype], (numSamples, 2)
+            if numSamples == 0:
+                # numpy cannot map an empty file
+                self._samples = np.zeros(shape, dtype=dtype)
+            else:
+                self._samples = np.memmap(self.path(), dtype=dtype,
+                                          mode='r', shape=shape)
+        return self._samples
+
+    # read-only memmap of the complex64 samples of an IQ_CF32 file;
+    # files of other datatypes are read with sampleSlice(), timeSlice()
+    # or iterChunks(), which upcast them
+    @property
+    def samples(self):
+        if self.datatype != IQ_CF32:
+            raise ValueError("samples can only be mapped from {} files, not "
+                             "{}; use sampleSlice() or iterChunks()".format(
+                                 IQ_CF32, self.datatype))
+        return self.rawSamples
+
+    # releases the memmap; it is opened again if the samples are used
+    def close(self):
+        self._samples = None
+
+    # path of the metadata sidecar
+    def metaPath(self):
+        return os.path.splitext(self.path())[0] + META_EXTENSION
+
+    # reads the header of the sidecar (everything before the
+    # annotations), replacing the values taken from the file name
+    def readMeta(self):
+        with open(self.metaPath()) as metaFile:
+            text = metaFile.read()
+        meta = None
+        match = META_ANNOTATIONS_REGEX.search(text)
+        if match is not None:
+            # the annotations are last, so the header is closed off where
+            # they start and parsed on its own
+            header = text[:match.start()].rstrip().rstrip(",") + "\n}"
+            try:
+                meta = json.loads(header)
+            except ValueError:
+                meta = None
+        if meta is None or "global" not in meta:
+            # written by something else: parse the whole file
+            meta = json.loads(text)
+            self._annotations = meta.get("annotations", [])
+        else:
+            self._annotations = None
+
+        globalMeta = meta.get("global", {})
+        datatype = globalMeta.get("core:datatype", IQ_CF32)
+        if datatype not in IQ_DATATYPES and datatype + "_le" in IQ_DATATYPES:
+            datatype += "_le"
+        if datatype not in IQ_DATATYPES:
+            raise ValueError("unsupported I-Q datatype {} in {}".format(
+                datatype, self.metaPath()))
+        self.datatype = datatype
+        self.sampRate = globalMeta.get("core:sample_rate", self.sampRate)
+        self.hardware = globalMeta.get("core:hw", self.hardware)
+        self.gain = globalMeta.get(META_NAMESPACE + ":gain", self.gain)
+        captures = meta.get("captures", [])
+        if captures and "core:frequency" in captures[0]:
+            self.centerFreq = captures[0]["core:frequency"]
+        self._samples = None
+
+    # writes the sidecar, with the annotations last
+    def writeMeta(self):
+        globalMeta = {
+            "core:datatype": self.datatype,
+            "core:sample_rate": self.sampRate,
+            "core:version": SIGMF_VERSION,
+            "core:description": self.prefix,
+            "core:extensions": [{"name": META_NAMESPACE,
+                                 "version": SIGMF_VERSION,
+                                 "optional": True}],
+        }
+        if self.hardware is not None:
+            globalMeta["core:hw"] = self.hardware
+        if self.gain is not None:
+            globalMeta[META_NAMESPACE + ":gain"] = self.gain
+        captures = [{"core:sample_start": 0, "core:frequency": self.centerFreq}]
+
+        # one annotation per line keeps large sidecars readable
+        lines = ["{",
+                 '"global": ' + json.dumps(globalMeta, sort_keys=True) + ",",
+                 '"captures": ' + json.dumps(captures) + ",",
+                 '"annotations": [']
+        annotations = self.annotations
+        lines += [json.dumps(annotation, sort_keys=True) +
+                  ("," if i < len(annotations) - 1 else "")
+                  for i, annotation in enumerate(annotations)]
+        lines += ["]", "}"]
+        with open(self.metaPath(), "w") as metaFile:
+            metaFile.write("\n".join(lines) + "\n")
+
+    # list of the annotations, each a dictionary of SigMF annotation
+    # fields, sorted by start sample; read from the sidecar on first use
+    @property
+    def annotations(self):
+        if self._annotations is None:
+            self._annotations = []
+            if self.filePath is not None and os.path.exists(self.metaPath()):
+                with open(self.metaPath()) as metaFile:
+                    self._annotations = json.load(metaFile).get("annotations", [])
+        return self._annotations
+
+    # adds an annotation marking sampleCount samples from sampleStart;
+    # call writeMeta() to save it
+    def addAnnotation(self, sampleStart, sampleCount, label = None,
+                      comment = None, freqLowerEdge = None,
+                      freqUpperEdge = None):
+        annotation = {"core:sample_start": int(sampleStart),
+                      "core:sample_count": int(sampleCount)}
+        for key, value in (("core:label", label), ("core:comment", comment),
+                           ("core:freq_lower_edge", freqLowerEdge),
+                           ("core:freq_upper_edge", freqUpperEdge)):
+            if value is not None:
+                annotation[key] = value
+        annotations = self.annotations
+        annotations.append(annotation)
+        annotations.sort(key=lambda item: item["core:sample_start"])
+        return annotation
+
+    # generator returning (annotation, samples) for each annotation, or
+    # each with the label given, where samples is a view of the memmap
+    # holding just the annotated samples
+    def annotatedSlices(self, label = None):
+        for annotation in self.annotations:
+            if label is not None and annotation.get("core:label") != label:
+                continue
+            start = annotation["core:sample_start"]
+            count = annotation.get("core:sample_count")
+            stop = None if count is None else start + count
+            yield annotation, self.sampleSlice(start, stop)
+
+    @property
+    def numSamples(self):
+        return len(self.rawSamples)
+
+    # length of the file in seconds
+    @property
+    def duration(self):
+        return self.numSamples/float(self.sampRate)
+
+    # returns the index of the sample nearest the time, in seconds from
+    # the start of the file, limited to the length of the file
+    def timeToSample(self, timeVal):
+        index = int(round(timeVal*self.sampRate))
+        return min(max(index, 0), self.numSamples)
+
+    # returns the samples from start up to (but not including) stop,
+    # without reading the rest of the file; for IQ_CF32 files this is a
+    # view of the memmap, otherwise a complex64 copy scaled to full scale
+    # at 1.0
+    def sampleSlice(self, start, stop = None):
+        raw = self.rawSamples[start:stop]
+        if self.datatype == IQ_CF32:
+            return raw
+        return convertIq(raw, self.datatype, IQ_CF32)[0]
+
+    # returns the samples between two times, in seconds from the start
+    # of the file, as sampleSlice() does
+    def timeSlice(self, startTime, stopTime = None):
+        start = self.timeToSample(startTime)
+        if stopTime is None:
+            return self.sampleSlice(start)
+        return self.sampleSlice(start, self.timeToSample(stopTime))
+
+    # generator returning the samples from start to stop in chunks of
+    # chunkSize new samples (from sampleSlice(), so views for IQ_CF32
+    # files); each chunk after the first also begins with the last
+    # overlap samples of the previous one, so that filters can be warmed
+    # up on them
+    def iterChunks(self, chunkSize = 1 << 20, overlap = 0, start = 0,
+                   stop = None):
+        if chunkSize <= 0 or overlap < 0:
+            raise ValueError("chunkSize must be positive and overlap "
+                             "cannot be negative")
+        numSamples = self.numSamples
+        if stop is None or stop > numSamples:
+            stop = numSamples
+        for chunkStart in range(start, stop, chunkSize):
+            yield self.sampleSlice(max(chunkStart - overlap, start),
+                                   min(chunkStart + chunkSize, stop))
+
+
+# converts an I-Q file to another datatype a chunk at a time, scaling
+# the values as convertIq() does, and writes a sidecar for the new file
+# holding its datatype and the metadata of the original (the new file
+# name must follow the format above). Prints a warning if any samples
+# were clipped, and returns a tuple of the number of samples converted
+# and the number clipped.
+def convertIqFile(inFileName, outFileName, outType, scale = 1.0,
+                  chunkSize = CONVERT_CHUNK_SIZE, verbose = False):
+    inFile = iqFileObject(fileName = inFileName)
+    outFile = iqFileObject(fileName = outFileName, datatype = outType)
+    numSamples = 0
+    numClipped = 0
+    with open(outFileName, 'wb') as outData:
+        for start in range(0, inFile.numSamples, chunkSize):
+            raw = inFile.rawSamples[start:start + chunkSize]
+            converted, chunkClipped = convertIq(raw, inFile.datatype,
+                                                outType, scale)
+            outData.write(memoryview(converted))
+            numSamples += len(raw)
+            numClipped += chunkClipped
+    inFile.close()
+
+    outFile.datatype = outType
+    outFile.centerFreq = inFile.centerFreq
+    outFile.sampRate = inFile.sampRate
+    outFile.gain = inFile.gain
+    outFile.hardware = inFile.hardware
+    outFile._annotations = list(inFile.annotations)
+    outFile.writeMeta()
+
+    if numClipped:
+        print("WARNING: {} of {} samples ({:.3f}%) clipped converting {} "
+              "to {}".format(numClipped, numSamples,
+                             100.0*numClipped/numSamples, inFileName, outType))
+    if verbose:
+        print("Converted {} samples from {} to {}".format(
+            numSamples, inFile.datatype, outType))
+    return numSamples, numClipped
+
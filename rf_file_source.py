@@ -0,0 +1,70 @@
+# This module builds the GNU Radio file source shared by the receive
+# flowgraphs in rf_demod and rf_ntsc, which read I-Q captures in any of
+# the rf_const IQ_ datatypes. Integer samples are upcast to gr_complex
+# by an interleaved to complex block as they are read, so compact
+# captures need a half (ci16) or a quarter (ci8) of the disk reads of
+# gr_complex files.
+#
+# The interleaved to complex blocks take a scale factor from GNU Radio
+# 3.9 on; with older versions the samples are scaled by a multiply_const
+# block instead, so the flowgraphs run on either.
+
+from gnuradio import blocks
+from gnuradio import gr
+from rf_const import IQ_CF32, IQ_CI16, IQ_CI8
+from rf_file_handler import IQ_FULL_SCALE
+
+
+# builds an interleaved to complex block that divides each value by
+# scale, connecting a multiply_const block after it if this version of
+# GNU Radio has no scale factor on the block; returns the input and
+# output blocks of the conversion
+def _interleaved_to_complex(flowgraph, block_type, args, scale):
+    try:
+        flowgraph.blocks_interleaved_to_complex_0 = block_type(*(args + (scale,)))
+        return (flowgraph.blocks_interleaved_to_complex_0,
+                flowgraph.blocks_interleaved_to_complex_0)
+    except TypeError:
+        flowgraph.blocks_interleaved_to_complex_0 = block_type(*args)
+    flowgraph.blocks_multiply_const_iq_0 = blocks.multiply_const_cc(1.0/scale)
+    flowgraph.connect(
+        (flowgraph.blocks_interleaved_to_complex_0, 0),
+        (flowgraph.blocks_multiply_const_iq_0, 0))
+    return (flowgraph.blocks_interleaved_to_complex_0,
+            flowgraph.blocks_multiply_const_iq_0)
+
+
+# builds a file source for I-Q data of the given datatype, adding it to
+# the flowgraph; integer full scale (IQ_FULL_SCALE, shared with
+# rf_file_handler.convertIq()) comes out as 1.0. Returns the block that
+# outputs gr_complex
+def iq_file_source(flowgraph, iq_file_name, iq_data_type = IQ_CF32,
+                   repeat = True):
+    if iq_data_type == IQ_CF32:
+        flowgraph.blocks_file_source_0 = blocks.file_source(
+            gr.sizeof_gr_complex * 1,
+            iq_file_name,
+            repeat=repeat)
+        return flowgraph.blocks_file_source_0
+    elif iq_data_type == IQ_CI16:
+        flowgraph.blocks_file_source_0 = blocks.file_source(
+            gr.sizeof_short * 1,
+            iq_file_name,
+            repeat=repeat)
+        convert_in, convert_out = _interleaved_to_complex(
+            flowgraph, blocks.interleaved_short_to_complex, (False, False),
+            IQ_FULL_SCALE[IQ_CI16])
+    elif iq_data_type == IQ_CI8:
+        flowgraph.blocks_file_source_0 = blocks.file_source(
+            gr.sizeof_char * 1,
+            iq_file_name,
+            repeat=repeat)
+        convert_in, convert_out = _interleaved_to_complex(
+            flowgraph, blocks.interleaved_char_to_complex, (False,),
+            IQ_FULL_SCALE[IQ_CI8])
+    else:
+        raise ValueError("unsupported I-Q datatype: {}".format(iq_data_type))
+    flowgraph.connect(
+        (flowgraph.blocks_file_source_0, 0),
+        (convert_in, 0))
+    return convert_out
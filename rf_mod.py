@@ -25,6 +25,7 @@ import osmosdr
 import time
 import sys
 import numpy
+from build_baseband import RunLengthBaseband
 
 # global constants
 MOD_OOK = 0
@@ -125,6 +126,13 @@ class top_block_simple(gr.top_block):
     # flowgraph's message queue for transmission
     def fill_queue_vector(self, bb_list, hop_select_list):
 
+        # run-length basebands are expanded here, where the samples
+        # are needed
+        if isinstance(bb_list, RunLengthBaseband):
+            bb_list = bb_list.expand()
+        if isinstance(hop_select_list, RunLengthBaseband):
+            hop_select_list = hop_select_list.expand()
+
         # baseband and select values must be the same
         if len(bb_list) != len(hop_select_list):
             print("Fatal Error: hop select list must be same length as baseband list")
@@ -274,6 +282,13 @@ class top_block(gr.top_block):
     # flowgraph's message queue for transmission
     def fill_queue_vector(self, bb_list, hop_select_list):
 
+        # run-length basebands are expanded here, where the samples
+        # are needed
+        if isinstance(bb_list, RunLengthBaseband):
+            bb_list = bb_list.expand()
+        if isinstance(hop_select_list, RunLengthBaseband):
+            hop_select_list = hop_select_list.expand()
+
         # baseband and select values must be the same
         if len(bb_list) != len(hop_select_list):
             print("Fatal Error: hop select list must be same length as baseband list")
@@ -544,6 +559,13 @@ class fsk_hop_tx_flowgraph(gr.top_block):
     # flowgraph's message queue for transmission
     def fill_queue_vector(self, bb_list, hop_select_list):
 
+        # run-length basebands are expanded here, where the samples
+        # are needed
+        if isinstance(bb_list, RunLengthBaseband):
+            bb_list = bb_list.expand()
+        if isinstance(hop_select_list, RunLengthBaseband):
+            hop_select_list = hop_select_list.expand()
+
         # baseband and select values must be the same
         if len(bb_list) != len(hop_select_list):
             print("Fatal Error: hop select list must be same length as baseband list")
@@ -12,6 +12,8 @@ import pmt
 import math
 import osmosdr
 import numpy
+from rf_const import IQ_CF32
+from rf_file_source import iq_file_source
 
 # global constants
 class ntsc_fm_demod_flowgraph(gr.top_block):
@@ -21,7 +23,8 @@ class ntsc_fm_demod_flowgraph(gr.top_block):
                  bb_lpf_cutoff, bb_lpf_transition,
                  tcp_str,
                  hw_sel,
-                 fifo_name = "", repeat=True, iq_file_name=""):
+                 fifo_name = "", repeat=True, iq_file_name="",
+                 iq_data_type=IQ_CF32):
 
         gr.top_block.__init__(self)
 
@@ -43,6 +46,7 @@ class ntsc_fm_demod_flowgraph(gr.top_block):
             print("  FIFO Name: {}".format(fifo_name))
             print("  Repeat: {}".format(repeat))
             print("  IQ File Name: {}".format(iq_file_name))
+            print("  IQ Data Type: {}".format(iq_data_type))
 
         # start by dumping baseband into a file and viewing in grc
 
@@ -113,14 +117,12 @@ class ntsc_fm_demod_flowgraph(gr.top_block):
         else:
             if verbose > 0:
                 print("Using {} as input...".format(iq_file_name))
-            self.blocks_file_source_0 = blocks.file_source(
-                gr.sizeof_gr_complex * 1,
-                iq_file_name,
-                repeat=repeat)
+            iq_source = iq_file_source(self, iq_file_name,
+                                       iq_data_type, repeat)
             self.blocks_throttle_0 = blocks.throttle(
                 gr.sizeof_gr_complex * 1, samp_rate, True)
             self.connect(
-                (self.blocks_file_source_0, 0),
+                (iq_source, 0),
                 (self.blocks_throttle_0, 0)
             )
 
@@ -263,7 +265,8 @@ class ntsc_fm_demod_flowgraph_fxfir(gr.top_block):
                  samp_rate, bb_samp_rate,
                  fm_deviation, channel_width, transition_width,
                  bb_lpf_cutoff, bb_lpf_transition,
-                 tcp_str, fifo_name = "", repeat=True, iq_file_name=""):
+                 tcp_str, fifo_name = "", repeat=True, iq_file_name="",
+                 iq_data_type=IQ_CF32):
 
         gr.top_block.__init__(self)
 
@@ -281,6 +284,7 @@ class ntsc_fm_demod_flowgraph_fxfir(gr.top_block):
             print("  FIFO Name: {}".format(fifo_name))
             print("  Repeat: {}".format(repeat))
             print("  IQ File Name: {}".format(iq_file_name))
+            print("  IQ Data Type: {}".format(iq_data_type))
 
         # start by dumping baseband into a file and viewing in grc
 
@@ -335,14 +339,12 @@ class ntsc_fm_demod_flowgraph_fxfir(gr.top_block):
         else:
             if verbose > 0:
                 print("Using {} as input...".format(iq_file_name))
-            self.blocks_file_source_0 = blocks.file_source(
-                gr.sizeof_gr_complex * 1,
-                iq_file_name,
-                repeat=repeat)
+            iq_source = iq_file_source(self, iq_file_name,
+                                       iq_data_type, repeat)
             self.blocks_throttle_0 = blocks.throttle(
                 gr.sizeof_gr_complex * 1, samp_rate, True)
             self.connect(
-                (self.blocks_file_source_0, 0),
+                (iq_source, 0),
                 (self.blocks_throttle_0, 0)
             )
 
@@ -0,0 +1,262 @@
+# This module synthesizes I-Q data from a digital baseband without
+# gnuradio or any radio hardware. It does the same job as the transmit
+# flowgraphs in rf_mod, but writes the complex samples to an .iq file
+# (named through rf_file_handler.iqFileObject) instead of a sink, using
+# nothing but numpy, so test vectors can be built on any machine and
+# much faster than real time.
+#
+# The following modulations are supported:
+#   MOD_OOK  - the carrier is switched on for baseband levels of 1 and
+#              off for 0, with an amplitude of ook_gain
+#   MOD_FSK  - the carrier is shifted by +fsk_deviation_hz/2 for levels
+#              of 1 and -fsk_deviation_hz/2 for 0, with continuous phase
+#   MOD_GFSK - as MOD_FSK, but the frequency is smoothed by a Gaussian
+#              filter with a bandwidth-time product of gfsk_bt, which
+#              needs the symbol rate of the baseband
+#
+# The carrier sits at frequency - center_freq in the I-Q data, as it
+# does in the rf_mod flowgraphs.
+#
+# The baseband can be a RunLengthBaseband, a CompiledBaseband or an
+# array with one level per sample (at baseband_samp_rate), and is
+# resampled to samp_rate as a list of runs, so the rates need not be
+# whole multiples of each other. The samples are made a chunk at a time
+# and the phase and filter state carried from one chunk to the next, so
+# the output is the same whatever the chunk size, and files of many GB
+# are written in a fixed amount of memory.
+
+import os
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from build_baseband import RunLengthBaseband
+from rf_file_handler import iqFileObject
+
+# global constants; these match the values in rf_mod, which has no
+# GFSK flowgraph (and DPSK is not synthesized here)
+MOD_OOK = 0
+MOD_FSK = 1
+MOD_GFSK = 3
+
+# default length of the Gaussian filter, in symbols
+GFSK_SPAN_SYMBOLS = 4
+
+# filters longer than this are run with FFTs rather than np.convolve
+FFT_FILTER_MIN_TAPS = 64
+
+# default number of samples made at a time
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+
+# returns the taps of a Gaussian filter for the bandwidth-time product
+# bt, normalized to a gain of one; there is always an odd number of
+# taps so the filter delay is a whole number of samples
+def gaussian_taps(bt, samples_per_symbol, span_symbols = GFSK_SPAN_SYMBOLS):
+    if bt <= 0 or samples_per_symbol <= 0:
+        raise ValueError("the BT product and samples per symbol must be positive")
+    half_len = max(int(round(span_symbols*samples_per_symbol/2.0)), 1)
+    sigma = np.sqrt(np.log(2.0))/(2*np.pi*bt)*samples_per_symbol
+    n = np.arange(-half_len, half_len + 1, dtype=np.float64)
+    taps = np.exp(-0.5*(n/sigma)**2)
+    return taps/taps.sum()
+
+
+# returns the valid part of the convolution of samples with taps; long
+# filters are run by overlap-save, with FFTs a few times the length of
+# the filter, which stay in cache where one FFT of the whole chunk
+# would not
+def _filter_valid(samples, taps):
+    if len(taps) < FFT_FILTER_MIN_TAPS:
+        return np.convolve(samples, taps, mode="valid")
+    num_out = len(samples) - len(taps) + 1
+    if num_out <= 0:
+        return np.zeros(0)
+    fft_len = 1 << (8*len(taps) - 1).bit_length()
+    step = fft_len - len(taps) + 1
+    num_blocks = -(-num_out//step)
+    padded = np.zeros(num_blocks*step + len(taps) - 1)
+    padded[:len(samples)] = samples
+    blocks = sliding_window_view(padded, fft_len)[::step]
+    spectrum = np.fft.rfft(blocks, axis=1)*np.fft.rfft(taps, fft_len)
+    out = np.fft.irfft(spectrum, fft_len, axis=1)[:, len(taps) - 1:]
+    return out.reshape(-1)[:num_out]
+
+
+# The baseband_synthesizer turns baseband levels, at the output sample
+# rate, into complex64 I-Q samples. Call feed() with each chunk of
+# levels and flush() at the end of the stream; the phase of the carrier
+# (and for GFSK the filter history) is kept between calls. The Gaussian
+# filter is centred on each sample, so GFSK output lags the input by
+# half the filter length until flush() returns the remaining samples;
+# the total number of samples always equals the number of levels fed.
+class baseband_synthesizer(object):
+    def __init__(self, modulation, samp_rate, freq_offset = 0.0,
+                 ook_gain = 1.0, fsk_deviation_hz = 0.0,
+                 gfsk_bt = 0.5, symbol_rate = None,
+                 span_symbols = GFSK_SPAN_SYMBOLS):
+        if modulation not in (MOD_OOK, MOD_FSK, MOD_GFSK):
+            raise ValueError("unsupported modulation: {}".format(modulation))
+        self.modulation = modulation
+        self.samp_rate = float(samp_rate)
+        self.freq_offset = float(freq_offset)
+        self.ook_gain = float(ook_gain)
+        self.fsk_deviation_hz = float(fsk_deviation_hz)
+        self.taps = None
+        if modulation == MOD_GFSK:
+            if symbol_rate is None:
+                raise ValueError("GFSK synthesis needs the symbol rate")
+            self.taps = gaussian_taps(gfsk_bt, self.samp_rate/symbol_rate,
+                                      span_symbols)
+        self.reset()
+
+    # clears the phase and filter state so that a new stream can be made
+    def reset(self):
+        self.phase = 0.0
+        self.filter_history = None
+        self.last_level = 0.0
+
+    # delay of the Gaussian filter in samples
+    @property
+    def filter_delay(self):
+        return 0 if self.taps is None else (len(self.taps) - 1)//2
+
+    # returns the instantaneous frequency for each sample of a chunk
+    def _frequencies(self, levels):
+        if self.modulation == MOD_OOK:
+            return np.full(len(levels), self.freq_offset)
+        symbols = np.where(levels != 0, 1.0, -1.0)
+        if self.modulation == MOD_GFSK:
+            symbols = self._gaussian_filter(symbols)
+        return self.freq_offset + symbols*(self.fsk_deviation_hz/2)
+
+    # runs the next piece of the stream through the Gaussian filter;
+    # the stream is extended backwards with copies of its first value
+    # so that the first output is centred on the first input
+    def _gaussian_filter(self, symbols):
+        delay = self.filter_delay
+        if self.filter_history is None:
+            if len(symbols) == 0:
+                return symbols
+            self.filter_history = np.full(delay, symbols[0])
+        buf = np.concatenate((self.filter_history, symbols))
+        if len(symbols):
+            self.last_level = symbols[-1]
+        if len(buf) <= 2*delay:
+            self.filter_history = buf
+            return np.zeros(0)
+        self.filter_history = buf[len(buf) - 2*delay:]
+        return _filter_valid(buf, self.taps)
+
+    # turns instantaneous frequencies into unit phasors, advancing the
+    # phase accumulator; the phase is accumulated in float64 and wrapped
+    # to one turn before the (float32) sine and cosine are taken, so it
+    # does not lose precision in long streams
+    def _phasors(self, freqs):
+        steps = (2*np.pi/self.samp_rate)*freqs
+        phases = np.cumsum(steps)
+        phases -= steps
+        phases += self.phase
+        if len(steps):
+            self.phase = float(np.fmod(phases[-1] + steps[-1], 2*np.pi))
+        phases = np.fmod(phases, 2*np.pi).astype(np.float32)
+        phasors = np.empty(len(phases), dtype=np.complex64)
+        phasors.real = np.cos(phases)
+        phasors.imag = np.sin(phases)
+        return phasors
+
+    # returns the I-Q samples for the next chunk of baseband levels
+    def feed(self, levels):
+        levels = np.asarray(levels).reshape(-1)
+        phasors = self._phasors(self._frequencies(levels))
+        if self.modulation == MOD_OOK:
+            phasors *= np.where(levels != 0, self.ook_gain, 0.0).astype(np.float32)
+        return phasors
+
+    # returns the samples still held in the filter; call this at the end
+    # of the stream
+    def flush(self):
+        if self.filter_history is None or self.filter_delay == 0:
+            return np.zeros(0, dtype=np.complex64)
+        tail = np.full(self.filter_delay, self.last_level)
+        freqs = self.freq_offset + \
+            self._gaussian_filter(tail)*(self.fsk_deviation_hz/2)
+        self.filter_history = None
+        return self._phasors(freqs)
+
+
+# returns the baseband as a RunLengthBaseband at samp_rate
+def _baseband_at_rate(baseband, samp_rate, baseband_samp_rate = None):
+    if hasattr(baseband, "runLength"):
+        # a CompiledBaseband is built straight at the output rate
+        return baseband.runLength(samp_rate)
+    if not isinstance(baseband, RunLengthBaseband):
+        if baseband_samp_rate is None:
+            raise ValueError("the sample rate of the baseband array is needed")
+        baseband = RunLengthBaseband.fromSamples(baseband, baseband_samp_rate)
+    if baseband.sampleRate is None:
+        raise ValueError("the baseband has no sample rate")
+    if baseband.sampleRate != samp_rate:
+        baseband = baseband.resample(samp_rate)
+    return baseband
+
+
+# generator returning complex64 arrays of at most chunk_size I-Q samples
+# for the baseband repeated repeat times; see baseband_synthesizer for
+# the modulation parameters
+def synth_chunks(baseband, modulation, center_freq, frequency, samp_rate,
+                 ook_gain = 1.0, fsk_deviation_hz = 0.0, gfsk_bt = 0.5,
+                 symbol_rate = None, baseband_samp_rate = None, repeat = 1,
+                 chunk_size = DEFAULT_CHUNK_SIZE):
+    baseband = _baseband_at_rate(baseband, samp_rate, baseband_samp_rate)
+    synth = baseband_synthesizer(modulation, samp_rate,
+                                 freq_offset = frequency - center_freq,
+                                 ook_gain = ook_gain,
+                                 fsk_deviation_hz = fsk_deviation_hz,
+                                 gfsk_bt = gfsk_bt, symbol_rate = symbol_rate)
+    # the filter delay holds back a few samples per chunk, so the output
+    # is regrouped into whole chunks
+    pending = []
+    pending_len = 0
+    for _ in range(repeat):
+        for levels in baseband.iterSamples(chunk_size):
+            samples = synth.feed(levels)
+            pending.append(samples)
+            pending_len += len(samples)
+            if pending_len >= chunk_size:
+                merged = np.concatenate(pending)
+                yield merged[:chunk_size]
+                pending = [merged[chunk_size:]]
+                pending_len -= chunk_size
+    pending.append(synth.flush())
+    merged = np.concatenate(pending)
+    for start in range(0, len(merged), chunk_size):
+        yield merged[start:start + chunk_size]
+
+
+# synthesizes the baseband and writes it to an .iq file of complex64
+# samples in out_dir, named from prefix, center_freq and samp_rate;
+# returns the path of the file
+def synth_to_file(baseband, modulation, center_freq, frequency, samp_rate,
+                  prefix, out_dir = ".", ook_gain = 1.0, fsk_deviation_hz = 0.0,
+                  gfsk_bt = 0.5, symbol_rate = None, baseband_samp_rate = None,
+                  repeat = 1, chunk_size = DEFAULT_CHUNK_SIZE, verbose = False):
+    file_name = iqFileObject(prefix = prefix, centerFreq = center_freq,
+                             sampRate = samp_rate).fileName()
+    file_path = os.path.join(out_dir, file_name)
+    if verbose:
+        print("Synthesizing I-Q data to " + file_path)
+    num_samples = 0
+    with open(file_path, 'wb') as out_file:
+        for samples in synth_chunks(baseband, modulation, center_freq,
+                                    frequency, samp_rate,
+                                    ook_gain = ook_gain,
+                                    fsk_deviation_hz = fsk_deviation_hz,
+                                    gfsk_bt = gfsk_bt,
+                                    symbol_rate = symbol_rate,
+                                    baseband_samp_rate = baseband_samp_rate,
+                                    repeat = repeat, chunk_size = chunk_size):
+            out_file.write(memoryview(samples))
+            num_samples += len(samples)
+    if verbose:
+        print("Wrote {} samples".format(num_samples))
+    return file_path
@@ -0,0 +1,166 @@
+# This module searches bit streams for sync words (preambles, access
+# codes, etc.), allowing for a number of bit errors in each match. The
+# stream can be fed in chunks of any size, such as the output of a
+# generator reading a large file, and matches that straddle a chunk
+# boundary are still found.
+#
+# The matching is done on packed words: every window of the stream that
+# is the length of a sync word is packed into a 64-bit integer, XORed
+# with the sync word and the differing bits counted. The windows are
+# built with a handful of shift/OR passes over the chunk, so the search
+# runs at numpy speed rather than one bit at a time.
+#
+# Each match is returned as a tuple of (offset, pattern_id, errors):
+#   offset     - index in the overall stream of the first bit of the
+#                sync word; the bits following the sync word start at
+#                offset + len(sync word)
+#   pattern_id - index of the matching sync word in the list passed in
+#   errors     - number of bits that differed from the sync word
+
+import numpy as np
+
+# sync words are packed into 64-bit words, which limits their length
+MAX_SYNC_WORD_LEN = 64
+
+if hasattr(np, "bitwise_count"):
+    def _popCount(words):
+        return np.bitwise_count(words)
+else:
+    _POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)],
+                               dtype=np.uint8)
+
+    def _popCount(words):
+        byteCounts = _POPCOUNT_TABLE[words.view(np.uint8)]
+        return byteCounts.reshape(words.shape + (8,)).sum(axis=-1)
+
+
+# returns an array in which item i holds bits[i:i+windowLen] packed
+# into an integer, MSB first; windows of power-of-two lengths are built
+# by doubling and then combined to make up the requested length
+def _packedWindows(bits, windowLen):
+    numWindows = len(bits) - windowLen + 1
+    if numWindows <= 0:
+        return np.zeros(0, dtype=np.uint64)
+
+    powers = {1: bits.astype(np.uint64)}
+    size = 1
+    while 2*size <= windowLen:
+        prev = powers[size]
+        powers[2*size] = (prev[:-size] << np.uint64(size)) | prev[size:]
+        size *= 2
+
+    windows = None
+    offset = 0
+    for size in sorted(powers, reverse=True):
+        if windowLen - offset >= size:
+            part = powers[size][offset:offset + numWindows]
+            if windows is None:
+                windows = part.copy()
+            else:
+                windows = (windows << np.uint64(size)) | part
+            offset += size
+    return windows
+
+
+# converts a sync word given as a string of '0' and '1' characters or
+# as a list of bits into a uint8 array
+def _syncWordToBits(syncWord):
+    if isinstance(syncWord, str):
+        syncWord = [int(char) for char in syncWord]
+    bits = np.asarray(syncWord, dtype=np.uint8)
+    if bits.ndim != 1 or len(bits) == 0 or np.any(bits > 1):
+        raise ValueError("sync words must be non-empty lists of bits")
+    if len(bits) > MAX_SYNC_WORD_LEN:
+        raise ValueError("sync words are limited to {} bits".format(
+            MAX_SYNC_WORD_LEN))
+    return bits
+
+
+# The SyncWordMatcher holds one or more sync words and the state needed
+# to search a stream that arrives in pieces. Call feed() with each chunk
+# of bits to get the matches that have become visible, or pass an
+# iterable of chunks to search() to get a generator of matches. Chunks
+# are normally bit lists, BitVectors or numpy arrays of 0/1 values; if
+# packedInput is True, each chunk is instead a bytes-like object holding
+# eight bits per byte, MSB first.
+class SyncWordMatcher(object):
+    def __init__(self, syncWords, maxErrors = 0, packedInput = False):
+        self.syncWords = [_syncWordToBits(syncWord) for syncWord in syncWords]
+        self.maxErrors = maxErrors
+        self.packedInput = packedInput
+        self.patternValues = []
+        self.lengthGroups = {}
+        for patternId, bits in enumerate(self.syncWords):
+            value = 0
+            for bit in bits.tolist():
+                value = (value << 1) | bit
+            self.patternValues.append(np.uint64(value))
+            self.lengthGroups.setdefault(len(bits), []).append(patternId)
+        self.maxLen = max(self.lengthGroups)
+        self.reset()
+
+    # clears the stream state so that a new stream can be searched
+    def reset(self):
+        self.pending = []
+        self.tail = np.zeros(0, dtype=np.uint8)
+        self.tailOffset = 0
+        self.nextStart = dict((length, 0) for length in self.lengthGroups)
+
+    # searches the next chunk of the stream, returning a list of the
+    # matches found, sorted by offset; the last few bits of the chunk
+    # are held back so that they can be matched along with the start
+    # of the next chunk. When the sync words differ in length, matches
+    # of the shorter words are also held back until the longer words
+    # have been checked at all earlier offsets, so that the matches
+    # from successive calls are always in offset order
+    def feed(self, chunk):
+        if self.packedInput:
+            newBits = np.unpackbits(np.frombuffer(bytes(chunk), dtype=np.uint8))
+        else:
+            newBits = np.asarray(chunk, dtype=np.uint8)
+        bits = np.concatenate((self.tail, newBits))
+        base = self.tailOffset
+
+        matches = self.pending
+        for length, patternIds in self.lengthGroups.items():
+            first = self.nextStart[length] - base
+            windows = _packedWindows(bits, length)[first:]
+            for patternId in patternIds:
+                errors = _popCount(windows ^ self.patternValues[patternId])
+                hits = np.nonzero(errors <= self.maxErrors)[0]
+                matches.extend(zip((hits + base + first).tolist(),
+                                   [patternId]*len(hits),
+                                   errors[hits].tolist()))
+            self.nextStart[length] = base + first + len(windows)
+
+        keepCount = min(self.maxLen - 1, len(bits))
+        self.tail = bits[len(bits) - keepCount:].copy()
+        self.tailOffset = base + len(bits) - keepCount
+        matches.sort()
+        emitLimit = min(self.nextStart.values())
+        emitCount = 0
+        while emitCount < len(matches) and matches[emitCount][0] < emitLimit:
+            emitCount += 1
+        self.pending = matches[emitCount:]
+        return matches[:emitCount]
+
+    # returns any matches still held back; call this at the end of the
+    # stream (search() does so automatically)
+    def flush(self):
+        matches = self.pending
+        self.pending = []
+        return matches
+
+    # generator returning the matches found in each chunk of an iterable
+    def search(self, chunks):
+        for chunk in chunks:
+            for match in self.feed(chunk):
+                yield match
+        for match in self.flush():
+            yield match
+
+
+# returns a list of all of the sync word matches in a single bit list
+def findSyncWords(bitList, syncWords, maxErrors = 0):
+    matcher = SyncWordMatcher(syncWords, maxErrors)
+    return matcher.feed(bitList) + matcher.flush()
@@ -0,0 +1,6 @@
+# the modules import each other by their bare names, as they do when
+# run from the repository directory, so that directory goes on the path
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
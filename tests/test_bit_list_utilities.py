@@ -0,0 +1,153 @@
+import numpy as np
+import pytest
+
+import bit_list_utilities as blu
+from bit_list_utilities import BitVector, FieldPlan, LOGIC_X
+
+
+def _randomBits(numBits, seed = 0):
+    return np.random.default_rng(seed).integers(0, 2, numBits).tolist()
+
+
+def test_bit_vector_matches_bit_list():
+    bits = _randomBits(37)
+    vector = BitVector(bits)
+    assert len(vector) == 37
+    assert vector.toList() == bits
+    assert vector == bits
+    assert list(vector) == bits
+    assert vector[5] == bits[5] and vector[-1] == bits[-1]
+    assert vector[3:20] == bits[3:20]
+    assert vector.toInt() == blu.bitsToDec(bits)
+    assert vector.toInt(invert=True, reverse=True) == \
+        blu.bitsToDec(bits, invert=True, reverse=True)
+    assert BitVector.fromInt(vector.toInt(), 37) == vector
+    assert BitVector.fromBytes(vector.toBytes(), 37) == vector
+    assert (vector + [1, 0]) == bits + [1, 0]
+
+
+def test_bit_vector_set_item():
+    vector = BitVector([0]*10)
+    vector[3] = 1
+    vector[7:9] = [1, 1]
+    assert vector.toList() == [0, 0, 0, 1, 0, 0, 0, 1, 1, 0]
+    with pytest.raises(ValueError):
+        vector[0] = 2
+    with pytest.raises(ValueError):
+        BitVector([0, 1, 2])
+
+
+@pytest.mark.parametrize("rotate", [-3, 0, 1, 5, 12])
+@pytest.mark.parametrize("invert", [False, True])
+def test_rotate_bit_list(rotate, invert):
+    bits = _randomBits(11, seed=rotate + 20)
+    shift = rotate % len(bits)
+    expected = bits[len(bits) - shift:] + bits[:len(bits) - shift]
+    if invert:
+        expected = [1 - bit for bit in expected]
+    assert blu.rotateBitList(bits, rotate, invert) == expected
+    assert list(blu.rotateBitList(BitVector(bits), rotate, invert)) == expected
+
+
+def test_extract_disjointed_bits():
+    bits = [1, 0, 1, 1, 0]
+    for target in (bits, BitVector(bits)):
+        assert list(blu.extractDisjointedBits(target, [4, 0, 2])) == [0, 1, 1]
+        assert list(blu.extractDisjointedBits(target, [0, 7])) == [1, LOGIC_X]
+
+
+def test_write_disjoint_bits_length_mismatch():
+    with pytest.raises(ValueError):
+        blu.writeDisjointBits([0]*8, [1], [1, 2])
+
+
+def test_batch_conversions_match_scalar():
+    rows = [_randomBits(23, seed=i) for i in range(6)]
+    values, valid = blu.bitsToDecBatch(rows)
+    assert valid.all()
+    assert values.tolist() == [blu.bitsToDec(row) for row in rows]
+    bits, valid = blu.decToPaddedBitsBatch(values, 23)
+    assert valid.all()
+    assert bits.tolist() == rows
+
+    values, _ = blu.bitsToDecBatch(rows, invert=True, reverse=True)
+    bits, _ = blu.decToPaddedBitsBatch(values, 23, invert=True, reverse=True)
+    assert bits.tolist() == rows
+
+
+def test_batch_conversions_flag_bad_rows():
+    values, valid = blu.bitsToDecBatch([[1, 0, 1], [1, LOGIC_X, 0]])
+    assert values.tolist() == [5, 0]
+    assert valid.tolist() == [True, False]
+    bits, valid = blu.decToPaddedBitsBatch([3, 8, -1], 3)
+    assert valid.tolist() == [True, False, False]
+    assert bits.tolist() == [[0, 1, 1], [0, 0, 0], [0, 0, 0]]
+
+
+def test_wide_batch_conversions():
+    rows = [_randomBits(100, seed=i) for i in range(3)]
+    values, valid = blu.bitsToDecBatch(rows)
+    assert [int(value) for value in values] == [blu.bitsToDec(row) for row in rows]
+    bits, valid = blu.decToPaddedBitsBatch(values, 100)
+    assert valid.all() and bits.tolist() == rows
+
+
+def test_field_plan_extract_and_write():
+    packets = [[1, 0, 1, 1, 0, 0, 1, 1], [0, 1, 1]]
+    plan = FieldPlan({"a": [0, 1, 2], "b": [3, 7]})
+    fieldBits, fieldValid = plan.extract(packets)
+    assert fieldBits["a"].tolist() == [[1, 0, 1], [0, 1, 1]]
+    assert fieldBits["b"].tolist() == [[1, 1], [0, 0]]
+    assert fieldValid["b"].tolist() == [[True, True], [False, False]]
+    values, valid = plan.extractValues(packets)
+    assert values["a"].tolist() == [5, 3]
+    assert valid["b"].tolist() == [True, False]
+
+    matrix = np.zeros((2, 8), dtype=np.uint8)
+    plan.writeValues(matrix, {"a": [6, 1], "b": 3})
+    assert matrix.tolist() == [[1, 1, 0, 1, 0, 0, 0, 1],
+                               [0, 0, 1, 1, 0, 0, 0, 1]]
+    with pytest.raises(ValueError):
+        plan.write(matrix, {"a": [1, 1]})
+
+
+@pytest.mark.parametrize("packet", [[1, 0, 1, 1, 0], BitVector([1, 0, 1, 1, 0]),
+                                    np.array([1, 0, 1, 1, 0])])
+def test_field_plan_single_packet(packet):
+    plan = FieldPlan([[0, 1, 2], [3, 4]])
+    fieldBits, _ = plan.extract(packet)
+    assert fieldBits[0].tolist() == [[1, 0, 1]]
+    assert fieldBits[1].tolist() == [[1, 0]]
+
+
+@pytest.mark.parametrize("lsbFirst", [False, True])
+@pytest.mark.parametrize("hexString", ["", "A", "AB", "ABC", "0F1",
+                                       "DEADBEEF", "DEADBEEF5"])
+def test_hex_round_trip(hexString, lsbFirst):
+    bits = blu.hexToBits(hexString, lsbFirst)
+    assert len(bits) == 4*len(hexString)
+    assert blu.bitsToHex(bits, lsbFirst) == hexString
+    assert blu.bitsToHexBatch([bits.toList()]*2, lsbFirst) == [hexString]*2
+
+
+def test_hex_conversions():
+    assert blu.hexToBits("A", lsbFirst=True).toList() == [0, 1, 0, 1]
+    assert blu.hexToBits("de ad").toBytes() == b"\xde\xad"
+    assert blu.bitsToHex(blu.hexToBits("DEAD"), separator=" ") == "DE AD"
+    with pytest.raises(ValueError):
+        blu.hexToBits("ABG")
+
+
+@pytest.mark.parametrize("lsbFirst", [False, True])
+def test_bytes_round_trip(lsbFirst):
+    data = bytes(bytearray(range(256)))
+    bits = blu.bytesToBits(data, lsbFirst)
+    assert blu.bitsToBytes(bits, lsbFirst) == data
+    assert blu.bitsToBytes(bits.toList(), lsbFirst) == data
+    assert blu.bytesToBits(b"\x01", lsbFirst=True).toList() == [1] + [0]*7
+
+
+def test_bit_list_to_byte_list():
+    bits = blu.bytesToBits(b"\x12\xfe").toList()
+    assert blu.bit_list_to_byte_list(bits) == [0x12, 0xfe]
+    assert blu.bit_list_to_byte_list(bits[:8] + [LOGIC_X] + bits[9:]) == [0x12, -1]
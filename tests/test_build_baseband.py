@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+from build_baseband import RunLengthBaseband, basebandDefinition, \
+    clearBasebandCache, compileBaseband
+
+
+def _randomBaseband(numRuns = 200, seed = 0, sampleRate = 1e6):
+    rng = np.random.default_rng(seed)
+    return RunLengthBaseband(np.arange(numRuns) % 2,
+                             rng.integers(1, 50, numRuns), sampleRate)
+
+
+def test_runs_are_merged():
+    baseband = RunLengthBaseband([0, 0, 1, 1, 0], [3, 2, 0, 4, 1])
+    assert baseband.toWidthList() == [[0, 5], [1, 4], [0, 1]]
+    assert len(baseband) == 10
+    assert RunLengthBaseband.fromSamples(baseband.expand()) == baseband
+
+
+@pytest.mark.parametrize("chunkSize", [1, 7, 49, 50, 1000, 100000])
+def test_iter_samples_matches_expand(chunkSize):
+    baseband = _randomBaseband()
+    chunks = list(baseband.iterSamples(chunkSize))
+    assert all(len(chunk) == chunkSize for chunk in chunks[:-1])
+    assert 0 < len(chunks[-1]) <= chunkSize
+    assert np.array_equal(np.concatenate(chunks), baseband.expand())
+
+
+def test_iter_samples_empty():
+    assert list(RunLengthBaseband().iterSamples(10)) == []
+
+
+def test_concatenate_repeat_and_resample():
+    first = _randomBaseband(5, seed=1)
+    second = _randomBaseband(6, seed=2)
+    assert np.array_equal((first + second).expand(),
+                          np.concatenate((first.expand(), second.expand())))
+    assert np.array_equal((first*3).expand(), np.tile(first.expand(), 3))
+
+    resampled = first.resample(2.5e6)
+    assert resampled.sampleRate == 2.5e6
+    assert abs(len(resampled) - 2.5*len(first)) <= 0.5
+    with pytest.raises(ValueError):
+        first + RunLengthBaseband([1], [1], 2e6)
+
+
+def test_edges_do_not_drift():
+    # 1000 runs of 1.3 us at 1 MHz: truncating each run would lose 300
+    # samples, rounding each edge keeps the total exact
+    baseband = RunLengthBaseband.fromWidthList([[i % 2, 1.3] for i in range(1000)],
+                                               1e6)
+    assert len(baseband) == 1300
+
+
+@pytest.mark.parametrize("chunkSize", [16, 1 << 20])
+def test_write_to_file(tmp_path, chunkSize):
+    baseband = _randomBaseband(50)
+    fileName = str(tmp_path / "baseband.bin")
+    baseband.writeToFile(fileName, repeatVal=3, chunkSize=chunkSize)
+    written = np.fromfile(fileName, dtype=np.uint8)
+    assert np.array_equal(written, np.tile(baseband.expand(), 3))
+
+
+def _widthList(text):
+    definition = basebandDefinition()
+    definition.parseText(text)
+    definition.buildWidthList()
+    return definition.widthList
+
+
+def test_element_encodings():
+    assert _widthList("INIT 0\nNRZ 10 20 HEX A0") == \
+        [[1, 20], [0, 10], [1, 20], [0, 10], [0, 10], [0, 10], [0, 10], [0, 10]]
+    assert _widthList("MANCHESTER 5 HEX 80")[:4] == [[0, 5], [1, 5], [1, 5], [0, 5]]
+    assert _widthList("PWM 5 15 HEX 80")[:4] == [[1, 15], [0, 5], [1, 5], [0, 15]]
+    assert [pair[0] for pair in _widthList("INIT 1\nDIFF 5 HEX 50")] == \
+        [1, 0, 0, 1, 1, 1, 1, 1]
+
+
+@pytest.mark.parametrize("element, lastLevel", [("NRZ 10 10 HEX 01", 1),
+                                                ("NRZ 10 10 HEX 00", 0),
+                                                ("MANCHESTER 5 HEX 01", 1),
+                                                ("PWM 5 10 HEX 01", 0)])
+def test_diff_continues_from_previous_level(element, lastLevel):
+    # the first DIFF bit is 0, so it holds the level the element ended on
+    widthList = _widthList("INIT 0\n" + element + "\nDIFF 7 HEX 40")
+    diffLevels = [pair[0] for pair in widthList[-8:]]
+    assert diffLevels[0] == lastLevel
+    assert diffLevels[1] == 1 - lastLevel
+
+
+def test_compile_baseband_is_cached(tmp_path, capsys):
+    clearBasebandCache()
+    fileName = str(tmp_path / "baseband.txt")
+    with open(fileName, "w") as definitionFile:
+        definitionFile.write("# a comment\nINIT 0\nARB 1 100 50 100\n"
+                             "NRZ 10 10 HEX 5A\n")
+    compiled = compileBaseband(fileName)
+    assert compileBaseband(fileName) is compiled
+    assert capsys.readouterr().out == ""
+    assert compiled.duration == 330
+    assert compiled.runLength(1e6) is compiled.runLength(1e6)
+    assert len(compiled.expand(2e6)) == 660
+    with pytest.raises(AttributeError):
+        compiled.runs = ()
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+import bit_list_utilities as blu
+import crc_catalogue as cc
+
+
+@pytest.mark.parametrize("name", cc.CRC_MODEL_NAMES)
+def test_check_values(name):
+    assert cc.modelCRC(name, cc.CHECK_PAYLOAD) == cc.CHECK_VALUES[name]
+    assert name in cc.modelsForCheck(cc.CHECK_VALUES[name],
+                                     cc.CRC_MODELS[name].crcLen)
+
+
+def test_models_for_payload():
+    name = "CRC-16/XMODEM"
+    payload = b"\x01\x02\x03\x04"
+    value = cc.modelCRC(name, payload)
+    assert name in cc.modelsForPayload(payload, value, 16)
+    assert name in cc.modelsForPayload(blu.bytesToBits(payload).toList(),
+                                       value, 16)
+    zeros = cc.modelCRC(name, np.zeros(32, dtype=np.uint8))
+    assert name in cc.modelsForZeros(zeros, 32, 16)
+
+
+def test_crc_model_is_a_copy():
+    name = "CRC-16/MODBUS"
+    original = list(cc.CRC_MODELS[name].finalXOR)
+    crcDef = cc.crcModel(name, 0, 31, 32, 47)
+    crcDef.finalXOR[0] ^= 1
+    crcDef.crcPoly[1] ^= 1
+    assert cc.CRC_MODELS[name].finalXOR == original
+    assert cc.modelCRC(name, cc.CHECK_PAYLOAD) == cc.CHECK_VALUES[name]
+
+
+def test_match_models():
+    name = "CRC-16/KERMIT"
+    rng = np.random.default_rng(0)
+    packets = []
+    for length in (32, 48, 64):
+        payload = rng.integers(0, 2, length).tolist()
+        crcDef = cc.crcModel(name, 0, length - 1, length, length + 15)
+        packets.append(payload + crcDef.computeCRC(payload))
+    matches = cc.matchModels(packets, 0, -17, -16, -1)
+    assert name in [match[0] for match in matches]
+
+    # a different final XOR is found when asked for
+    for packet in packets:
+        packet[-1] ^= 1
+    assert name not in [match[0] for match in
+                        cc.matchModels(packets, 0, -17, -16, -1)]
+    matches = dict((match[0], match[2]) for match in
+                   cc.matchModels(packets, 0, -17, -16, -1, ignoreFinalXOR=True))
+    assert blu.bitsToDec(matches[name]) == 1
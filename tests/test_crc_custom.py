@@ -0,0 +1,244 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import bit_list_utilities as blu
+import crc_catalogue
+import crc_custom as crc
+
+
+def _randomPayload(numBits, seed):
+    return np.random.default_rng(seed).integers(0, 2, numBits).tolist()
+
+
+def _definition(name, dataStart, dataStop, crcStart, crcStop):
+    return crc_catalogue.crcModel(name, dataStart, dataStop, crcStart, crcStop)
+
+
+# packets of random data, of the lengths given, each followed by its CRC
+# under the named model
+def _packets(name, lengths, seed = 0):
+    packets = []
+    for i, length in enumerate(lengths):
+        payload = _randomPayload(length, seed + i)
+        crcDef = _definition(name, 0, length - 1, length,
+                             length + crc_catalogue.CRC_MODELS[name].crcLen - 1)
+        packets.append(payload + crcDef.computeCRC(payload))
+    return packets
+
+
+ENGINE_CASES = list(itertools.product(
+    [crc.POLY_5_USB, crc.MASTER_POLY_LIST[8][0], crc.POLY_16_CCITT,
+     crc.POLY_32, crc.POLY_64_ECMA],
+    crc.CRC_BIT_ORDER_OPTIONS,
+    crc.CRC_INIT_OPTIONS,
+    [crc.CRC_REVERSE_FALSE, crc.CRC_REVERSE_TRUE]))
+
+
+@pytest.mark.parametrize("crcPoly, inputBitOrder, initVal, reverseFinal",
+                         ENGINE_CASES)
+def test_engine_matches_reference(crcPoly, inputBitOrder, initVal, reverseFinal):
+    width = len(crcPoly) - 1
+    finalXOR = blu.decToPaddedBits(0x5A5A5A5A5A5A5A5A >> (64 - width), width)
+    initReg = blu.decToPaddedBits(0x123456789ABCDEF0 >> (64 - width), width)
+    for payloadLen, padding in [(8, (crc.CRC_NOPAD, 0, 0)),
+                                (48, (crc.CRC_PAD_ABS, 5, 1)),
+                                (40, (crc.CRC_PAD_TO_EVEN, 16, 0)),
+                                (96, (crc.CRC_NOPAD, 0, 0))]:
+        payload = _randomPayload(payloadLen, payloadLen + width)
+        for reg in (None, initReg):
+            params = (crcPoly, inputBitOrder, initVal, reverseFinal, finalXOR) + \
+                padding + (reg,)
+            engine = crc.CrcEngine(*params)
+            expected = crc.crcCompute(payload, *params)
+            assert engine.compute(payload) == expected
+            assert engine.compute(blu.BitVector(payload)) == expected
+            assert engine.computeInt(payload) == blu.bitsToDec(expected)
+
+
+def test_engine_byte_reversed_final():
+    params = (crc.POLY_16_CCITT, crc.CRC_NORM, 1, crc.CRC_REVERSE_BYTES,
+              [0]*16, crc.CRC_NOPAD, 0, 0)
+    payload = _randomPayload(64, 3)
+    assert crc.CrcEngine(*params).compute(payload) == crc.crcCompute(payload, *params)
+
+
+def test_batch_crc_matches_single():
+    name = "CRC-16/IBM-3740"
+    packets = _packets(name, [64]*5 + [80]*3)
+    packets[2][10] ^= 1
+    crcDef = _definition(name, 0, -17, -16, -1)
+    assert crcDef.checkCRCMany(packets).tolist() == \
+        [crcDef.checkCRC(packet) for packet in packets] == \
+        [True, True, False] + [True]*5
+    computed = crcDef.computeCRCMany(packets)
+    assert [row.tolist() for row in computed] == \
+        [crcDef.computeCRC(packet) for packet in packets]
+
+
+def test_negative_indices_match_positive():
+    name = "CRC-8/SMBUS"
+    packet = _packets(name, [40])[0]
+    assert _definition(name, 0, -9, -8, -1).computeCRC(packet) == \
+        _definition(name, 0, 39, 40, 47).computeCRC(packet)
+
+
+def test_crc_iterate_finds_parameters():
+    name = "CRC-16/XMODEM"
+    packets = _packets(name, [48]*4)
+    results = crc.crcIterate(packets, [0], [47], 16, [],
+                             crc.CRC_BIT_ORDER_OPTIONS, [0],
+                             [crc.CRC_REVERSE_FALSE], [[0]*16],
+                             [crc.CRC_NOPAD], [0], [0], processes=1)
+    assert results[0].matchCount == 4
+    assert results[0].crcPoly == crc.POLY_16_CCITT
+    assert all(results[0].checkCRC(packet) for packet in packets)
+
+
+@pytest.mark.parametrize("name", ["CRC-16/IBM-3740", "CRC-32/ISO-HDLC",
+                                  "CRC-8/SMBUS", "CRC-16/KERMIT"])
+def test_crc_solve_recovers_model(name):
+    width = crc_catalogue.CRC_MODELS[name].crcLen
+    packets = _packets(name, [64]*4 + [96]*4)
+    solved = crc.crcSolve(packets, 0, -width - 1, -width, -1)
+    assert solved is not None and solved.matchCount == len(packets)
+    # the recovered definition holds for lengths it was not solved on
+    for packet in _packets(name, [56, 120], seed=50):
+        solved.dataStop, solved.crcStart, solved.crcStop = -width - 1, -width, -1
+        assert solved.checkCRC(packet)
+
+
+def test_crc_layout_search():
+    name = "CRC-16/XMODEM"
+    packets = [[1, 0, 1, 1]*4 + packet + [0]*8
+               for packet in _packets(name, [48]*6)]
+    results = crc.crcLayoutSearch(packets, [crc.POLY_16_CCITT],
+                                  inputBitOrderList=[crc.CRC_NORM],
+                                  reverseFinalList=[crc.CRC_REVERSE_FALSE],
+                                  processes=1)
+    assert results[0].matchCount == len(packets)
+    assert (results[0].dataStop, results[0].crcStart, results[0].crcStop) == \
+        (63, 64, 79)
+
+
+def test_correct_crc():
+    name = "CRC-32/ISO-HDLC"
+    crcDef = _definition(name, 0, 63, 64, 95)
+    packet = _packets(name, [64])[0]
+    assert crcDef.correctCRC(packet)[0] == crc.CRC_CORRECT_OK
+    damaged = list(packet)
+    damaged[7] ^= 1
+    damaged[70] ^= 1
+    status, corrected, _ = crcDef.correctCRC(damaged, maxErrors=2)
+    assert status == crc.CRC_CORRECT_FIXED
+    assert corrected == packet
+
+
+def test_sweep_and_forge_crc():
+    name = "CRC-16/IBM-3740"
+    crcDef = _definition(name, 0, 63, 64, 79)
+    packet = _packets(name, [64])[0]
+    fieldIndices = list(range(8, 16))
+    packets = crcDef.sweepCRC(packet, fieldIndices, range(256))
+    assert packets.shape == (256, 80)
+    assert crcDef.checkCRCMany(packets).all()
+    values, _ = blu.bitsToDecBatch(packets[:, 8:16])
+    assert values.tolist() == list(range(256))
+
+    forged = crcDef.forgeCRC(packet, list(range(32, 56)), 0xBEEF)
+    assert forged is not None
+    assert blu.bitsToDec(forged[64:80]) == 0xBEEF
+    assert crcDef.checkCRC(forged)
+    assert forged[:32] == packet[:32]
+
+
+def test_table_cache_disk_store(tmp_path):
+    writer = crc.CrcTableCache(cacheDir=str(tmp_path))
+    tables = writer.get(crc.POLY_32)
+    reader = crc.CrcTableCache(cacheDir=str(tmp_path), readOnly=True)
+    assert reader.get(crc.POLY_32) == tables
+    assert reader.diskLoads == 1
+    assert reader.get(crc.POLY_32) == tables
+    assert reader.hits == 1
+    assert tables == crc._buildCrcTables(crc.POLY_32, False, 8)
+
+
+# reference checksum computed one word at a time with Python ints
+def _referenceChecksum(bits, numOutputBits, wordBits, acsMethod):
+    words = [blu.bitsToDec(bits[i:i + wordBits])
+             for i in range(0, len(bits), wordBits)]
+    mask = (1 << numOutputBits) - 1
+    if acsMethod == crc.ACS_XOR:
+        total = 0
+        for word in words:
+            total ^= word
+        return total & mask
+    total = sum(words)
+    if acsMethod == crc.ACS_ONES_COMPLEMENT:
+        while total >> numOutputBits:
+            total = (total & mask) + (total >> numOutputBits)
+        return ~total & mask
+    if acsMethod == crc.ACS_TWOS_COMPLEMENT:
+        return -total & mask
+    return total & mask
+
+
+@pytest.mark.parametrize("numOutputBits, wordBits",
+                         [(8, 8), (16, 16), (16, 8), (32, 32), (63, 63),
+                          (64, 64), (64, 8)])
+@pytest.mark.parametrize("acsMethod", [crc.ACS_SUM, crc.ACS_XOR,
+                                       crc.ACS_ONES_COMPLEMENT,
+                                       crc.ACS_TWOS_COMPLEMENT])
+def test_checksum_matches_reference(numOutputBits, wordBits, acsMethod):
+    packets = [_randomPayload(20*wordBits, seed) for seed in range(3)]
+    expected = [_referenceChecksum(packet, numOutputBits, wordBits, acsMethod)
+                for packet in packets]
+    computed = crc.checksumComputeMany(packets, 0, 20*wordBits - 1,
+                                       numOutputBits=numOutputBits,
+                                       acsMethod=acsMethod, wordBits=wordBits)
+    assert [int(value) for value in computed] == expected
+    assert crc.checksumCompute(packets[0], 0, 20*wordBits - 1,
+                               numOutputBits=numOutputBits,
+                               acsMethod=acsMethod,
+                               wordBits=wordBits) == expected[0]
+
+
+def test_fletcher_and_adler_check_values():
+    bits = blu.bytesToBits(b"abcde").toList()
+    assert crc.checksumCompute(bits, 0, len(bits) - 1, numOutputBits=16,
+                               acsMethod=crc.ACS_FLETCHER) == 0xC8F0
+    bits = blu.bytesToBits(b"Wikipedia").toList()
+    assert crc.checksumCompute(bits, 0, len(bits) - 1, numOutputBits=32,
+                               acsMethod=crc.ACS_ADLER) == 0x11E60398
+
+
+def test_checksum_rejects_unknown_bits():
+    packet = [1, 0, blu.LOGIC_X, 0, 1, 1, 0, 1]
+    with pytest.raises(ValueError):
+        crc.checksumCompute(packet, 0, 7)
+    with pytest.raises(ValueError):
+        crc.checksumComputeMany([packet], 0, 7)
+
+
+@pytest.mark.parametrize("observed", [True, False])
+def test_checksum_iterate(observed):
+    packets = []
+    checksums = []
+    for seed in range(5):
+        payload = _randomPayload(32, seed)
+        checksum = crc.checksumCompute(payload, 0, 31)
+        checksums.append(checksum)
+        packets.append(payload + blu.decToPaddedBits(checksum, 8))
+    if observed:
+        results = crc.checkSumIterate(packets, checksums, [0], [31], [False],
+                                      [crc.CRC_REVERSE_FALSE], [True], [0],
+                                      processes=1)
+    else:
+        results = crc.checkSumIterate(packets, None, [0], [31], [False],
+                                      [crc.CRC_REVERSE_FALSE], [True], [0],
+                                      acsStartList=[32], acsStopList=[39],
+                                      processes=1)
+    assert results[0].matchCount == len(packets)
+    assert (results[0].acsStart, results[0].acsStop) == (32, 39)
+    assert results[0].checkACSMany(packets).all()
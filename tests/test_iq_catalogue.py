@@ -0,0 +1,160 @@
+import os
+import sqlite3
+
+import numpy as np
+import pytest
+
+from iq_catalogue import IqCatalogue, powerSummary
+from rf_file_handler import iqFileObject
+
+
+def _writeCapture(path, numSamples, amplitude = 1.0):
+    samples = amplitude*np.exp(2j*np.pi*0.01*np.arange(numSamples))
+    samples.astype(np.complex64).tofile(str(path))
+
+
+# touches a file with a modification time some seconds on from its own,
+# so that a change is seen even on file systems with coarse timestamps
+def _bumpMtime(path, seconds = 10):
+    mtime = os.stat(str(path)).st_mtime + seconds
+    os.utime(str(path), (mtime, mtime))
+
+
+@pytest.fixture
+def captureDir(tmp_path):
+    directory = tmp_path / "captures"
+    (directory / "sub").mkdir(parents=True)
+    _writeCapture(directory / "fob_c315M_s1M.iq", 2000)
+    _writeCapture(directory / "fob_c433M_s2M.iq", 4000, amplitude=0.1)
+    _writeCapture(directory / "sub" / "tpms_c315M_s1M.iq", 500)
+    return directory
+
+
+@pytest.fixture
+def catalogue(tmp_path):
+    with IqCatalogue(str(tmp_path / "captures.db")) as catalogue:
+        yield catalogue
+
+
+def _counts(**values):
+    counts = dict(added=0, updated=0, unchanged=0, removed=0, skipped=0)
+    counts.update(values)
+    return counts
+
+
+def test_power_summary_of_unit_tone(captureDir):
+    iqFile = iqFileObject(fileName = str(captureDir / "fob_c315M_s1M.iq"))
+    meanPowerDb, peakPowerDb = powerSummary(iqFile)
+    iqFile.close()
+    assert meanPowerDb == pytest.approx(0.0, abs=1e-3)
+    assert peakPowerDb == pytest.approx(0.0, abs=1e-3)
+
+
+def test_scan_adds_then_skips_unchanged(captureDir, catalogue):
+    assert catalogue.scan(str(captureDir)) == _counts(added=3)
+    assert len(catalogue) == 3
+    assert catalogue.scan(str(captureDir)) == _counts(unchanged=3)
+
+
+def test_scan_records_parsed_values(captureDir, catalogue):
+    catalogue.scan(str(captureDir))
+    record, = catalogue.query(centerFreq=433e6)
+    assert record["prefix"] == "fob"
+    assert record["sampRate"] == 2e6
+    assert record["numSamples"] == 4000
+    assert record["duration"] == pytest.approx(0.002)
+    assert record["meanPowerDb"] == pytest.approx(-20.0, abs=1e-3)
+
+
+def test_non_recursive_scan(captureDir, catalogue):
+    assert catalogue.scan(str(captureDir), recursive=False) == _counts(added=2)
+    assert catalogue.scan(str(captureDir)) == _counts(added=1, unchanged=2)
+
+
+def test_changed_file_is_updated(captureDir, catalogue):
+    catalogue.scan(str(captureDir))
+    path = captureDir / "fob_c315M_s1M.iq"
+    _writeCapture(path, 3000)
+    _bumpMtime(path)
+    assert catalogue.scan(str(captureDir)) == _counts(updated=1, unchanged=2)
+    record, = catalogue.query(centerFreq=315e6, directory=str(captureDir),
+                              prefix="fob")
+    assert record["numSamples"] == 3000
+
+
+def test_sidecar_added_and_removed_is_updated(captureDir, catalogue):
+    catalogue.scan(str(captureDir))
+    path = str(captureDir / "fob_c315M_s1M.iq")
+    iqFile = iqFileObject(fileName = path)
+    iqFile.centerFreq = 315.004e6
+    iqFile.writeMeta()
+    assert catalogue.scan(str(captureDir)) == _counts(updated=1, unchanged=2)
+    assert catalogue.paths(centerFreq=315.004e6) == [path]
+    os.remove(iqFile.metaPath())
+    assert catalogue.scan(str(captureDir)) == _counts(updated=1, unchanged=2)
+    assert catalogue.paths(centerFreq=315.004e6) == []
+
+
+def test_removed_file_is_pruned(captureDir, catalogue):
+    catalogue.scan(str(captureDir))
+    os.remove(str(captureDir / "sub" / "tpms_c315M_s1M.iq"))
+    assert catalogue.scan(str(captureDir), prune=False) == _counts(unchanged=2)
+    assert len(catalogue) == 3
+    assert catalogue.scan(str(captureDir)) == _counts(removed=1, unchanged=2)
+    assert len(catalogue) == 2
+
+
+def test_unparseable_name_is_skipped(captureDir, catalogue, capsys):
+    _writeCapture(captureDir / "notes.iq", 100)
+    assert catalogue.scan(str(captureDir)) == _counts(added=3, skipped=1)
+    assert "WARNING: skipping" in capsys.readouterr().out
+    assert len(catalogue) == 3
+
+
+def test_query_filters(captureDir, catalogue):
+    catalogue.scan(str(captureDir))
+    fob315 = str(captureDir / "fob_c315M_s1M.iq")
+    fob433 = str(captureDir / "fob_c433M_s2M.iq")
+    tpms = str(captureDir / "sub" / "tpms_c315M_s1M.iq")
+    assert catalogue.paths() == sorted([fob315, fob433, tpms])
+    assert catalogue.paths(centerFreq=315e6, sampRate=1e6) == \
+        sorted([fob315, tpms])
+    assert catalogue.paths(minFreq=400e6) == [fob433]
+    assert catalogue.paths(maxFreq=400e6, minDuration=0.001) == [fob315]
+    assert catalogue.paths(maxDuration=0.001) == [tpms]
+    assert catalogue.paths(minMeanPowerDb=-10) == sorted([fob315, tpms])
+    assert catalogue.paths(prefix="tp*") == [tpms]
+    assert catalogue.paths(directory=str(captureDir / "sub")) == [tpms]
+
+
+def test_directory_query_does_not_match_siblings(tmp_path, catalogue):
+    for name in ["a", "a_b"]:
+        (tmp_path / name).mkdir()
+        _writeCapture(tmp_path / name / "x_c1M_s1M.iq", 10)
+    catalogue.scan([str(tmp_path / "a"), str(tmp_path / "a_b")])
+    assert catalogue.paths(directory=str(tmp_path / "a")) == \
+        [str(tmp_path / "a" / "x_c1M_s1M.iq")]
+
+
+def test_iq_files_are_readable(captureDir, catalogue):
+    catalogue.scan(str(captureDir))
+    iqFile, = catalogue.iqFiles(prefix="tpms")
+    assert iqFile.numSamples == 500
+    iqFile.close()
+
+
+def test_old_catalogue_is_migrated(captureDir, tmp_path):
+    dbPath = str(tmp_path / "old.db")
+    connection = sqlite3.connect(dbPath)
+    connection.execute(
+        "CREATE TABLE captures (path TEXT PRIMARY KEY, directory TEXT NOT NULL, "
+        "prefix TEXT NOT NULL, centerFreq REAL NOT NULL, "
+        "sampRate REAL NOT NULL, numSamples INTEGER NOT NULL, "
+        "duration REAL NOT NULL, meanPowerDb REAL, peakPowerDb REAL, "
+        "fileSize INTEGER NOT NULL, mtime REAL NOT NULL, "
+        "scanTime REAL NOT NULL)")
+    connection.commit()
+    connection.close()
+    with IqCatalogue(dbPath) as catalogue:
+        assert catalogue.scan(str(captureDir)) == _counts(added=3)
+        assert catalogue.scan(str(captureDir)) == _counts(unchanged=3)
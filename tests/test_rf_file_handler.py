@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from rf_const import IQ_CF32, IQ_CI16, IQ_CI8
+from rf_file_handler import convertIq, convertIqFile, iqFileObject
+
+
+# a tone at unit amplitude, the largest that rf_synth writes
+def _unitTone(numSamples = 9000):
+    phases = 2*np.pi*0.0123*np.arange(numSamples)
+    return np.exp(1j*phases).astype(np.complex64)
+
+
+@pytest.mark.parametrize("outType, tolerance", [(IQ_CI8, 1/127.0),
+                                                (IQ_CI16, 1/32767.0)])
+def test_unit_tone_round_trip(outType, tolerance):
+    tone = _unitTone()
+    encoded, numClipped = convertIq(tone, IQ_CF32, outType)
+    assert numClipped == 0
+    decoded, numClipped = convertIq(encoded, outType, IQ_CF32)
+    assert numClipped == 0
+    assert decoded.dtype == np.complex64
+    assert np.max(np.abs(decoded - tone)) <= tolerance
+
+
+def test_full_scale_values():
+    encoded, _ = convertIq(np.array([1 - 1j], dtype=np.complex64),
+                           IQ_CF32, IQ_CI8)
+    assert encoded.tolist() == [127, -127]
+
+
+def test_clipping_is_counted():
+    samples = np.array([0.5, 2.0 + 0j, -3j, 0.1], dtype=np.complex64)
+    encoded, numClipped = convertIq(samples, IQ_CF32, IQ_CI8)
+    assert numClipped == 2
+    assert encoded.tolist() == [64, 0, 127, 0, 0, -128, 13, 0]
+
+
+def test_convert_file_round_trip(tmp_path, capsys):
+    tone = _unitTone()
+    inName = str(tmp_path / "tone_c315M_s1M.iq")
+    tone.tofile(inName)
+    outName = str(tmp_path / "tone8_c315M_s1M.iq")
+    numSamples, numClipped = convertIqFile(inName, outName, IQ_CI8,
+                                           chunkSize = 1000)
+    assert (numSamples, numClipped) == (len(tone), 0)
+    assert "WARNING" not in capsys.readouterr().out
+
+    outFile = iqFileObject(fileName = outName)
+    assert outFile.datatype == IQ_CI8
+    assert outFile.numSamples == len(tone)
+    assert np.max(np.abs(outFile.sampleSlice(0, len(tone)) - tone)) <= 1/127.0
+    outFile.close()
+
+
+@pytest.mark.parametrize("metaText", ["{not json", '{"global": []}',
+                                      '{"global": {"core:datatype": "cu4"}}'])
+def test_unreadable_sidecar_falls_back_to_file_name(tmp_path, capsys, metaText):
+    fileName = str(tmp_path / "capture_c433p92M_s2M.iq")
+    _unitTone(100).tofile(fileName)
+    with open(str(tmp_path / "capture_c433p92M_s2M.sigmf-meta"), "w") as metaFile:
+        metaFile.write(metaText)
+
+    iqFile = iqFileObject(fileName = fileName)
+    assert "WARNING" in capsys.readouterr().out
+    assert (iqFile.prefix, iqFile.centerFreq, iqFile.sampRate) == \
+        ("capture", 433.92e6, 2e6)
+    assert iqFile.datatype == IQ_CF32
+    assert iqFile.annotations == []
+    assert iqFile.numSamples == 100
+    iqFile.close()
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from build_baseband import RunLengthBaseband
+from rf_file_handler import iqFileObject
+from rf_synth import MOD_FSK, MOD_GFSK, MOD_OOK, synth_chunks, synth_to_file
+
+SAMP_RATE = 1e6
+CENTER_FREQ = 315e6
+
+
+def _baseband():
+    rng = np.random.default_rng(0)
+    bits = rng.integers(0, 2, 64)
+    # 50 us symbols at the output rate
+    return RunLengthBaseband(bits, np.full(len(bits), 50), SAMP_RATE)
+
+
+def _synth(modulation, chunk_size, **kwargs):
+    return np.concatenate(list(synth_chunks(
+        _baseband(), modulation, CENTER_FREQ, CENTER_FREQ + 20e3, SAMP_RATE,
+        chunk_size = chunk_size, **kwargs)))
+
+
+@pytest.mark.parametrize("modulation, kwargs", [
+    (MOD_OOK, {}),
+    (MOD_FSK, {"fsk_deviation_hz": 40e3}),
+    (MOD_GFSK, {"fsk_deviation_hz": 40e3, "symbol_rate": 20e3})])
+def test_chunk_size_does_not_change_output(modulation, kwargs):
+    whole = _synth(modulation, 1 << 20, **kwargs)
+    assert len(whole) == len(_baseband())
+    assert whole.dtype == np.complex64
+    for chunk_size in (1, 333, 1000):
+        assert np.allclose(_synth(modulation, chunk_size, **kwargs), whole,
+                           atol=1e-4)
+
+
+def test_ook_amplitude():
+    samples = _synth(MOD_OOK, 1000, ook_gain = 0.5)
+    levels = _baseband().expand()
+    assert np.allclose(np.abs(samples[levels == 1]), 0.5, atol=1e-5)
+    assert np.all(samples[levels == 0] == 0)
+
+
+def test_fsk_frequencies():
+    samples = _synth(MOD_FSK, 1000, fsk_deviation_hz = 40e3)
+    levels = _baseband().expand()
+    freqs = np.angle(samples[1:]*np.conj(samples[:-1]))*SAMP_RATE/(2*np.pi)
+    # the carrier is 20 kHz above center, shifted by +/-20 kHz
+    assert np.allclose(freqs[levels[:-1] == 1], 40e3, atol=1)
+    assert np.allclose(freqs[levels[:-1] == 0], 0, atol=1)
+
+
+def test_repeat_and_array_baseband():
+    levels = _baseband().expand()
+    samples = np.concatenate(list(synth_chunks(
+        levels, MOD_OOK, CENTER_FREQ, CENTER_FREQ, SAMP_RATE,
+        baseband_samp_rate = SAMP_RATE/2, repeat = 2)))
+    assert len(samples) == 4*len(levels)
+
+
+def test_synth_to_file(tmp_path):
+    path = synth_to_file(_baseband(), MOD_OOK, CENTER_FREQ, CENTER_FREQ + 20e3,
+                         SAMP_RATE, "synth", out_dir = str(tmp_path),
+                         chunk_size = 500)
+    iqFile = iqFileObject(fileName = path)
+    assert (iqFile.centerFreq, iqFile.sampRate) == (CENTER_FREQ, SAMP_RATE)
+    assert np.allclose(iqFile.sampleSlice(0, iqFile.numSamples),
+                       _synth(MOD_OOK, 1 << 20))
+    iqFile.close()
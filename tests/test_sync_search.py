@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from bit_list_utilities import BitVector
+from sync_search import SyncWordMatcher, findSyncWords
+
+
+SYNC_A = "1011001110001111"
+SYNC_B = "0110"
+
+
+# returns a random stream with copies of the sync words planted at the
+# offsets given, the first of them with a flipped bit
+def _stream(numBits, plants, seed = 1):
+    bits = np.random.default_rng(seed).integers(0, 2, numBits).astype(np.uint8)
+    for offset, syncWord in plants:
+        bits[offset:offset + len(syncWord)] = [int(char) for char in syncWord]
+    return bits
+
+
+# reference search: every offset, one bit at a time
+def _bruteForce(bits, syncWords, maxErrors):
+    matches = []
+    for offset in range(len(bits)):
+        for patternId, syncWord in enumerate(syncWords):
+            window = bits[offset:offset + len(syncWord)]
+            if len(window) < len(syncWord):
+                continue
+            errors = sum(int(bit) != int(char) for bit, char in zip(window, syncWord))
+            if errors <= maxErrors:
+                matches.append((offset, patternId, errors))
+    return sorted(matches)
+
+
+def test_find_sync_words_matches_brute_force():
+    bits = _stream(3000, [(100, SYNC_A), (1500, SYNC_A), (2990, SYNC_A[:10])])
+    bits[105] ^= 1
+    for maxErrors in (0, 1, 2):
+        assert findSyncWords(bits.tolist(), [SYNC_A], maxErrors) == \
+            _bruteForce(bits, [SYNC_A], maxErrors)
+
+
+@pytest.mark.parametrize("chunkSize", [1, 7, 15, 16, 17, 1000, 5000])
+def test_chunking_does_not_change_matches(chunkSize):
+    bits = _stream(4000, [(0, SYNC_A), (999, SYNC_A), (1000, SYNC_B),
+                          (3984, SYNC_A)])
+    expected = _bruteForce(bits, [SYNC_A, SYNC_B], 1)
+    matcher = SyncWordMatcher([SYNC_A, SYNC_B], maxErrors=1)
+    chunks = [bits[i:i + chunkSize] for i in range(0, len(bits), chunkSize)]
+    found = list(matcher.search(chunks))
+    assert found == expected
+
+
+def test_feed_returns_matches_in_order():
+    bits = _stream(2000, [(50, SYNC_A), (700, SYNC_A)])
+    matcher = SyncWordMatcher([SYNC_A, SYNC_B])
+    found = []
+    for start in range(0, len(bits), 64):
+        found += matcher.feed(BitVector(bits[start:start + 64]))
+    found += matcher.flush()
+    assert found == sorted(found)
+    assert found == _bruteForce(bits, [SYNC_A, SYNC_B], 0)
+
+
+def test_packed_input():
+    bits = _stream(800, [(333, SYNC_A)])
+    packed = np.packbits(bits).tobytes()
+    matcher = SyncWordMatcher([SYNC_A], packedInput=True)
+    found = list(matcher.search([packed[i:i + 3] for i in range(0, len(packed), 3)]))
+    assert found == _bruteForce(bits, [SYNC_A], 0)
+
+
+def test_reset_starts_a_new_stream():
+    bits = _stream(200, [(20, SYNC_A)])
+    matcher = SyncWordMatcher([SYNC_A])
+    first = list(matcher.search([bits]))
+    matcher.reset()
+    assert list(matcher.search([bits])) == first
+
+
+def test_bad_sync_words():
+    with pytest.raises(ValueError):
+        SyncWordMatcher(["0120"])
+    with pytest.raises(ValueError):
+        SyncWordMatcher(["1"*65])